@@ -0,0 +1,77 @@
+"""Measure client-side throughput of `SwarmClient` against the per-example `AsyncInferenceClient` pattern.
+
+A local stub endpoint answers TGI requests immediately, so the requests/s reported is
+bounded by the client's own per-request overhead.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+
+from aiohttp import web
+from huggingface_hub import AsyncInferenceClient
+from transformers import HfArgumentParser
+
+from llm_swarm.client import SwarmClient
+from llm_swarm.utils import get_unused_port
+
+
+@dataclass
+class Args:
+    requests: int = 5000
+    """Number of requests"""
+    concurrency: int = 128
+    """Number of requests in flight"""
+
+
+async def start_stub_endpoint() -> str:
+    async def generate(request):
+        await request.read()
+        return web.json_response([{"generated_text": "Paris.<|endoftext|>"}])
+
+    app = web.Application()
+    app.router.add_post("/", generate)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = get_unused_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return f"http://127.0.0.1:{port}"
+
+
+async def bench_inference_client(endpoint: str, args: Args) -> float:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    client = AsyncInferenceClient(model=endpoint)
+    stop_sequences = ["<|endoftext|>"]
+
+    async def one():
+        async with semaphore:
+            completion = await client.text_generation(
+                prompt="What is the capital of France?", max_new_tokens=20, stop_sequences=stop_sequences
+            )
+            for stop_seq in stop_sequences:
+                if completion.endswith(stop_seq):
+                    completion = completion[: -len(stop_seq)].rstrip()
+            return completion
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return args.requests / (time.perf_counter() - start)
+
+
+async def bench_swarm_client(endpoint: str, args: Args) -> float:
+    async with SwarmClient(endpoint, max_parallel_requests=args.concurrency) as client:
+        prompts = ("What is the capital of France?" for _ in range(args.requests))
+        start = time.perf_counter()
+        async for _ in client.generate_many(prompts):
+            pass
+        return args.requests / (time.perf_counter() - start)
+
+
+async def main(args: Args):
+    endpoint = await start_stub_endpoint()
+    print(f"AsyncInferenceClient + semaphore: {await bench_inference_client(endpoint, args):8.0f} req/s")
+    print(f"SwarmClient.generate_many:        {await bench_swarm_client(endpoint, args):8.0f} req/s")
+
+
+if __name__ == "__main__":
+    args = HfArgumentParser(Args).parse_args_into_dataclasses()[0]
+    asyncio.run(main(args))
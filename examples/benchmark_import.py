@@ -0,0 +1,79 @@
+"""Measure how long `import llm_swarm` and the CLI take to start, and guard against regressions.
+
+Each command runs in a fresh interpreter, so nothing is already imported. Exits with status 1
+when a command is slower than its budget or loads a module that should only load on first use.
+
+    python examples/benchmark_import.py --repeats 10
+"""
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+
+from llm_swarm.utils import DataclassArgumentParser
+
+# modules that make startup slow and are only needed once a swarm is started or a client created
+HEAVY_MODULES = ("transformers", "torch", "aiohttp", "requests", "huggingface_hub", "pyarrow", "pandas", "datasets")
+
+COMMANDS = {
+    "import llm_swarm": "import llm_swarm",
+    "from llm_swarm import LLMSwarm, LLMSwarmConfig": "from llm_swarm import LLMSwarm, LLMSwarmConfig",
+    "python -m llm_swarm --help": (
+        "import runpy\n"
+        "sys.argv = ['llm_swarm', '--help']\n"
+        "try:\n"
+        "    runpy.run_module('llm_swarm', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+}
+
+# runs `code` and reports its duration and the heavy modules it loaded on the last line
+PROBE = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{code}
+duration = time.perf_counter() - start
+print(json.dumps({{"seconds": duration, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+@dataclass
+class Args:
+    repeats: int = 5
+    """Runs of each command; the median is reported"""
+    budget_ms: float = 150.0
+    """Slowest median allowed for a command, in milliseconds"""
+
+
+def probe(code: str) -> dict:
+    indented = "\n".join("    " + line for line in code.splitlines())
+    script = PROBE.format(code=indented, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(args: Args) -> int:
+    failed = False
+    for name, code in COMMANDS.items():
+        try:
+            runs = [probe(code) for _ in range(args.repeats)]
+        except RuntimeError as e:
+            failed = True
+            print(f"❌ {name:<50} failed: {e}")
+            continue
+        median_ms = statistics.median(run["seconds"] for run in runs) * 1000
+        loaded = sorted({module for run in runs for module in run["loaded"]})
+        ok = median_ms <= args.budget_ms and not loaded
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name:<50} {median_ms:8.1f}ms" + (f"  loaded {', '.join(loaded)}" if loaded else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = DataclassArgumentParser(Args).parse_args_into_dataclasses()[0]
+    sys.exit(main(args))
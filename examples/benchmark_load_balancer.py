@@ -0,0 +1,124 @@
+"""Measure the per-request overhead of the built-in load balancer against nginx.
+
+Spins up local stub endpoints that answer `/generate` immediately, then sends the same
+requests directly to one endpoint, through `llm_swarm.load_balancer.LoadBalancer` and,
+with `--nginx`, through the dockerised nginx used by `load_balancer="nginx"`.
+"""
+import asyncio
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import aiohttp
+from aiohttp import web
+from transformers import HfArgumentParser
+
+from llm_swarm.load_balancer import LoadBalancer
+from llm_swarm.utils import get_unused_port, run_command
+
+
+@dataclass
+class Args:
+    endpoints: int = 4
+    """Number of stub endpoints"""
+    requests: int = 2000
+    """Number of sequential requests used to measure latency"""
+    concurrency: int = 256
+    """Number of concurrent requests used to measure throughput"""
+    nginx: bool = False
+    """Also benchmark nginx (requires docker)"""
+    load_balancer_template_path: str = "templates/nginx.template.conf"
+    """nginx template"""
+
+
+async def start_stub_endpoint() -> str:
+    async def generate(request):
+        await request.read()
+        return web.json_response({"generated_text": "hello"})
+
+    app = web.Application()
+    app.router.add_post("/generate", generate)
+    app.router.add_get("/health", lambda request: web.Response(text="ok"))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = get_unused_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def start_nginx(endpoints: List[str], template_path: str) -> Tuple[str, str]:
+    with open(template_path) as f:
+        template = f.read()
+    port = get_unused_port()
+    servers = "\n".join(f"server {endpoint.replace('http://', '')};" for endpoint in endpoints)
+    config_path = os.path.abspath("logs/benchmark_load_balancer.conf")
+    os.makedirs("logs", exist_ok=True)
+    with open(config_path, "w") as f:
+        f.write(template.replace(r"{{servers}}", servers).replace(r"{{port}}", str(port)))
+    container_id = run_command(f"docker run -d --network host -v {config_path}:/etc/nginx/nginx.conf nginx")
+    return f"http://localhost:{port}", container_id
+
+
+async def measure(session: aiohttp.ClientSession, url: str, args: Args) -> dict:
+    payload = {"inputs": "What is Deep Learning?", "parameters": {"max_new_tokens": 20}}
+    for _ in range(50):  # warm up connections
+        async with session.post(f"{url}/generate", json=payload) as response:
+            await response.read()
+
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        async with session.post(f"{url}/generate", json=payload) as response:
+            await response.read()
+        latencies.append(time.perf_counter() - start)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            async with session.post(f"{url}/generate", json=payload) as response:
+                await response.read()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "requests_per_s": args.requests / duration,
+    }
+
+
+async def main(args: Args):
+    endpoints = [await start_stub_endpoint() for _ in range(args.endpoints)]
+    load_balancer = LoadBalancer(endpoints)
+    await load_balancer.start()
+    targets = {"direct": endpoints[0], "python": load_balancer.endpoint}
+    container_id = None
+    if args.nginx:
+        targets["nginx"], container_id = start_nginx(endpoints, args.load_balancer_template_path)
+        await asyncio.sleep(2)
+
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            results = {name: await measure(session, url, args) for name, url in targets.items()}
+    finally:
+        await load_balancer.stop()
+        if container_id:
+            run_command(f"docker kill {container_id}")
+
+    direct = results["direct"]["p50_us"]
+    for name, result in results.items():
+        print(
+            f"{name:>7}: p50 {result['p50_us']:8.1f}us  p99 {result['p99_us']:8.1f}us  "
+            f"overhead {result['p50_us'] - direct:8.1f}us  {result['requests_per_s']:8.0f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    args = HfArgumentParser(Args).parse_args_into_dataclasses()[0]
+    asyncio.run(main(args))
@@ -0,0 +1,113 @@
+"""Compare routing policies of the built-in load balancer on a mixed-length workload.
+
+Each stub endpoint behaves like a continuously batching engine: every request decodes at
+`per_request_tokens_per_s` until the endpoint's total `tokens_per_s` is shared among more
+requests than it can serve. A mix of short and long `max_new_tokens` requests is sent
+through the load balancer with each policy and tail latency and tokens/s are reported.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+import aiohttp
+from aiohttp import web
+from transformers import HfArgumentParser
+
+from llm_swarm.load_balancer import LoadBalancer
+from llm_swarm.routing import ROUTING_POLICIES
+from llm_swarm.utils import get_unused_port
+
+
+@dataclass
+class Args:
+    endpoints: int = 4
+    """Number of stub endpoints"""
+    requests: int = 1000
+    """Number of requests per policy"""
+    concurrency: int = 128
+    """Number of requests in flight"""
+    long_fraction: float = 0.1
+    """Fraction of long requests"""
+    short_tokens: int = 50
+    """max_new_tokens of short requests"""
+    long_tokens: int = 4000
+    """max_new_tokens of long requests"""
+    tokens_per_s: float = 20000
+    """Decode throughput of one endpoint"""
+    per_request_tokens_per_s: float = 2000
+    """Decode speed of a single request"""
+    seed: int = 42
+    """Seed for the workload"""
+
+
+async def start_stub_endpoint(args: Args) -> str:
+    active = 0
+
+    async def generate(request):
+        nonlocal active
+        payload = await request.json()
+        remaining = payload["parameters"]["max_new_tokens"]
+        active += 1
+        try:
+            while remaining > 0:
+                await asyncio.sleep(0.005)
+                remaining -= 0.005 * min(args.per_request_tokens_per_s, args.tokens_per_s / active)
+        finally:
+            active -= 1
+        return web.json_response({"generated_text": "", "details": {"generated_tokens": payload["parameters"]["max_new_tokens"]}})
+
+    app = web.Application()
+    app.router.add_post("/generate", generate)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = get_unused_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_workload(url: str, workload, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(session, max_new_tokens):
+        async with semaphore:
+            start = time.perf_counter()
+            payload = {"inputs": "x" * 400, "parameters": {"max_new_tokens": max_new_tokens}}
+            async with session.post(f"{url}/generate", json=payload) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await asyncio.gather(*(one(session, max_new_tokens) for max_new_tokens in workload))
+    duration = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "tokens_per_s": sum(workload) / duration,
+    }
+
+
+async def main(args: Args):
+    rng = random.Random(args.seed)
+    workload = [args.long_tokens if rng.random() < args.long_fraction else args.short_tokens for _ in range(args.requests)]
+    for name, policy in ROUTING_POLICIES.items():
+        endpoints = [await start_stub_endpoint(args) for _ in range(args.endpoints)]
+        load_balancer = LoadBalancer(endpoints, policy=policy())
+        await load_balancer.start()
+        try:
+            result = await run_workload(load_balancer.endpoint, workload, args.concurrency)
+        finally:
+            await load_balancer.stop()
+        print(
+            f"{name:>14}: p50 {result['p50']:6.2f}s  p95 {result['p95']:6.2f}s  p99 {result['p99']:6.2f}s  "
+            f"{result['tokens_per_s']:8.0f} tokens/s"
+        )
+
+
+if __name__ == "__main__":
+    args = HfArgumentParser(Args).parse_args_into_dataclasses()[0]
+    asyncio.run(main(args))
@@ -5,9 +5,8 @@ import json
 import random
 import pandas as pd
 from llm_swarm import LLMSwarm, LLMSwarmConfig
-from huggingface_hub import AsyncInferenceClient
+from llm_swarm.conversation import ConversationExecutor
 from transformers import AutoTokenizer, HfArgumentParser
-from tqdm.asyncio import tqdm_asyncio
 from datasets import load_dataset, Dataset
 import time
 from huggingface_hub import HfApi
@@ -63,55 +62,48 @@ ds = ds.map(extract)
 ds.remove_columns(["chosen", "rejected"])
 rate_limit = 500 * isc.instances
 with LLMSwarm(isc) as llm_swarm:
-    semaphore = asyncio.Semaphore(llm_swarm.suggested_max_parallel_requests)
-    client = AsyncInferenceClient(model=llm_swarm.endpoint)
     STOP_SEQ = ["User:", "###", "<|endoftext|>"]
+    client = llm_swarm.client()
+    # follow-up turns are sent before new conversations, so conversations complete and stream out right away
+    executor = ConversationExecutor(
+        client,
+        render=lambda chat: tokenizer.apply_chat_template(chat, tokenize=False),
+        max_active=llm_swarm.suggested_max_parallel_requests,
+        max_new_tokens=args.max_new_tokens,
+        stop_sequences=STOP_SEQ,
+        temperature=args.temperature,
+    )
 
-    async def process_text(split, i, task):
-        chat = system_chat.copy()
+    async def process_text(conversation, sample):
+        conversation.messages.extend(system_chat)
         constitution = random.choice(constitutions)
-        token_length = 0
         row = {}
         for prompt, prompt_key, response_key in [
-            (task, "init_prompt", "init_response"),
+            (sample["prompt"], "init_prompt", "init_response"),
             (constitution["critic"], "critic_prompt", "critic_response"),
             (constitution["revision"], "revision_prompt", "revision_response"),
         ]:
-            async with semaphore:
-                prompt_dict = {"role": "user", "content": prompt}
-                chat.append(prompt_dict)
-                completion = await client.text_generation(
-                    prompt=tokenizer.apply_chat_template(chat, tokenize=False),
-                    max_new_tokens=args.max_new_tokens,
-                    stop_sequences=STOP_SEQ,
-                    temperature=args.temperature,
-                )
-                for stop_seq in STOP_SEQ:
-                    if completion.endswith(stop_seq):
-                        completion = completion[: -len(stop_seq)].rstrip()
-                response_dict = {"role": "assistant", "content": completion}
-                chat.append(response_dict)
-                token_length += len(tokenizer.encode(completion))
             row[prompt_key] = prompt
-            row[response_key] = completion
-        return split, i, token_length, row
+            row[response_key] = await conversation.say(prompt)
+        token_length = sum((response.generated_tokens or 0) for response in conversation.responses)
+        return {"split": sample["split"], "token_length": token_length, "row": row}
 
     async def main():
         start_time = time.time()
-        tasks = [process_text(split, idx, row["prompt"]) for split in ds for idx, row in enumerate(ds[split])]
-        print(
-            "WARNING: the first generation can hang like this for up to 1 hour because it will finish the first two turns of conversation of the entire dataset"
-        )
-        results = await tqdm_asyncio.gather(*tasks)
+        samples = ({"split": split, "prompt": row["prompt"]} for split in ds for row in ds[split])
+        completed = [(offset, result) async for offset, result in executor.stream(samples, process_text)]
+        results = [result for _, result in sorted(completed, key=lambda item: item[0])]
+        await client.close()
+        print(f"First conversation completed after {executor.time_to_first_row:.1f}s")
         end_time = time.time()
 
         total_duration = end_time - start_time
-        total_tokens = sum(result[2] for result in results)
+        total_tokens = sum(result["token_length"] for result in results)
         overall_tokens_per_second = total_tokens / total_duration if total_duration > 0 else 0
         print(f"Overall Tokens per Second: {overall_tokens_per_second}")
         all_ds = defaultdict(lambda: defaultdict(list))
         for result in results:
-            [all_ds[result[0]][key].append(value) for key, value in result[3].items()]
+            [all_ds[result["split"]][key].append(value) for key, value in result["row"].items()]
 
         def process(example):
             return {
@@ -1,10 +1,7 @@
 import asyncio
-import json
 import pandas as pd
 from llm_swarm import LLMSwarm, LLMSwarmConfig
-from huggingface_hub import AsyncInferenceClient
 from transformers import AutoTokenizer
-from tqdm.asyncio import tqdm_asyncio
 
 
 tasks = ["What is the capital of France?", "Who wrote Romeo and Juliet?", "What is the formula for water?"]
@@ -12,33 +9,19 @@ with LLMSwarm(
     LLMSwarmConfig(
         instances=2,
         inference_engine="vllm",
-        slurm_template_path="templates/vllm_h100.template.slurm",
+        template_path="templates/vllm.template.slurm",
         load_balancer_template_path="templates/nginx.template.conf",
     )
 ) as llm_swarm:
-    client = AsyncInferenceClient(model=llm_swarm.endpoint)
     tokenizer = AutoTokenizer.from_pretrained("mistralai/Mistral-7B-Instruct-v0.1")
     tokenizer.add_special_tokens({"sep_token": "", "cls_token": "", "mask_token": "", "pad_token": "[PAD]"})
-
-    async def process_text(task):
-        prompt = tokenizer.apply_chat_template(
-            [
-                {"role": "user", "content": task},
-            ],
-            tokenize=False,
-        )
-        response = await client.post(
-            json={
-                "prompt": prompt,
-                "max_tokens": 200,
-            }
-        )
-        res = json.loads(response.decode("utf-8"))["text"][0][len(prompt) :]
-        return res
+    prompts = [tokenizer.apply_chat_template([{"role": "user", "content": task}], tokenize=False) for task in tasks]
 
     async def main():
-        results = await tqdm_asyncio.gather(*(process_text(task) for task in tasks))
-        df = pd.DataFrame({"Task": tasks, "Completion": results})
+        # the same code works for TGI: the client hides the engine's request/response format
+        async with llm_swarm.client() as client:
+            results = await asyncio.gather(*(client.generate(prompt, max_new_tokens=200) for prompt in prompts))
+        df = pd.DataFrame({"Task": tasks, "Completion": [result.text for result in results]})
         print(df)
 
     asyncio.run(main())
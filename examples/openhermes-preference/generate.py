@@ -1,21 +1,22 @@
 import asyncio
+import dataclasses
 import multiprocessing
-import os
 import time
 from collections import defaultdict
 from dataclasses import dataclass
 
-from datasets import Dataset, load_dataset
-from huggingface_hub import AsyncInferenceClient, HfApi
-from tqdm.asyncio import tqdm_asyncio
-from transformers import AutoTokenizer, HfArgumentParser
+import pyarrow as pa
+from datasets import load_dataset
+from huggingface_hub import HfApi
+from transformers import HfArgumentParser
 
-from llm_swarm import LLMSwarm, LLMSwarmConfig
+from llm_swarm import GenerationRequest, LLMSwarmConfig, MultiModelSwarm
+from llm_swarm.pipeline import Pipeline
+from llm_swarm.prompts import PromptRenderer
+from llm_swarm.sink import ParquetSink
 
 api = HfApi()
 
-CHUNK_SIZE = 50000  # Define your chunk size here
-
 
 @dataclass
 class Args:
@@ -39,8 +40,10 @@ class Args:
     """whether to shuffle"""
     max_samples_per_source_category: int = 2
     """The maximum number of samples per source"""
-    restart_chunk_index: int = 0
-    """The index of the chunk to restart from"""
+    output_dir: str = "chunks_cache"
+    """Where generations are saved as they complete; rerunning resumes where the previous run stopped"""
+    models: str = ""
+    """Comma-separated policies generating a candidate each, served by one swarm with a pool per model (defaults to --model)"""
 
 
 parser = HfArgumentParser([Args, LLMSwarmConfig])
@@ -49,8 +52,8 @@ if args.timestamp:
     args.repo_id += f"__{isc.model.replace('/', '_')}__{str(int(time.time()))}"
 if "/" not in args.repo_id:  # find the current user
     args.repo_id = f"{api.whoami()['name']}/{args.repo_id}"
+models = args.models.split(",") if args.models else [isc.model]
 
-tokenizer = AutoTokenizer.from_pretrained(isc.model, revision=isc.revision)
 ds = load_dataset("teknium/OpenHermes-2.5", split="train")
 
 if args.max_samples_per_source_category > 0:
@@ -87,82 +90,87 @@ def extract(row):
 
 
 ds = ds.map(extract, load_from_cache_file=False, num_proc=1 if args.debug else multiprocessing.cpu_count())
-with LLMSwarm(isc) as llm_swarm:
-    semaphore = asyncio.Semaphore(llm_swarm.suggested_max_parallel_requests)
+# drop the sparse metadata columns before generating so they aren't carried through the saved shards
+ds = ds.remove_columns(
+    [
+        "system_prompt",
+        "model",
+        "avatarUrl",
+        "conversations",
+        "title",
+        "topic",
+        "skip_prompt_formatting",
+        "idx",
+        "hash",
+        "views",
+        "custom_instruction",
+        "language",
+        "id",
+        "model_name",
+    ]
+)
+
+# render every chat template once, in parallel, before generating: retries and the response cache reuse it
+for i, model in enumerate(models, 1):
+    renderer = PromptRenderer(
+        model,
+        messages=lambda row: row["candidate0"][:-1],
+        revision=isc.revision,
+        add_generation_prompt=False,
+        prompt_column=f"rendered_prompt{i}",
+        length_column=f"prompt_tokens{i}",
+    )
+    ds = ds.map(renderer, batched=True, num_proc=1 if args.debug else multiprocessing.cpu_count())
+
+# one launch and one connection pool for every policy
+with MultiModelSwarm([dataclasses.replace(isc, model=model) for model in models]) as llm_swarm:
     print(f"{llm_swarm.suggested_max_parallel_requests=}")
-    client = AsyncInferenceClient(model=llm_swarm.endpoint)
-    MAX_RETRIES = 3  # maximum number of retries
-    RETRY_DELAY = 5  # delay in seconds between retries
+    client = llm_swarm.client(max_retries=3, retry_delay=5)
 
     async def process_text(row):
-        attempt = 0
-        prompt = tokenizer.apply_chat_template(row["candidate0"][:-1], tokenize=False)
-        while attempt < MAX_RETRIES:
-            try:
-                async with semaphore:
-                    completion = await client.text_generation(
-                        prompt=prompt,
+        responses = await asyncio.gather(
+            *(
+                client.generate(
+                    GenerationRequest(
+                        prompt=row[f"rendered_prompt{i}"],
+                        prompt_tokens=row[f"prompt_tokens{i}"],
                         max_new_tokens=args.max_new_tokens,
                         temperature=args.temperature,
                         do_sample=args.do_sample,
+                        model=model,
                     )
-                    row["candidate1"] = row["candidate0"][:-1] + [{"role": "assistant", "content": completion}]
-                    row["candidate1_policy"] = isc.model
-                    return row
-            except Exception as e:
-                attempt += 1
-                if attempt < MAX_RETRIES:
-                    print(f"Request failed, retrying in {RETRY_DELAY} seconds... (Attempt {attempt}/{MAX_RETRIES})  {str(e)}")
-                    await asyncio.sleep(RETRY_DELAY)
-                else:
-                    print(f"Max retries reached. Failed to process the request with error {str(e)}.")
-                    row["candidate1"] = ""
-                    row["candidate1_policy"] = ""
-                    return row
+                )
+                for i, model in enumerate(models, 1)
+            ),
+            return_exceptions=True,
+        )
+        for i, (model, response) in enumerate(zip(models, responses), 1):
+            if isinstance(response, Exception):
+                print(f"Max retries reached. Failed to process the request with error {str(response)}.")
+                row[f"candidate{i}"] = None
+                row[f"candidate{i}_policy"] = None
+                continue
+            row[f"candidate{i}"] = row["candidate0"][:-1] + [{"role": "assistant", "content": response.text}]
+            row[f"candidate{i}_policy"] = model
+        return row
 
     async def main():
-        os.makedirs("chunks_cache", exist_ok=True)
-        results = []
-        num_chunks = len(ds) // CHUNK_SIZE
-        restart_idx = 0
-        if args.restart_chunk_index > 0:
-            post_ds = Dataset.load_from_disk(f"chunks_cache/cache_chunk{args.restart_chunk_index}.arrow")
-            results = post_ds.to_list()
-            restart_idx = (args.restart_chunk_index + 1) * CHUNK_SIZE
-
-        for i in range(restart_idx, len(ds), CHUNK_SIZE):
-            chunk_idx = i // CHUNK_SIZE + 1
-            print(f"Processing chunk {chunk_idx}/{num_chunks}")
-            start_time = time.time()
-            chunk = ds.select(range(i, min(i + CHUNK_SIZE, len(ds))))
-            chunk_results = await tqdm_asyncio.gather(*[process_text(row) for row in chunk])
-            results.extend(chunk_results)
-            print(f"Chunk {chunk_idx}/{num_chunks} took {time.time() - start_time} seconds")
-            post_ds = Dataset.from_list(results)
-            post_ds.save_to_disk(f"chunks_cache/cache_chunk{chunk_idx}.arrow")
-            if chunk_idx > 1:
-                os.remove(f"chunks_cache/cache_chunk{chunk_idx - 1}.arrow")
-
-        post_ds = Dataset.from_list(results)
-        post_ds = post_ds.remove_columns(
-            [
-                "system_prompt",
-                "model",
-                "avatarUrl",
-                "conversations",
-                "title",
-                "topic",
-                "skip_prompt_formatting",
-                "idx",
-                "hash",
-                "views",
-                "custom_instruction",
-                "language",
-                "id",
-                "model_name",
-            ]
-        )
-        post_ds = post_ds.filter(lambda x: x["candidate1"] != "")  # remove empty completions
+        # rows are saved as they complete, so a rerun resumes where the previous one stopped
+        # inferred from the first rows, the candidates of a buffer where they all failed would be typed null
+        schema = ds.features.arrow_schema
+        for i in range(1, len(models) + 1):
+            schema = schema.append(pa.field(f"candidate{i}", schema.field("candidate0").type))
+            schema = schema.append(pa.field(f"candidate{i}_policy", pa.string()))
+        sink = ParquetSink(args.output_dir, schema=schema)
+        pipeline = Pipeline(process_text, window=2 * llm_swarm.suggested_max_parallel_requests)
+        start_time = time.time()
+        await pipeline.run(ds, sink)
+        await client.close()
+        print(f"Generation took {time.time() - start_time} seconds")
+
+        post_ds = load_dataset(args.output_dir, split="train")
+        # remove rows with a failed completion
+        post_ds = post_ds.filter(lambda x: all(x[f"candidate{i}"] for i in range(1, len(models) + 1)))
         print(post_ds)
         if args.push_to_hub:
             post_ds.push_to_hub(args.repo_id, split="train")
@@ -4,10 +4,10 @@ import os
 import time
 from dataclasses import asdict, dataclass
 
-from datasets import Dataset, load_dataset
-from huggingface_hub import AsyncInferenceClient
-from llm_swarm import LLMSwarm, LLMSwarmConfig
-from tqdm.asyncio import tqdm_asyncio
+from datasets import load_dataset
+from llm_swarm import GenerationRequest, LLMSwarm, LLMSwarmConfig
+from llm_swarm.pipeline import Pipeline, Watermark
+from llm_swarm.sink import ParquetSink
 from transformers import AutoTokenizer, HfArgumentParser
 
 import wandb
@@ -94,65 +94,41 @@ elif args.max_samples > 0:
 
 
 with LLMSwarm(isc) as llm_swarm:
-    semaphore = asyncio.Semaphore(llm_swarm.suggested_max_parallel_requests)
-    client = AsyncInferenceClient(model=llm_swarm.endpoint)
     STOP_SEQ = ["<|endoftext|>"]
-
-    MAX_RETRIES = 6  # maximum number of retries
-    RETRY_DELAY = 4  # delay in seconds between retries
+    if "llama" in isc.model.lower():
+        STOP_SEQ = ["<|end_of_text|>", "<|eot_id|>"]
+    # completions already generated by a previous run are served from `--response_cache_path`
+    client = llm_swarm.client(max_retries=6, retry_delay=4)
 
     async def process_text(sample):
-        token_length = 0
-        attempt = 0
-        while attempt < MAX_RETRIES:
-            try:
-                async with semaphore:
-                    if "llama" in isc.model.lower():
-                        STOP_SEQ = ["<|end_of_text|>", "<|eot_id|>"]
-                        messages = [
-                            {"role": "user", "content": sample[args.prompt_column]}
-                        ]
-                        add_generation_prompt=True
-                    else:
-                        messages = [{"role": "user", "content": sample[args.prompt_column]}]
-                        add_generation_prompt=False
-                    completion = await client.text_generation(
-                        prompt=tokenizer.apply_chat_template(
-                            messages,
-                            tokenize=False,
-                            add_generation_prompt=add_generation_prompt
-                        ),
-                        max_new_tokens=args.max_new_tokens,
-                        stop_sequences=STOP_SEQ,
-                        do_sample=True,
-                        temperature=args.temperature,
-                        top_p=args.top_p,
-                        top_k=args.top_k,
-                        repetition_penalty=args.repetition_penalty,
-                        seed=args.seed,
-                        )
-                    for stop_seq in STOP_SEQ:
-                        if completion.endswith(stop_seq):
-                            completion = completion[: -len(stop_seq)].rstrip()
-                    token_length += len(tokenizer.encode(completion))
-                    sample["completion"] = completion
-                    sample["token_length"] = token_length
-                    return sample
-
-            except Exception as e:
-                attempt += 1
-                if attempt < MAX_RETRIES:
-                    print(
-                        f"Request failed, retrying in {RETRY_DELAY} seconds... (Attempt {attempt}/{MAX_RETRIES})"
-                    )
-                    await asyncio.sleep(RETRY_DELAY)
-                else:
-                    print(
-                        f"Max retries reached. Failed to process the request with error {str(e)}."
-                    )
-                    sample["completion"] = ""
-                    sample["token_length"] = 0
-                    return sample
+        messages = [{"role": "user", "content": sample[args.prompt_column]}]
+        try:
+            response = await client.generate(
+                GenerationRequest(
+                    prompt=tokenizer.apply_chat_template(
+                        messages,
+                        tokenize=False,
+                        add_generation_prompt="llama" in isc.model.lower(),
+                    ),
+                    max_new_tokens=args.max_new_tokens,
+                    stop_sequences=STOP_SEQ,
+                    do_sample=True,
+                    temperature=args.temperature,
+                    top_p=args.top_p,
+                    top_k=args.top_k,
+                    repetition_penalty=args.repetition_penalty,
+                    seed=args.seed,
+                )
+            )
+        except Exception as e:
+            print(f"Max retries reached. Failed to process the request with error {str(e)}.")
+            sample["completion"] = ""
+            sample["token_length"] = 0
+            return sample
+        sample["completion"] = response.text
+        # counted by the engine (or off the event loop for vLLM), no need to re-tokenize here
+        sample["token_length"] = response.generated_tokens
+        return sample
 
     async def main():
         start_time = time.time()
@@ -170,46 +146,47 @@ with LLMSwarm(isc) as llm_swarm:
         os.makedirs(checkpoint_dir, exist_ok=True)
         print(f"Will be saving at {checkpoint_dir}")
 
-        total_samples = len(ds)
-        for i in range(0, total_samples, args.checkpoint_interval):
-            batch_time = time.time()
-            # Processing a chunk
-            print(
-                f"Processing chunk {int(i/args.checkpoint_interval)}/{int(total_samples/args.checkpoint_interval)}"
-            )
-            end_index = min(i + args.checkpoint_interval, total_samples)
-            chunk = ds.select(range(i, end_index))
-            chunk_results = await tqdm_asyncio.gather(
-                *(process_text(sample) for sample in chunk)
-            )
-            # Save the chunk results and log throughput
+        # results are saved as they complete; a rerun skips the samples already saved
+        sink = ParquetSink(checkpoint_dir, rows_per_shard=args.checkpoint_interval)
+        watermark = Watermark.from_state(sink.state)
+        pipeline = Pipeline(process_text, window=2 * llm_swarm.suggested_max_parallel_requests)
+        completed = 0
+        batch_tokens = 0
+        batch_time = time.time()
+        async for _, result in pipeline.stream(ds, watermark):
             temp_time = time.time()
-            time_per_chunk = temp_time - batch_time
-            checkpoint_path = os.path.join(checkpoint_dir, f"checkpoint_{i+1}.json")
-            intermediate_ds = Dataset.from_list(chunk_results)
-            intermediate_ds.to_json(checkpoint_path)
-            batch_tokens = sum(intermediate_ds["token_length"])
-            total_tokens += batch_tokens
+            sink.write(result, state=watermark.state())
             saving_time += time.time() - temp_time
-            print(f"💾 Checkpoint (samples {i}-{i + args.checkpoint_interval}) saved at {checkpoint_path}.")
-            wandb.log(
-                {
-                    "sample": i + args.checkpoint_interval,
-                    "batch": int(i / args.checkpoint_interval),
-                    "total_tokens (M)": total_tokens / 1e6,
-                    "tokens_per_batch": batch_tokens,
-                    "time_per_batch (s)": time_per_chunk,
-                    "generated_tokens_per_sec": int(batch_tokens / time_per_chunk),
-                    "generated_tokens_per_sec_per_node": int(
-                        batch_tokens / (time_per_chunk * isc.instances)
-                    ),
-                }
-            )
+            completed += 1
+            batch_tokens += result["token_length"]
+            if completed % args.checkpoint_interval == 0:
+                # log throughput
+                time_per_chunk = time.time() - batch_time
+                total_tokens += batch_tokens
+                wandb.log(
+                    {
+                        "sample": completed,
+                        "batch": completed // args.checkpoint_interval - 1,
+                        "total_tokens (M)": total_tokens / 1e6,
+                        "tokens_per_batch": batch_tokens,
+                        "time_per_batch (s)": time_per_chunk,
+                        "generated_tokens_per_sec": int(batch_tokens / time_per_chunk),
+                        "generated_tokens_per_sec_per_node": int(
+                            batch_tokens / (time_per_chunk * isc.instances)
+                        ),
+                    }
+                )
+                batch_tokens = 0
+                batch_time = time.time()
+        total_tokens += batch_tokens
+        sink.close()
+        print(f"💾 {sink.rows_committed} samples saved at {checkpoint_dir}.")
 
         end_time = time.time()
+        await client.close()
 
         print(
-            "Done processing and saving all chunks 🎉! Let's get some stats and push to hub..."
+            "Done processing and saving all samples 🎉! Let's get some stats and push to hub..."
         )
         total_duration = end_time - start_time
         overall_tokens_per_second = (
@@ -1,23 +1,99 @@
+import importlib
 import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
 from .utils import run_command, get_unused_port, Loader, LLMSwarmConfig
-from typing import List, Optional
-import requests
+from .readiness import ReadinessTracker
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 from time import sleep
-from .schedulers.slurm_scheduler import SlurmScheduler
-from .schedulers.runai_scheduler import RunaiScheduler
-from huggingface_hub import get_session
+
+if TYPE_CHECKING:
+    from .autoscaler import Autoscaler
+    from .client import SwarmClient
+    from .load_balancer import ModelPool
+
+# exported names whose modules (and their aiohttp, requests or huggingface_hub imports) only load on first use
+_LAZY_IMPORTS = {
+    "LoadBalancer": ".load_balancer",
+    "ModelPool": ".load_balancer",
+    "METRICS_PATH": ".load_balancer",
+    "MultiModelSwarm": ".multi_model",
+    "REGISTRY": ".metrics",
+    "MetricsServer": ".metrics",
+    "ROUTING_POLICIES": ".routing",
+    "SwarmClient": ".client",
+    "GenerationRequest": ".client",
+    "GenerationResponse": ".client",
+    "AdaptiveConcurrencyLimiter": ".concurrency",
+    "DeadlineExceeded": ".concurrency",
+    "ResponseCache": ".cache",
+    "TokenCounter": ".tokens",
+    "Autoscaler": ".autoscaler",
+    "HealthMonitor": ".health",
+    "Tracer": ".tracing",
+    "SlurmScheduler": ".schedulers.slurm_scheduler",
+    "RunaiScheduler": ".schedulers.runai_scheduler",
+    "RunaiWatchScheduler": ".schedulers.runai_watch_scheduler",
+    "LocalScheduler": ".schedulers.local_scheduler",
+    "UnlabeledEndpointsError": ".schedulers.base_scheduler",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
+
+
+_import = __getattr__
+
 
 class LLMSwarm:
-    def __init__(self, config: LLMSwarmConfig) -> None:
+    def __init__(self, config: LLMSwarmConfig, load_balancer: Optional["ModelPool"] = None) -> None:
         """Initialize LLMSwarm with given configuration.
         
         Args:
             config (LLMSwarmConfig): Configuration object for LLMSwarm.
+            load_balancer (Optional[ModelPool], optional): Pool of a load balancer shared with the swarms of other
+                models (see `MultiModelSwarm`) to register the instances with, instead of starting one. Defaults to None.
         """
         self.config = config
         self.scheduler = self._create_scheduler()
         self.cleaned_up = False
         self.endpoint = None  # Initialize to None
+        self.container_id = None
+        self.load_balancer = load_balancer
+        self._shared_load_balancer = load_balancer is not None
+        self.autoscaler = None
+        self.health_monitor = None
+        self.metrics = _import("REGISTRY")
+        self.metrics_server = None
+        self.job_ids = []
+        self.job_endpoints: Dict[str, str] = {}
+        self._scale_lock = threading.Lock()
+        # set on cleanup, aborts the startup waits of instances still being added (e.g. health check replacements)
+        self._stopping = threading.Event()
+        self.response_cache = None
+        self.limiter = None
+        self.token_counter = None
+        self.tracer = None
+        self.swarm_id = None
+        self.lease = None
+        self.readiness = ReadinessTracker(
+            poll_interval=config.poll_interval,
+            max_poll_interval=config.max_poll_interval,
+            backoff=config.poll_backoff,
+            timeout=config.start_timeout,
+        )
         self._create_logs_folder()
         self._handle_debug_endpoint()
 
@@ -27,12 +103,20 @@ class LLMSwarm:
             os.makedirs(self.config.logs_folder)
 
     def _create_scheduler(self):
-        """Create and return the appropriate scheduler (SlurmScheduler or RunaiScheduler).
+        """Create and return the appropriate scheduler (SlurmScheduler, RunaiScheduler, RunaiWatchScheduler or LocalScheduler).
         
         Returns:
-            Union[SlurmScheduler, RunaiScheduler]: The created scheduler.
+            Union[SlurmScheduler, RunaiScheduler, RunaiWatchScheduler, LocalScheduler]: The created scheduler.
         """
-        return SlurmScheduler() if self.config.job_scheduler == "slurm" else RunaiScheduler()
+        # only the chosen scheduler's module (and its dependencies) is imported
+        if self.config.job_scheduler == "local":
+            return _import("LocalScheduler")(status_ttl=self.config.job_status_ttl)
+        if self.config.job_scheduler == "runai-watch":
+            return _import("RunaiWatchScheduler")(
+                status_ttl=self.config.job_status_ttl, namespace=self.config.kubernetes_namespace
+            )
+        scheduler_cls = _import("SlurmScheduler" if self.config.job_scheduler == "slurm" else "RunaiScheduler")
+        return scheduler_cls(status_ttl=self.config.job_status_ttl)
 
     def _handle_debug_endpoint(self):
         """Handle the setup of the debug endpoint if provided in the configuration."""
@@ -58,51 +142,136 @@ class LLMSwarm:
 
 
     def start(self):
-        """Start the job scheduling and wait for the endpoints to be reachable."""
+        """Start the job scheduling and wait for the endpoints to be reachable.
+
+        With `state_file` set, the swarm running there is reused when it is still healthy;
+        otherwise the new swarm is recorded there for later processes to attach to.
+        """
+        try:
+            if self.config.state_file and self._attach():
+                return
+        except BaseException:
+            # leaves the jobs of the swarm we were attaching to running
+            self.cleanup()
+            raise
+        try:
+            self._launch()
+        except BaseException:
+            # `__exit__` doesn't run when `__enter__` raises: don't leave the submitted jobs and the load balancer behind
+            self.terminate()
+            raise
+
+    def _launch(self) -> None:
+        """Submit the jobs, wait for their endpoints and serve them."""
         template = self.scheduler.read_job_template(self.config.template_path)
 
         job_timestamp, path, host_path, template = self.scheduler.generate_job_config(self.config, template)
 
+        self._job_config = (path, template, job_timestamp, host_path)
         job_ids = self.scheduler.start_jobs(path, template, job_timestamp, self.config.instances)
+        self.job_ids = job_ids
+        self._next_index = len(job_ids)
         self._wait_for_jobs_to_start(job_ids)
         self._wait_for_endpoints_to_be_reachable(host_path, job_ids)
 
-        if len(self.endpoints) == 1:
-            self.endpoint = self.endpoints[0]
-        else:
-            self._run_load_balancer(job_timestamp)
+        self._serve_endpoints(job_timestamp)
+
+        # the load balancer's labels, health checks and the state file need each endpoint's job
+        labeled = (self.load_balancer is not None or bool(self.config.state_file)) and self._resolve_job_endpoints()
+        if self.load_balancer is not None:
+            if labeled:
+                # label each endpoint's metrics with its job
+                for job_id, endpoint in self.job_endpoints.items():
+                    self.load_balancer.add_endpoint(endpoint, job_id)
+            else:
+                for endpoint in self.endpoints:
+                    self.load_balancer.add_endpoint(endpoint)
+            print(f"📈 metrics at {self.endpoint}{_import('METRICS_PATH')}")
+        if self.config.metrics_port is not None:
+            self.metrics_server = _import("MetricsServer")(self.metrics, port=self.config.metrics_port).start()
+            print(f"📈 metrics at {self.metrics_server.endpoint}")
+
+        if self.config.health_check_interval and self.load_balancer is not None and not labeled:
+            print(f"⚠️ health checks disabled: they need {self.config.template_path} to write '<endpoint> <job id>' to the hosts file")
+        elif self.config.health_check_interval and self.load_balancer is not None:
+            self.health_monitor = _import("HealthMonitor")(
+                self,
+                interval=self.config.health_check_interval,
+                probe_timeout=self.config.health_check_timeout,
+                failure_threshold=self.config.health_failure_threshold,
+                events_path=os.path.join(self.config.logs_folder, f"health_events_{job_timestamp}.jsonl"),
+            ).start()
 
         print(f"🔥 endpoint ready {self.endpoint}")
+        print(f"⏱️ startup timings\n{self.readiness.report()}")
+        if self.config.state_file and not labeled:
+            print(f"⚠️ swarm not recorded in {self.config.state_file}: other processes couldn't tell its endpoints' jobs apart")
+        elif self.config.state_file:
+            self._persist(job_timestamp)
 
         if self.config.inference_engine == "vllm":
             self.endpoint = f"{self.endpoint}/generate"
 
     def _wait_for_jobs_to_start(self, job_ids: List[str]) -> None:
-        """Wait for the jobs to start and log their progress.
+        """Wait for all the jobs to start concurrently and log their progress.
         
         Args:
             job_ids (List[str]): List of job IDs to wait for.
         """
+        # the status snapshot may predate the submission, where the new jobs look finished
+        self.scheduler.job_statuses.invalidate()
+
+        def job_started(job_id: str) -> bool:
+            self._raise_if_stopping()
+            # a job that ends while pending would otherwise be waited for until start_timeout, if ever
+            if self.scheduler.job_finished(job_id):
+                log_path = os.path.join(self.config.logs_folder, f"llm-swarm_{job_id}.out")
+                print(f"\n❌ Failed! Job {job_id} ended before running; checkout {log_path}")
+                raise RuntimeError(f"Job {job_id} ended before running")
+            return self.scheduler.is_job_running(job_id)
+
+        with Loader(f"Waiting for {len(job_ids)} jobs to be created"):
+            self.readiness.wait_until("jobs", job_ids, job_started)
+
         for job_id in job_ids:
-            with Loader(f"Waiting for {job_id} to be created"):
-                while not self.scheduler.is_job_running(job_id):
-                    sleep(3)
-                
             log_path = os.path.join(self.config.logs_folder, f"llm-swarm_{job_id}.out")
             print(f"📖 {self.config.job_scheduler} log path: {log_path}")
 
     def _wait_for_endpoints_to_be_reachable(self, host_path: str, job_ids: List[str]) -> None:
-        """Wait for the endpoints to become reachable.
+        """Wait for all the endpoints to become reachable concurrently.
         
         Args:
             host_path (str): The host path where endpoints will be listed.
             job_ids (List[str]): List of job IDs to check the endpoints for.
         """
         self.endpoints = self.scheduler.get_endpoints(host_path, self.config, self.config.instances, job_ids)
-        for endpoint in self.endpoints:
-            with Loader(f"Waiting for {endpoint} to be created"):
-                while not self.scheduler.check_if_endpoint_reachable(endpoint):
-                    sleep(3)
+        with Loader(f"Waiting for {len(self.endpoints)} endpoints to be reachable"):
+            self.readiness.wait_until("endpoints", self.endpoints, self._endpoint_probe(job_ids))
+
+    def _endpoint_probe(self, job_ids: List[str]) -> Callable[[str], bool]:
+        """Probe for the endpoints phase that fails as soon as one of the jobs dies, e.g. while loading the model."""
+
+        def reachable(endpoint: str) -> bool:
+            self._raise_if_stopping()
+            self.scheduler.make_sure_jobs_are_still_running(job_ids, self.config.logs_folder)
+            return self.scheduler.check_if_endpoint_reachable(endpoint)
+
+        return reachable
+
+    def _raise_if_stopping(self) -> None:
+        if self._stopping.is_set():
+            raise RuntimeError("The swarm is shutting down")
+
+    def _serve_endpoints(self, timestamp) -> None:
+        """Point `endpoint` at the instances: directly when there is a single one, through a load balancer otherwise."""
+        if self._shared_load_balancer:
+            self.endpoint = self.load_balancer.endpoint
+            return
+        elastic = self.config.max_instances is not None and self.config.max_instances > self.config.instances
+        if len(self.endpoints) == 1 and not elastic:
+            self.endpoint = self.endpoints[0]
+        else:
+            self._run_load_balancer(timestamp)
 
     def _run_load_balancer(self, timestamp):
         """Run the load balancer to distribute requests among multiple endpoints.
@@ -110,6 +279,18 @@ class LLMSwarm:
         Args:
             timestamp: Timestamp for logging and job identification.
         """      
+        if self.config.load_balancer == "python":
+            self.load_balancer = _import("LoadBalancer")(
+                self.endpoints,
+                policy=_import("ROUTING_POLICIES")[self.config.routing_policy](),
+                queue_poll_interval=self.config.engine_metrics_poll_interval,
+            ).start_in_thread()
+            self.endpoint = self.load_balancer.endpoint
+            return
+
+        import requests
+        from huggingface_hub import get_session
+
         with open(self.config.load_balancer_template_path) as f:
             load_balancer_template = f.read()
         servers = "\n".join([f"server {endpoint.replace('http://', '')};" for endpoint in self.endpoints])
@@ -142,8 +323,348 @@ class LLMSwarm:
                 except requests.exceptions.ConnectionError:
                     sleep(3)
 
+    def _persist(self, job_timestamp: str) -> None:
+        """Record the running swarm in `state_file`, renew its lease and start the reaper that tears it down once idle."""
+        from .lease import Lease, SwarmState, locked, write_state
+
+        path = os.path.abspath(self.config.state_file)
+        config = asdict(self.config)
+        # attaching processes bring their own token
+        config["huggingface_token"] = None
+        self.swarm_id = job_timestamp
+        state = SwarmState(
+            swarm_id=self.swarm_id,
+            config=config,
+            job_ids=list(self.job_ids),
+            job_endpoints=dict(self.job_endpoints),
+            job_config=list(self._job_config),
+            next_index=self._next_index,
+            load_balancer=self.endpoint if self.load_balancer is not None or self.container_id else None,
+            heartbeat=time.time(),
+            lease_timeout=self.config.lease_timeout,
+        )
+        with locked(path):
+            write_state(path, state)
+        self.lease = Lease(path, self.swarm_id, interval=min(60.0, self.config.lease_timeout / 4)).start()
+        with open(os.path.join(self.config.logs_folder, f"llm-swarm_lease_{self.swarm_id}.out"), "a") as log:
+            subprocess.Popen(
+                [sys.executable, "-m", "llm_swarm.lease", path, self.swarm_id],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        print(f"📌 swarm {self.swarm_id} recorded in {path}, kept for {self.config.lease_timeout:.0f}s once unused")
+
+    def _save_state(self) -> None:
+        """Update the jobs recorded in `state_file` after they changed, e.g. when scaling."""
+        if self.lease is None:
+            return
+        from .lease import locked, read_state, write_state
+
+        with locked(self.lease.path):
+            state = read_state(self.lease.path)
+            if state is None or state.swarm_id != self.swarm_id:
+                return
+            state.job_ids = list(self.job_ids)
+            state.job_endpoints = {job_id: self.job_endpoints[job_id] for job_id in self.job_ids if job_id in self.job_endpoints}
+            state.next_index = self._next_index
+            state.heartbeat = time.time()
+            write_state(self.lease.path, state)
+
+    def _attach(self) -> bool:
+        """Connect to the healthy instances of the swarm recorded in `state_file`.
+
+        Returns:
+            bool: False when there is no running swarm to attach to.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        from .health import probe_endpoint
+        from .lease import Lease, cancel_jobs, locked, read_state, remove_state, renew
+
+        path = os.path.abspath(self.config.state_file)
+        with locked(path):
+            state = read_state(path)
+            if state is not None and state.expired():
+                remove_state(path)
+        if state is None:
+            return False
+        if state.expired():
+            # its reaper missed the expiry (e.g. it died with its node, or is between two polls), and would give up
+            # once the new swarm replaces the state: cancel the jobs here, with the scheduler they were started with
+            print(f"💤 lease of swarm {state.swarm_id} in {path} expired, cancelling its {len(state.job_ids)} jobs")
+            cancel_jobs(state)
+            return False
+        for key in ("model", "revision", "inference_engine", "job_scheduler"):
+            if state.config.get(key) != getattr(self.config, key):
+                raise ValueError(
+                    f"{path} holds a running swarm with {key}={state.config.get(key)!r}, not {getattr(self.config, key)!r}"
+                )
+        # renewing first keeps the reaper from tearing the swarm down while we probe it
+        if renew(path, state.swarm_id) is None:
+            return False
+        with ThreadPoolExecutor(max_workers=min(32, max(1, len(state.job_endpoints)))) as pool:
+            reasons = dict(
+                zip(
+                    state.job_endpoints,
+                    pool.map(lambda endpoint: probe_endpoint(endpoint, self.config.health_check_timeout), state.job_endpoints.values()),
+                )
+            )
+        healthy = {job_id: endpoint for job_id, endpoint in state.job_endpoints.items() if reasons[job_id] is None}
+        if not healthy:
+            print(f"💀 no instance of swarm {state.swarm_id} in {path} answers, cancelling its jobs")
+            with locked(path):
+                remove_state(path)
+            self.scheduler.cleanup_jobs(state.job_ids)
+            return False
+
+        self.swarm_id = state.swarm_id
+        self.job_ids = list(state.job_ids)
+        self.job_endpoints = dict(state.job_endpoints)
+        self.endpoints = list(healthy.values())
+        self._job_config = tuple(state.job_config)
+        self._next_index = state.next_index
+        self.scheduler.attach_jobs(self._job_config[2], self.job_ids)
+        self.suggested_max_parallel_requests = self.config.per_instance_max_parallel_requests * len(healthy)
+        self._serve_endpoints(state.swarm_id)
+        if self.load_balancer is not None:
+            for job_id, endpoint in healthy.items():
+                self.load_balancer.add_endpoint(endpoint, job_id)
+        self.lease = Lease(path, self.swarm_id, interval=min(60.0, state.lease_timeout / 4)).start()
+        print(f"🔗 attached to swarm {self.swarm_id}: {len(healthy)}/{len(state.job_ids)} instances healthy, endpoint {self.endpoint}")
+
+        if self.config.inference_engine == "vllm":
+            self.endpoint = f"{self.endpoint}/generate"
+        return True
+
+    @classmethod
+    def attach(cls, state_file: str, **overrides) -> "LLMSwarm":
+        """Connect to the persistent swarm recorded in `state_file` by another process, without starting jobs.
+
+        The swarm is kept running while this process uses it; leaving it (`cleanup` or the end of
+        a `with` block) only releases this process's load balancer and lease.
+
+        Args:
+            state_file (str): The `state_file` of the swarm.
+            **overrides: `LLMSwarmConfig` fields to change for this process (e.g. `huggingface_token`).
+
+        Returns:
+            LLMSwarm: The attached swarm, ready to use.
+        """
+        from .lease import read_state
+
+        state = read_state(state_file)
+        if state is None or state.expired():
+            raise FileNotFoundError(f"No running swarm recorded in {state_file}")
+        config = LLMSwarmConfig(**{**state.config, **overrides, "state_file": state_file})
+        swarm = cls(config)
+        if not swarm._attach():
+            raise RuntimeError(f"The swarm recorded in {state_file} is no longer running")
+        return swarm
+
+    def terminate(self) -> None:
+        """Cancel the swarm's jobs now, even when it is persistent and other processes could still attach to it."""
+        if self.lease is not None:
+            from .lease import locked, remove_state
+
+            self.lease.stop()
+            with locked(self.lease.path):
+                remove_state(self.lease.path)
+            self.lease = None
+        self.cleanup()
+
+    def scale_to(self, instances: int, drain_timeout: float = 300) -> None:
+        """Grow or shrink the running swarm to `instances` without dropping in-flight requests.
+
+        New jobs are submitted and their endpoints added to the load balancer once reachable.
+        Removed endpoints stop receiving requests right away, and their jobs are cancelled
+        once the requests already sent to them complete (or after `drain_timeout` seconds).
+
+        Args:
+            instances (int): The number of instances wanted.
+            drain_timeout (float, optional): Seconds to wait for removed endpoints to drain. Defaults to 300.
+        """
+        if instances < 1:
+            raise ValueError("A swarm needs at least one instance")
+        if self.load_balancer is None:
+            raise RuntimeError("Scaling requires load_balancer='python' and max_instances > instances when starting")
+        with self._scale_lock:
+            current = len(self.job_ids)
+            if instances > current:
+                self._add_instances(instances - current)
+            elif instances < current:
+                self._remove_instances(current - instances, drain_timeout)
+            self.suggested_max_parallel_requests = self.config.per_instance_max_parallel_requests * len(self.job_ids)
+            if self.limiter is not None:
+                self.limiter.max_limit = 2 * self.suggested_max_parallel_requests
+
+    def _add_instances(self, count: int) -> List[str]:
+        new_job_ids = self._submit_instances(count)
+        self._admit_instances(self._wait_for_instances(new_job_ids))
+        return new_job_ids
+
+    def _submit_instances(self, count: int) -> List[str]:
+        """Start `count` jobs and add them to `job_ids`; call with `_scale_lock` held."""
+        path, template, job_timestamp, _ = self._job_config
+        new_job_ids = self.scheduler.start_jobs(path, template, job_timestamp, count, start_index=self._next_index)
+        self._next_index += count
+        self.job_ids = self.job_ids + new_job_ids
+        return new_job_ids
+
+    def _wait_for_instances(self, job_ids: List[str]) -> Dict[str, str]:
+        """Wait for submitted jobs to run and answer; returns their endpoints. Needs no lock."""
+        _, _, _, host_path = self._job_config
+        self._wait_for_jobs_to_start(job_ids)
+        job_endpoints = self.scheduler.get_job_endpoints(host_path, self.config, job_ids)
+        with Loader(f"Waiting for {len(job_endpoints)} endpoints to be reachable"):
+            self.readiness.wait_until("endpoints", list(job_endpoints.values()), self._endpoint_probe(job_ids))
+        return job_endpoints
+
+    def _admit_instances(self, job_endpoints: Dict[str, str]) -> None:
+        """Send requests to the endpoints of ready jobs; call with `_scale_lock` held."""
+        for job_id, endpoint in job_endpoints.items():
+            self.job_endpoints[job_id] = endpoint
+            self.load_balancer.add_endpoint(endpoint, job_id)
+        self.endpoints = self.endpoints + list(job_endpoints.values())
+        self._save_state()
+
+    def _resolve_job_endpoints(self) -> bool:
+        """Find the endpoint of each job; returns False when the hosts file only lists endpoints."""
+        _, _, _, host_path = self._job_config
+        unknown = [job_id for job_id in self.job_ids if job_id not in self.job_endpoints]
+        if unknown:
+            try:
+                self.job_endpoints.update(self.scheduler.get_job_endpoints(host_path, self.config, unknown))
+            except _import("UnlabeledEndpointsError"):
+                return False
+        return True
+
+    def _remove_instances(self, count: int, drain_timeout: float) -> None:
+        if not self._resolve_job_endpoints():
+            raise RuntimeError(f"Scaling down needs {self.config.template_path} to write '<endpoint> <job id>' to the hosts file")
+        # release the most recently added instances first
+        removed_job_ids = self.job_ids[-count:]
+        backends = [self.load_balancer.remove_endpoint(self.job_endpoints[job_id]) for job_id in removed_job_ids]
+        self.job_ids = self.job_ids[:-count]
+        self.endpoints = [self.job_endpoints[job_id] for job_id in self.job_ids]
+
+        deadline = time.monotonic() + drain_timeout
+        with Loader(f"Draining {count} endpoints"):
+            while any(backend and backend.outstanding for backend in backends) and time.monotonic() < deadline:
+                sleep(1)
+        self.scheduler.cleanup_jobs(removed_job_ids)
+        for job_id in removed_job_ids:
+            del self.job_endpoints[job_id]
+        self._save_state()
+
+    def replace_instance(self, job_id: str) -> Optional[str]:
+        """Cancel `job_id` and start a new instance in its place.
+
+        The old endpoint stops receiving requests right away; the new one is added to the
+        load balancer once it is reachable. The swarm can be scaled meanwhile: only swapping
+        the jobs and endpoints holds the scaling lock, not waiting for the new instance.
+
+        Args:
+            job_id (str): The job to replace.
+
+        Returns:
+            Optional[str]: The new job's ID, or None when `job_id` is no longer part of the swarm.
+        """
+        with self._scale_lock:
+            if job_id not in self.job_ids:
+                return None
+            endpoint = self.job_endpoints.pop(job_id, None)
+            if endpoint is not None and self.load_balancer is not None:
+                self.load_balancer.remove_endpoint(endpoint)
+            self.scheduler.cleanup_jobs([job_id])
+            self.job_ids = [other for other in self.job_ids if other != job_id]
+            self.endpoints = [other for other in self.endpoints if other != endpoint]
+            new_job_ids = self._submit_instances(1)
+        job_endpoints = self._wait_for_instances(new_job_ids)
+        with self._scale_lock:
+            # scaling down may have removed the new job while it started
+            self._admit_instances({job_id: endpoint for job_id, endpoint in job_endpoints.items() if job_id in self.job_ids})
+        return new_job_ids[0]
+
+    def autoscale(self, backlog: Callable[[], int], min_instances: int = 1, **kwargs) -> "Autoscaler":
+        """Scale the swarm in the background to follow `backlog`, between `min_instances` and `max_instances`.
+
+        Args:
+            backlog (Callable[[], int]): Returns the number of requests in flight or queued (e.g. `client.backlog`).
+            min_instances (int, optional): Lower bound. Defaults to 1.
+            **kwargs: Other `Autoscaler` arguments.
+
+        Returns:
+            Autoscaler: The started autoscaler, stopped on cleanup.
+        """
+        kwargs.setdefault("max_instances", self.config.max_instances or self.config.instances)
+        self.autoscaler = _import("Autoscaler")(self, backlog, min_instances=min_instances, **kwargs).start()
+        return self.autoscaler
+
+    def client(self, tenant: str = "default", priority: float = 0, weight: Optional[float] = None, **kwargs) -> "SwarmClient":
+        """Return an async generation client for the swarm's endpoint.
+
+        Clients share one adaptive concurrency limit, so the requests of several jobs using the
+        swarm from the same event loop are queued together: by `priority`, then in proportion
+        to the `weight` of their `tenant`.
+
+        Args:
+            tenant (str, optional): Name of the job using the client. Defaults to "default".
+            priority (float, optional): Priority of the client's requests over other tenants'. Defaults to 0.
+            weight (Optional[float], optional): Share of the swarm given to `tenant`. Defaults to None (1).
+            **kwargs: Overrides for `SwarmClient` arguments. Passing `limiter`, `max_parallel_requests`
+                or `adaptive_concurrency` gives the client its own limit.
+
+        Returns:
+            SwarmClient: A client sized to `suggested_max_parallel_requests`, using the swarm's
+                response cache when `response_cache_path` is set. With vLLM, which doesn't report
+                token counts, generated tokens are counted by a shared background `TokenCounter`.
+                With `trace_path` set, requests are traced to it (pass `swarm.tracer` to a `Pipeline`
+                to trace whole rows).
+        """
+        headers = {}
+        if self.config.debug_endpoint and self.config.huggingface_token:
+            headers["Authorization"] = f"Bearer {self.config.huggingface_token}"
+        if self.config.response_cache_path and self.response_cache is None:
+            self.response_cache = _import("ResponseCache")(
+                self.config.response_cache_path,
+                model=self.config.model,
+                revision=self.config.revision,
+                max_bytes=self.config.response_cache_max_bytes,
+            )
+        options = {
+            # behind a load balancer shared with other models, requests name this swarm's pool
+            "model": self.config.model if self._shared_load_balancer else None,
+            "inference_engine": self.config.inference_engine,
+            "max_parallel_requests": self.suggested_max_parallel_requests,
+            "headers": headers,
+            "cache": self.response_cache,
+            "tenant": tenant,
+            "priority": priority,
+            "weight": weight,
+        }
+        if not {"limiter", "max_parallel_requests", "adaptive_concurrency"} & kwargs.keys():
+            if self.limiter is None:
+                self.limiter = _import("AdaptiveConcurrencyLimiter")(
+                    initial_limit=max(1, self.suggested_max_parallel_requests // 4),
+                    max_limit=2 * self.suggested_max_parallel_requests,
+                )
+            options["limiter"] = self.limiter
+        if self.config.inference_engine == "vllm" and "token_counter" not in kwargs:
+            if self.token_counter is None:
+                self.token_counter = _import("TokenCounter")(self.config.model, revision=self.config.revision)
+            options["token_counter"] = self.token_counter
+        if self.config.trace_path and self.tracer is None:
+            self.tracer = _import("Tracer")(self.config.trace_path, sample_rate=self.config.trace_sample_rate)
+        options["tracer"] = self.tracer
+        options.update(kwargs)
+        return _import("SwarmClient")(self.endpoint, **options)
+
     def __enter__(self):
-        self.start()
+        # an attached swarm is already running
+        if not self.job_ids:
+            self.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -162,6 +683,8 @@ class LLMSwarm:
             List[str]: List of endpoints (e.g., ["http://26.0.154.245:13120"]).
         """
         
+        import requests
+
         endpoints = self.scheduler.get_endpoints(endpoint_path, config, instances, job_ids)
         for endpoint in endpoints:
             connected = False
@@ -173,17 +696,49 @@ class LLMSwarm:
                     sleep(3)
 
     def cleanup(self):
+        if self.response_cache is not None:
+            print(f"🗃️ response cache {self.response_cache.stats()}")
+            self.response_cache.close()
+            self.response_cache = None
+        if self.token_counter is not None:
+            self.token_counter.close()
+            self.token_counter = None
+        if self.tracer is not None:
+            self.tracer.close()
+            print(f"🔬 {self.tracer.traced} traces in {self.tracer.path}, see `python -m llm_swarm.tracing {self.tracer.path}`")
+            self.tracer = None
+        self.limiter = None
+        self.token_counter = None
         if self.config.debug_endpoint:
             return
         if self.cleaned_up:
             return
+        if self.autoscaler:
+            self.autoscaler.stop()
+        self._stopping.set()
+        if self.health_monitor:
+            # waits for the replacements in progress, whose jobs are then cancelled with the others
+            self.health_monitor.stop()
+        if self.lease is not None:
+            # persistent: the jobs outlive this process until the lease expires
+            self.lease.stop()
+            self.scheduler.shutdown()
+            print(f"💤 swarm {self.swarm_id} kept running, attach with LLMSwarm.attach({self.config.state_file!r})")
         else:
             self.scheduler.cleanup_jobs(self.job_ids)
-
-        print("inference instances terminated")
+            self.scheduler.shutdown()
+            print("inference instances terminated")
         
         if self.container_id:
             run_command(f"docker kill {self.container_id}")
             print("docker process terminated")
 
+        if self.load_balancer and not self._shared_load_balancer:
+            self.load_balancer.stop_thread()
+            print("load balancer terminated")
+
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
         self.cleaned_up = True
\ No newline at end of file
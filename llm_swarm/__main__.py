@@ -1,7 +1,7 @@
 from llm_swarm import LLMSwarmConfig, LLMSwarm
-from transformers import HfArgumentParser
+from llm_swarm.utils import DataclassArgumentParser
 
-parser = HfArgumentParser(LLMSwarmConfig)
+parser = DataclassArgumentParser(LLMSwarmConfig, prog="python -m llm_swarm")
 config = parser.parse_args_into_dataclasses()[0]
 with LLMSwarm(config) as llm_swarm:
     try:
@@ -0,0 +1,87 @@
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from . import LLMSwarm
+
+
+class Autoscaler:
+    def __init__(
+        self,
+        swarm: "LLMSwarm",
+        backlog: Callable[[], int],
+        min_instances: int = 1,
+        max_instances: int = 1,
+        target_backlog_per_instance: Optional[int] = None,
+        interval: float = 30,
+        scale_down_delay: float = 300,
+    ) -> None:
+        """Grow or shrink a running swarm to follow the backlog of a client.
+
+        Scaling up happens as soon as the backlog asks for more instances; scaling down only
+        once it has asked for fewer for `scale_down_delay` seconds, so a short lull doesn't
+        release GPUs that would have to load the model again right after.
+
+        Args:
+            swarm (LLMSwarm): The running swarm to scale.
+            backlog (Callable[[], int]): Returns the number of requests in flight or queued (e.g. `SwarmClient.backlog`).
+            min_instances (int, optional): Lower bound. Defaults to 1.
+            max_instances (int, optional): Upper bound. Defaults to 1.
+            target_backlog_per_instance (Optional[int], optional): Backlog one instance should serve.
+                Defaults to the swarm's `per_instance_max_parallel_requests`.
+            interval (float, optional): Seconds between two decisions. Defaults to 30.
+            scale_down_delay (float, optional): Seconds fewer instances must be wanted before scaling down. Defaults to 300.
+        """
+        if not (1 <= min_instances <= max_instances):
+            raise ValueError("Instances must satisfy 1 <= min_instances <= max_instances")
+        self.swarm = swarm
+        self.backlog = backlog
+        self.min_instances = min_instances
+        self.max_instances = max_instances
+        self.target_backlog_per_instance = target_backlog_per_instance or swarm.config.per_instance_max_parallel_requests
+        self.interval = interval
+        self.scale_down_delay = scale_down_delay
+        self._below_since: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def desired_instances(self, backlog: int) -> int:
+        wanted = math.ceil(backlog / self.target_backlog_per_instance)
+        return min(self.max_instances, max(self.min_instances, wanted))
+
+    def step(self) -> None:
+        """Take one scaling decision."""
+        current = len(self.swarm.job_ids)
+        desired = self.desired_instances(self.backlog())
+        if desired > current:
+            self._below_since = None
+            print(f"📈 scaling up from {current} to {desired} instances")
+            self.swarm.scale_to(desired)
+        elif desired < current:
+            now = time.monotonic()
+            if self._below_since is None:
+                self._below_since = now
+            elif now - self._below_since >= self.scale_down_delay:
+                self._below_since = None
+                print(f"📉 scaling down from {current} to {desired} instances")
+                self.swarm.scale_to(desired)
+        else:
+            self._below_since = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Autoscaling failed: {e}")
+
+    def start(self) -> "Autoscaler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,334 @@
+"""Benchmark an inference endpoint over a sweep of concurrency levels, prompt lengths and `max_new_tokens`.
+
+    python -m llm_swarm.bench run --endpoint http://localhost:6969 --concurrency 1,16,64 --output tgi.jsonl
+    python -m llm_swarm.bench compare tgi.jsonl vllm.jsonl
+
+Every request is streamed so time to first token (TTFT) and inter-token latency (ITL) are
+measured as the client sees them. Goodput counts only the requests meeting the latency SLOs.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, List, Literal, Optional, Sequence
+
+import aiohttp
+
+WORDS = (
+    "the of and to in is was for on that with as by at from his her which an be this are were had have not but "
+    "their first one all after who new two also been its other some when more into time years there would city "
+    "school year during world about most only between can later under over state made three many where may then"
+).split()
+
+
+@dataclass
+class RequestTiming:
+    """Timings of one streamed request.
+
+    Args:
+        ttft (Optional[float]): Seconds until the first token arrived.
+        e2e (float): Seconds until the response was complete.
+        tokens (int): Tokens received.
+        itl (List[float]): Seconds between consecutive tokens.
+        error (Optional[str]): Set when the request failed.
+    """
+
+    ttft: Optional[float] = None
+    e2e: float = 0.0
+    tokens: int = 0
+    itl: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class BenchResult:
+    """Aggregated metrics of one point of the sweep, written as one JSON line."""
+
+    label: str
+    inference_engine: str
+    concurrency: int
+    prompt_tokens: int
+    max_new_tokens: int
+    requests: int
+    errors: int
+    duration: float
+    output_tokens_per_s: float
+    requests_per_s: float
+    goodput: float
+    ttft_p50: Optional[float]
+    ttft_p95: Optional[float]
+    ttft_p99: Optional[float]
+    itl_p50: Optional[float]
+    itl_p95: Optional[float]
+    itl_p99: Optional[float]
+    e2e_p50: Optional[float]
+    e2e_p95: Optional[float]
+    e2e_p99: Optional[float]
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def key(self) -> tuple:
+        return (self.concurrency, self.prompt_tokens, self.max_new_tokens)
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def make_prompt(tokens: int, rng: random.Random) -> str:
+    """A prompt of roughly `tokens` tokens (one common English word is about one token), distinct per call."""
+    return " ".join(rng.choice(WORDS) for _ in range(tokens))
+
+
+async def _stream_tgi(
+    session: aiohttp.ClientSession, endpoint: str, prompt: str, max_new_tokens: int
+) -> AsyncIterator[int]:
+    payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_new_tokens, "details": True}}
+    async with session.post(f"{endpoint}/generate_stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            event = json.loads(line[5:])
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            if not (event.get("token") or {}).get("special"):
+                yield 1
+
+
+async def _stream_vllm(
+    session: aiohttp.ClientSession, endpoint: str, prompt: str, max_new_tokens: int
+) -> AsyncIterator[int]:
+    payload = {"prompt": prompt, "max_tokens": max_new_tokens, "ignore_eos": True, "stream": True}
+    async with session.post(f"{endpoint}/generate", json=payload) as response:
+        response.raise_for_status()
+        buffer = b""
+        async for chunk in response.content.iter_any():
+            buffer += chunk
+            # vLLM's api_server sends NUL-terminated JSON objects, one per decoding step
+            *events, buffer = buffer.split(b"\0")
+            for event in events:
+                if event:
+                    yield 1
+
+
+async def stream_tokens(
+    session: aiohttp.ClientSession,
+    endpoint: str,
+    inference_engine: Literal["tgi", "vllm"],
+    prompt: str,
+    max_new_tokens: int,
+) -> RequestTiming:
+    """Send one streaming request and time the arrival of every token."""
+    stream = _stream_vllm if inference_engine == "vllm" else _stream_tgi
+    timing = RequestTiming()
+    start = last = time.perf_counter()
+    try:
+        async for tokens in stream(session, endpoint, prompt, max_new_tokens):
+            now = time.perf_counter()
+            if timing.ttft is None:
+                timing.ttft = now - start
+            else:
+                timing.itl.append(now - last)
+            timing.tokens += tokens
+            last = now
+    except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, ValueError) as e:
+        timing.error = repr(e)
+    timing.e2e = time.perf_counter() - start
+    return timing
+
+
+async def run_point(
+    endpoint: str,
+    inference_engine: Literal["tgi", "vllm"],
+    concurrency: int,
+    prompt_tokens: int,
+    max_new_tokens: int,
+    requests: int,
+    label: str = "",
+    slo_ttft: float = 2.0,
+    slo_itl: float = 0.1,
+    timeout: float = 600,
+    seed: int = 0,
+) -> BenchResult:
+    """Run `requests` requests with `concurrency` of them in flight at all times and aggregate their timings."""
+    rng = random.Random(seed)
+    prompts = [make_prompt(prompt_tokens, rng) for _ in range(requests)]
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timings: List[RequestTiming] = []
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+
+        async def worker(queue: List[str]) -> None:
+            while queue:
+                prompt = queue.pop()
+                timings.append(await stream_tokens(session, endpoint, inference_engine, prompt, max_new_tokens))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(prompts) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    succeeded = [timing for timing in timings if timing.error is None]
+    itls = [itl for timing in succeeded for itl in timing.itl]
+    good = [
+        timing
+        for timing in succeeded
+        if timing.ttft is not None
+        and timing.ttft <= slo_ttft
+        and (not timing.itl or sum(timing.itl) / len(timing.itl) <= slo_itl)
+    ]
+    ttfts = [timing.ttft for timing in succeeded if timing.ttft is not None]
+    e2es = [timing.e2e for timing in succeeded]
+    return BenchResult(
+        label=label,
+        inference_engine=inference_engine,
+        concurrency=concurrency,
+        prompt_tokens=prompt_tokens,
+        max_new_tokens=max_new_tokens,
+        requests=len(timings),
+        errors=len(timings) - len(succeeded),
+        duration=duration,
+        output_tokens_per_s=sum(timing.tokens for timing in succeeded) / duration,
+        requests_per_s=len(succeeded) / duration,
+        goodput=len(good) / duration,
+        ttft_p50=percentile(ttfts, 0.5),
+        ttft_p95=percentile(ttfts, 0.95),
+        ttft_p99=percentile(ttfts, 0.99),
+        itl_p50=percentile(itls, 0.5),
+        itl_p95=percentile(itls, 0.95),
+        itl_p99=percentile(itls, 0.99),
+        e2e_p50=percentile(e2es, 0.5),
+        e2e_p95=percentile(e2es, 0.95),
+        e2e_p99=percentile(e2es, 0.99),
+    )
+
+
+async def sweep(
+    endpoint: str,
+    inference_engine: Literal["tgi", "vllm"] = "tgi",
+    concurrency: Sequence[int] = (1, 8, 32, 128),
+    prompt_tokens: Sequence[int] = (128,),
+    max_new_tokens: Sequence[int] = (256,),
+    requests_per_concurrency: int = 4,
+    min_requests: int = 32,
+    output: Optional[str] = None,
+    **kwargs,
+) -> List[BenchResult]:
+    """Benchmark every combination of `concurrency`, `prompt_tokens` and `max_new_tokens`.
+
+    Args:
+        endpoint (str): Base URL of a TGI or vLLM endpoint (`/generate` is stripped), e.g. `LLMSwarm.endpoint`.
+        inference_engine (Literal["tgi", "vllm"], optional): Engine behind the endpoint. Defaults to "tgi".
+        concurrency (Sequence[int], optional): Requests in flight. Defaults to (1, 8, 32, 128).
+        prompt_tokens (Sequence[int], optional): Approximate prompt lengths. Defaults to (128,).
+        max_new_tokens (Sequence[int], optional): Tokens to generate. Defaults to (256,).
+        requests_per_concurrency (int, optional): Requests sent per request in flight. Defaults to 4.
+        min_requests (int, optional): Requests sent per point at least. Defaults to 32.
+        output (Optional[str], optional): JSON lines file the results are appended to. Defaults to None.
+        **kwargs: Other `run_point` arguments (label, slo_ttft, slo_itl, timeout, seed).
+
+    Returns:
+        List[BenchResult]: One result per point.
+    """
+    endpoint = endpoint.rstrip("/")
+    if endpoint.endswith("/generate"):
+        endpoint = endpoint[: -len("/generate")]
+    results = []
+    for level, prompt_length, new_tokens in itertools.product(concurrency, prompt_tokens, max_new_tokens):
+        requests = max(min_requests, requests_per_concurrency * level)
+        result = await run_point(endpoint, inference_engine, level, prompt_length, new_tokens, requests, **kwargs)
+        print(
+            f"⏱️ concurrency={level} prompt={prompt_length} new={new_tokens}: "
+            f"{result.output_tokens_per_s:.0f} tok/s, goodput {result.goodput:.2f} req/s, "
+            f"ttft p95 {_format(result.ttft_p95)}, itl p95 {_format(result.itl_p95)}, errors {result.errors}"
+        )
+        results.append(result)
+        if output:
+            with open(output, "a") as f:
+                f.write(json.dumps(asdict(result)) + "\n")
+    return results
+
+
+def load_results(path: str) -> List[BenchResult]:
+    with open(path) as f:
+        return [BenchResult(**json.loads(line)) for line in f if line.strip()]
+
+
+def _format(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def compare(baseline: List[BenchResult], candidate: List[BenchResult]) -> str:
+    """Side by side table of the points both runs have in common (the latest result of each point is used)."""
+    base = {result.key: result for result in baseline}
+    other = {result.key: result for result in candidate}
+    lines = [f"{'concurrency':>11} {'prompt':>6} {'new':>5} | {'tok/s':>17} {'goodput':>15} {'e2e p95':>19}"]
+    for key in sorted(base.keys() & other.keys()):
+        a, b = base[key], other[key]
+
+        def change(x: Optional[float], y: Optional[float]) -> str:
+            if not x or y is None:
+                return ""
+            return f"({(y - x) / x:+.0%})"
+
+        lines.append(
+            f"{key[0]:>11} {key[1]:>6} {key[2]:>5} | "
+            f"{b.output_tokens_per_s:>8.0f} {change(a.output_tokens_per_s, b.output_tokens_per_s):>8} "
+            f"{b.goodput:>7.2f} {change(a.goodput, b.goodput):>7} "
+            f"{_format(b.e2e_p95):>10} {change(a.e2e_p95, b.e2e_p95):>8}"
+        )
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TGI or vLLM endpoints")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Sweep concurrency, prompt lengths and max_new_tokens against an endpoint")
+    run.add_argument("--endpoint", required=True)
+    run.add_argument("--inference-engine", choices=["tgi", "vllm"], default="tgi")
+    run.add_argument("--concurrency", type=_int_list, default=[1, 8, 32, 128])
+    run.add_argument("--prompt-tokens", type=_int_list, default=[128])
+    run.add_argument("--max-new-tokens", type=_int_list, default=[256])
+    run.add_argument("--requests-per-concurrency", type=int, default=4)
+    run.add_argument("--min-requests", type=int, default=32)
+    run.add_argument("--slo-ttft", type=float, default=2.0, help="Seconds to first token for a request to count in goodput")
+    run.add_argument("--slo-itl", type=float, default=0.1, help="Mean seconds between tokens for goodput")
+    run.add_argument("--label", default="", help="Name of the run in the results, e.g. the template benchmarked")
+    run.add_argument("--output", default=None, help="JSON lines file the results are appended to")
+    comparison = subparsers.add_parser("compare", help="Compare two result files point by point")
+    comparison.add_argument("baseline")
+    comparison.add_argument("candidate")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        print(compare(load_results(args.baseline), load_results(args.candidate)))
+        return
+    asyncio.run(
+        sweep(
+            args.endpoint,
+            args.inference_engine,
+            concurrency=args.concurrency,
+            prompt_tokens=args.prompt_tokens,
+            max_new_tokens=args.max_new_tokens,
+            requests_per_concurrency=args.requests_per_concurrency,
+            min_requests=args.min_requests,
+            output=args.output,
+            label=args.label,
+            slo_ttft=args.slo_ttft,
+            slo_itl=args.slo_itl,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
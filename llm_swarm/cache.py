@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    finish_reason TEXT,
+    generated_tokens INTEGER,
+    prompt_tokens INTEGER,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+# columns added after the first version of the schema, with their type
+ADDED_COLUMNS = {"generated_tokens": "INTEGER", "prompt_tokens": "INTEGER"}
+
+
+@dataclass
+class CachedResponse:
+    """What the cache keeps of a response."""
+
+    text: str
+    finish_reason: Optional[str] = None
+    generated_tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str,
+        model: str = "",
+        revision: str = "main",
+        max_bytes: Optional[int] = 10 * 1024**3,
+    ) -> None:
+        """On-disk cache of generated responses, content-addressed by everything that determines them.
+
+        Entries are keyed by a hash of the model, its revision and the engine request
+        (rendered prompt and generation parameters, seed included), so a rerun only hits
+        entries it would have generated identically, and changing any of them misses.
+        When the stored texts exceed `max_bytes`, the least recently used entries are evicted.
+        From an event loop, use `aget` and `aput`, which run the SQLite statements in a worker thread.
+
+        Args:
+            path (str): SQLite database file, created if needed.
+            model (str, optional): Model served by the swarm. Defaults to "".
+            revision (str, optional): Revision of the model. Defaults to "main".
+            max_bytes (Optional[int], optional): Size of the stored texts above which entries are evicted.
+                Defaults to 10 GiB. None never evicts.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.model = model
+        self.revision = revision
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(responses)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE responses ADD COLUMN {column} {column_type}")
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def key(self, payload: Dict[str, Any]) -> str:
+        """Hash the model, revision and engine request body into a cache key."""
+        content = json.dumps({"model": self.model, "revision": self.revision, "payload": payload}, sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached response for `key`, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT text, finish_reason, generated_tokens, prompt_tokens, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self.bytes_saved += row[4]
+        return CachedResponse(*row[:4])
+
+    def put(
+        self,
+        key: str,
+        text: str,
+        finish_reason: Optional[str] = None,
+        generated_tokens: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> None:
+        size = len(text.encode())
+        now = time.time()
+        with self._lock:
+            previous = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, text, finish_reason, generated_tokens, prompt_tokens, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, text, finish_reason, generated_tokens, prompt_tokens, size, now, now),
+            )
+            self._size += size - (previous[0] if previous else 0)
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            # a single thread: SQLite runs one statement at a time anyway, and writes stay in order
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def aget(self, key: str) -> Optional[CachedResponse]:
+        """`get` without blocking the event loop on the database."""
+        return await self._run(self.get, key)
+
+    async def aput(
+        self,
+        key: str,
+        text: str,
+        finish_reason: Optional[str] = None,
+        generated_tokens: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> None:
+        """`put` without blocking the event loop on the database's commit."""
+        await self._run(self.put, key, text, finish_reason, generated_tokens, prompt_tokens)
+
+    def _evict(self) -> None:
+        # evict down to 90% of the budget so eviction doesn't run again on the next insert
+        target = int(self.max_bytes * 0.9)
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "size_bytes": self._size,
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,506 @@
+import asyncio
+import dataclasses
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal, Optional, Sequence, Union
+
+import aiohttp
+
+from .cache import ResponseCache
+from .concurrency import DEFAULT_TENANT, AdaptiveConcurrencyLimiter, DeadlineExceeded
+from .metrics import CLIENT_GENERATED_TOKENS, CLIENT_LATENCY, CLIENT_QUEUE_WAIT, CLIENT_REQUESTS, CLIENT_RETRIES
+from .routing import AFFINITY_KEY_HEADER, MODEL_HEADER, PROMPT_TOKENS_HEADER
+from .tokens import TokenCounter
+from .tracing import Trace, Tracer, current_trace, span
+
+# statuses with which engines and load balancers signal they can't take more requests
+OVERLOADED_STATUSES = {429, 503}
+
+
+def _retryable(error: Exception) -> bool:
+    """Whether another attempt may succeed: timeouts, connection errors, 429 and 5xx, not a request the engine rejects."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return True
+
+
+@dataclass
+class GenerationRequest:
+    """One text generation request, independent of the inference engine serving it.
+
+    Args:
+        prompt (str): The fully rendered prompt.
+        max_new_tokens (int): Maximum number of tokens to generate.
+        stop_sequences (List[str]): Stop generating when one of these is produced; it is stripped from the text.
+        affinity_key (Optional[str]): Requests with the same key are routed to the same instance
+            when the load balancer uses `routing_policy="prefix_affinity"`.
+        prompt_tokens (Optional[int]): Length of the prompt in tokens, when known (e.g. from `PromptRenderer`);
+            sent along so the load balancer routes on it instead of estimating it.
+        priority (float): When the client's concurrency limit is reached, requests with a higher
+            priority are sent first. Added to the client's own priority.
+        deadline (Optional[float]): Seconds after which the response is no longer useful: the request
+            is dropped if still queued, and not retried past it.
+        model (Optional[str]): Model pool to generate with, in a swarm serving several models.
+            Defaults to the client's `model`.
+        metadata (Dict[str, Any]): Free-form data carried over to the response (e.g. the dataset row).
+    """
+
+    prompt: str
+    max_new_tokens: int = 256
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    repetition_penalty: Optional[float] = None
+    do_sample: Optional[bool] = None
+    seed: Optional[int] = None
+    stop_sequences: List[str] = field(default_factory=list)
+    affinity_key: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    priority: float = 0
+    deadline: Optional[float] = None
+    model: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class GenerationResponse:
+    """The result of a `GenerationRequest`.
+
+    Args:
+        request (GenerationRequest): The request this responds to.
+        text (str): The generated text, without the prompt and the trailing stop sequence.
+        finish_reason (Optional[str]): Why generation stopped, when the engine reports it.
+        latency (float): Seconds from sending the request to receiving the full response.
+        attempts (int): Number of times the request was sent.
+        error (Optional[str]): Set when every attempt failed; `text` is then empty.
+        cached (bool): Whether the response came from the client's `ResponseCache` instead of the swarm.
+        generated_tokens (Optional[int]): Tokens generated, as reported by the engine (or counted by the
+            client's `TokenCounter` when the engine doesn't report it).
+        prompt_tokens (Optional[int]): Tokens of the prompt, when the engine reports it.
+    """
+
+    request: GenerationRequest
+    text: str
+    finish_reason: Optional[str] = None
+    latency: float = 0.0
+    attempts: int = 1
+    error: Optional[str] = None
+    cached: bool = False
+    generated_tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+
+
+class SwarmClient:
+    def __init__(
+        self,
+        endpoint: str,
+        inference_engine: Literal["tgi", "vllm"] = "tgi",
+        max_parallel_requests: int = 128,
+        timeout: float = 300,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        headers: Optional[Dict[str, str]] = None,
+        adaptive_concurrency: bool = True,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        tenant: str = DEFAULT_TENANT,
+        priority: float = 0,
+        weight: Optional[float] = None,
+        token_counter: Optional[TokenCounter] = None,
+        tracer: Optional[Tracer] = None,
+        model: Optional[str] = None,
+        model_engines: Optional[Dict[str, Literal["tgi", "vllm"]]] = None,
+        model_limiters: Optional[Dict[str, AdaptiveConcurrencyLimiter]] = None,
+    ) -> None:
+        """Asynchronous generation client for a swarm endpoint, speaking TGI or vLLM.
+
+        A single keep-alive connection pool is shared by all requests, so it must be used
+        from one event loop (e.g. inside `asyncio.run`). By default the number of requests
+        in flight adapts to the swarm's latency, queue time and overload errors, starting from
+        a quarter of `max_parallel_requests` (see `AdaptiveConcurrencyLimiter`).
+
+        Args:
+            endpoint (str): The swarm's endpoint (`LLMSwarm.endpoint`).
+            inference_engine (Literal["tgi", "vllm"], optional): Engine behind the endpoint. Defaults to "tgi".
+            max_parallel_requests (int, optional): Expected (or, without adaptive concurrency, fixed) number of
+                requests in flight. Defaults to 128.
+            timeout (float, optional): Seconds to wait for a response. Defaults to 300.
+            max_retries (int, optional): Attempts before a request is reported as failed. Defaults to 3.
+            retry_delay (float, optional): Delay before the first retry, doubled after each one. Defaults to 1.0.
+            headers (Optional[Dict[str, str]], optional): Extra headers sent with every request. Defaults to None.
+            adaptive_concurrency (bool, optional): Adapt the concurrency between 1 and twice `max_parallel_requests`
+                instead of keeping it fixed. Defaults to True.
+            limiter (Optional[AdaptiveConcurrencyLimiter], optional): Custom limiter, overrides
+                `adaptive_concurrency`. Defaults to None.
+            cache (Optional[ResponseCache], optional): Answer requests already generated from this cache,
+                and store new responses in it. Defaults to None.
+            tenant (str, optional): Name under which this client's requests share a `limiter` with other
+                clients (e.g. the jobs using one swarm). Defaults to "default".
+            priority (float, optional): Priority added to every request of this client, e.g. to let an
+                interactive evaluation overtake a bulk generation job. Defaults to 0.
+            weight (Optional[float], optional): Share of the limiter's slots this tenant gets relative to
+                the others at the same priority. Defaults to None (1).
+            token_counter (Optional[TokenCounter], optional): Counts the generated tokens in a background
+                worker when the engine doesn't report them (vLLM's `/generate`). Defaults to None.
+            tracer (Optional[Tracer], optional): Records the stages of (a sample of) the requests. Defaults to None.
+            model (Optional[str], optional): Model pool of the requests that don't name one, in a swarm serving
+                several models. Defaults to None.
+            model_engines (Optional[Dict[str, Literal["tgi", "vllm"]]], optional): Engine of each model pool, when
+                they differ; `endpoint` is then the load balancer's root and each request is sent to its engine's
+                path. Defaults to None (`inference_engine` for every model).
+            model_limiters (Optional[Dict[str, AdaptiveConcurrencyLimiter]], optional): Concurrency limit of each
+                model pool, so a slow model doesn't hold back the others. Defaults to None (`limiter` for every model).
+        """
+        self.endpoint = endpoint
+        self.inference_engine = inference_engine
+        self.max_parallel_requests = max_parallel_requests
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        if limiter is None:
+            if adaptive_concurrency:
+                limiter = AdaptiveConcurrencyLimiter(
+                    initial_limit=max(1, max_parallel_requests // 4), max_limit=2 * max_parallel_requests
+                )
+            else:
+                limiter = AdaptiveConcurrencyLimiter(
+                    initial_limit=max_parallel_requests, min_limit=max_parallel_requests, max_limit=max_parallel_requests
+                )
+        self.limiter = limiter
+        self.cache = cache
+        self.tenant = tenant
+        self.priority = priority
+        self.token_counter = token_counter
+        self.tracer = tracer
+        self.model = model
+        self.model_engines = model_engines or {}
+        self.model_limiters = model_limiters or {}
+        if weight is not None:
+            for shared_limiter in self._limiters():
+                shared_limiter.set_weight(tenant, weight)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "SwarmClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    def _limiters(self) -> List[AdaptiveConcurrencyLimiter]:
+        limiters = [self.limiter]
+        for limiter in self.model_limiters.values():
+            if all(limiter is not other for other in limiters):
+                limiters.append(limiter)
+        return limiters
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # one connection pool for every model
+            limit = int(sum(limiter.max_limit for limiter in self._limiters()))
+            connector = aiohttp.TCPConnector(limit=limit, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+        return self._session
+
+    @property
+    def backlog(self) -> int:
+        """Requests sent or waiting to be sent, e.g. to drive `LLMSwarm.autoscale`."""
+        return sum(limiter.in_flight + limiter.waiting for limiter in self._limiters())
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def engine(self, request: GenerationRequest) -> str:
+        """Inference engine serving the request's model."""
+        return self.model_engines.get(request.model or self.model, self.inference_engine)
+
+    def url(self, request: GenerationRequest) -> str:
+        if not self.model_engines:
+            return self.endpoint
+        # the endpoint is the root of a load balancer serving several engines
+        return self.endpoint + ("/generate" if self.engine(request) == "vllm" else "/")
+
+    def build_payload(self, request: GenerationRequest) -> Dict[str, Any]:
+        """Translate a request into the engine's `/generate` JSON body."""
+        if self.engine(request) == "vllm":
+            payload = {"prompt": request.prompt, "max_tokens": request.max_new_tokens}
+            for key, value in (
+                ("temperature", request.temperature),
+                ("top_p", request.top_p),
+                ("top_k", request.top_k),
+                ("repetition_penalty", request.repetition_penalty),
+                ("seed", request.seed),
+            ):
+                if value is not None:
+                    payload[key] = value
+            if request.stop_sequences:
+                payload["stop"] = request.stop_sequences
+            return payload
+
+        # `details` makes TGI report the number of generated tokens and the finish reason
+        parameters = {"max_new_tokens": request.max_new_tokens, "details": True}
+        for key, value in (
+            ("temperature", request.temperature),
+            ("top_p", request.top_p),
+            ("top_k", request.top_k),
+            ("repetition_penalty", request.repetition_penalty),
+            ("do_sample", request.do_sample),
+            ("seed", request.seed),
+        ):
+            if value is not None:
+                parameters[key] = value
+        if request.stop_sequences:
+            parameters["stop"] = request.stop_sequences
+        return {"inputs": request.prompt, "parameters": parameters}
+
+    def parse_response(self, request: GenerationRequest, body: Any) -> GenerationResponse:
+        """Translate the engine's JSON response into a `GenerationResponse`."""
+        if self.engine(request) == "vllm":
+            # vLLM's api_server echoes the prompt in front of the completion
+            text = body["text"][0][len(request.prompt) :]
+            finish_reason = None
+            generated_tokens = None
+        else:
+            # TGI answers a list on `/` and an object on `/generate`
+            if isinstance(body, list):
+                body = body[0]
+            text = body["generated_text"]
+            details = body.get("details") or {}
+            finish_reason = details.get("finish_reason")
+            generated_tokens = details.get("generated_tokens")
+        for stop_sequence in request.stop_sequences:
+            if text.endswith(stop_sequence):
+                text = text[: -len(stop_sequence)].rstrip()
+                break
+        return GenerationResponse(request=request, text=text, finish_reason=finish_reason, generated_tokens=generated_tokens)
+
+    async def _send(self, request: GenerationRequest, deadline: Optional[float] = None) -> GenerationResponse:
+        session = self._get_session()
+        headers = {}
+        if request.affinity_key is not None:
+            headers[AFFINITY_KEY_HEADER] = request.affinity_key
+        if request.prompt_tokens is not None:
+            headers[PROMPT_TOKENS_HEADER] = str(request.prompt_tokens)
+        model = request.model or self.model
+        if model is not None:
+            headers[MODEL_HEADER] = model
+        limiter = self.model_limiters.get(model, self.limiter)
+        data = json.dumps(self.build_payload(request))
+        trace = current_trace()
+        queued_at = time.perf_counter()
+        slot = await limiter.acquire(self.priority + request.priority, self.tenant, deadline)
+        start = time.perf_counter()
+        CLIENT_QUEUE_WAIT.observe(start - queued_at, tenant=self.tenant)
+        if trace is not None:
+            trace.add("queue", queued_at, start)
+        # an explicit `timeout=None` would disable the session's timeout, so always pass one
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = aiohttp.ClientTimeout(total=min(self.timeout.total, max(0.0, deadline - time.monotonic())))
+        queue_time = inference_time = None
+        end = None
+        try:
+            async with session.post(self.url(request), data=data, headers=headers, timeout=timeout) as response:
+                body = await response.read()
+                end = time.perf_counter()
+                if response.status >= 400:
+                    slot.release(overloaded=response.status in OVERLOADED_STATUSES)
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, (), status=response.status, message=body.decode(errors="replace")
+                    )
+                # TGI reports the queue and inference times in milliseconds
+                queue_time = response.headers.get("x-queue-time")
+                inference_time = response.headers.get("x-inference-time")
+                generated_tokens = response.headers.get("x-generated-tokens")
+                prompt_tokens = response.headers.get("x-prompt-tokens")
+            latency = end - start
+            with span("postprocess"):
+                result = self.parse_response(request, json.loads(body))
+                result.latency = latency
+                if result.generated_tokens is None and generated_tokens:
+                    result.generated_tokens = int(generated_tokens)
+                result.prompt_tokens = int(prompt_tokens) if prompt_tokens else request.prompt_tokens
+                if result.generated_tokens is None and self.token_counter is not None:
+                    result.generated_tokens = await self.token_counter.count(result.text)
+            # the limiter normalises the latency by the tokens actually generated; without a count, it ignores it
+            slot.release(
+                latency,
+                tokens=result.generated_tokens,
+                queue_time=float(queue_time) / 1000 if queue_time else None,
+            )
+        except asyncio.TimeoutError:
+            # running out of time because of the deadline says nothing about the swarm's load
+            slot.release(overloaded=deadline is None or time.monotonic() < deadline)
+            raise
+        finally:
+            slot.release()
+            if trace is not None:
+                self._trace_attempt(trace, start, end or time.perf_counter(), queue_time, inference_time)
+        CLIENT_LATENCY.observe(latency, tenant=self.tenant)
+        if result.generated_tokens:
+            CLIENT_GENERATED_TOKENS.inc(result.generated_tokens, tenant=self.tenant)
+        return result
+
+    @staticmethod
+    def _trace_attempt(
+        trace: Trace, start: float, end: float, queue_time: Optional[str], inference_time: Optional[str]
+    ) -> None:
+        """Split an attempt into network and engine time, using the engine's timing headers when it sends them."""
+        if queue_time is None or inference_time is None:
+            trace.add("request", start, end)
+            return
+        inference_start = max(start, end - float(inference_time) / 1000)
+        engine_start = max(start, inference_start - float(queue_time) / 1000)
+        trace.add("network", start, engine_start)
+        trace.add("engine_queue", engine_start, inference_start)
+        trace.add("engine", inference_start, end)
+
+    async def generate(self, request: Union[GenerationRequest, str], **parameters) -> GenerationResponse:
+        """Generate a completion, retrying failed attempts with exponential backoff.
+
+        Timeouts, connection errors, 429 and 5xx responses are retried; other 4xx responses (e.g. a
+        prompt too long for the model) are raised at once.
+
+        Args:
+            request (Union[GenerationRequest, str]): The request, or a prompt combined with `parameters`.
+            **parameters: `GenerationRequest` fields used when `request` is a prompt.
+
+        Raises:
+            aiohttp.ClientError: When every attempt failed, or the request was rejected.
+            DeadlineExceeded: When the request's deadline passed first.
+
+        Returns:
+            GenerationResponse: The generated text, served from `cache` without a request when it is there.
+        """
+        if isinstance(request, str):
+            request = GenerationRequest(prompt=request, **parameters)
+        if self.tracer is None:
+            return await self._generate(request)
+        with self.tracer.trace(tenant=self.tenant) as trace:
+            try:
+                response = await self._generate(request)
+            except Exception as e:
+                if trace is not None:
+                    trace.attrs["error"] = type(e).__name__
+                raise
+            if trace is not None:
+                trace.attrs["attempts"] = trace.attrs.get("attempts", 0) + response.attempts
+                trace.attrs["generated_tokens"] = (trace.attrs.get("generated_tokens") or 0) + (response.generated_tokens or 0)
+            return response
+
+    async def _generate(self, request: GenerationRequest) -> GenerationResponse:
+        cache_key = None
+        if self.cache is not None:
+            with span("cache"):
+                payload = self.build_payload(request)
+                if request.model is not None:
+                    # the cache is keyed by one model; requests naming theirs are keyed by it too
+                    payload["model"] = request.model
+                cache_key = self.cache.key(payload)
+                cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                CLIENT_REQUESTS.inc(tenant=self.tenant, outcome="cached")
+                return GenerationResponse(
+                    request=request,
+                    text=cached.text,
+                    finish_reason=cached.finish_reason,
+                    attempts=0,
+                    cached=True,
+                    generated_tokens=cached.generated_tokens,
+                    prompt_tokens=cached.prompt_tokens,
+                )
+        deadline = time.monotonic() + request.deadline if request.deadline is not None else None
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 1):
+            if deadline is not None and time.monotonic() >= deadline:
+                CLIENT_REQUESTS.inc(tenant=self.tenant, outcome="deadline")
+                raise DeadlineExceeded(f"Deadline of {request.deadline}s passed after {attempt - 1} attempts")
+            try:
+                response = await self._send(request, deadline)
+                response.attempts = attempt
+                CLIENT_REQUESTS.inc(tenant=self.tenant, outcome="ok")
+                if cache_key is not None:
+                    with span("cache"):
+                        await self.cache.aput(
+                            cache_key, response.text, response.finish_reason, response.generated_tokens, response.prompt_tokens
+                        )
+                return response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries or not _retryable(e):
+                    CLIENT_REQUESTS.inc(tenant=self.tenant, outcome="error")
+                    raise
+                CLIENT_RETRIES.inc(tenant=self.tenant)
+                with span("backoff"):
+                    await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _generate_or_error(self, request: GenerationRequest) -> GenerationResponse:
+        try:
+            return await self.generate(request)
+        except (aiohttp.ClientError, asyncio.TimeoutError, DeadlineExceeded, ValueError, KeyError) as e:
+            return GenerationResponse(request=request, text="", attempts=self.max_retries, error=repr(e))
+
+    async def fan_out(
+        self, request: Union[GenerationRequest, str], models: Sequence[str], **parameters
+    ) -> Dict[str, GenerationResponse]:
+        """Generate a completion of the same prompt with each of `models` concurrently.
+
+        Failed generations are returned with `error` set instead of raising, so one model
+        failing doesn't lose the others' completions.
+
+        Args:
+            request (Union[GenerationRequest, str]): The request, or a prompt combined with `parameters`.
+            models (Sequence[str]): Model pools of the swarm to generate with.
+            **parameters: `GenerationRequest` fields used when `request` is a prompt.
+
+        Returns:
+            Dict[str, GenerationResponse]: Model to its response.
+        """
+        if isinstance(request, str):
+            request = GenerationRequest(prompt=request, **parameters)
+        responses = await asyncio.gather(
+            *(self._generate_or_error(dataclasses.replace(request, model=model)) for model in models)
+        )
+        return dict(zip(models, responses))
+
+    async def generate_many(
+        self, requests: Iterable[Union[GenerationRequest, str]], max_in_flight: Optional[int] = None
+    ) -> AsyncIterator[GenerationResponse]:
+        """Generate completions for `requests`, yielding each response as soon as it completes.
+
+        Requests are pulled lazily from the iterable so at most `max_in_flight` are pending
+        at any time. Failed requests are yielded with `error` set instead of raising.
+
+        Args:
+            requests (Iterable[Union[GenerationRequest, str]]): Requests or prompts.
+            max_in_flight (Optional[int], optional): Defaults to the limiters' maximum.
+
+        Yields:
+            GenerationResponse: Responses, in completion order.
+        """
+        max_in_flight = max_in_flight or int(sum(limiter.max_limit for limiter in self._limiters()))
+        iterator = iter(requests)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        request = next(iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if isinstance(request, str):
+                        request = GenerationRequest(prompt=request)
+                    pending.add(asyncio.ensure_future(self._generate_or_error(request)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
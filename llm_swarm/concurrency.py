@@ -0,0 +1,319 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TENANT = "default"
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passed before it could be sent or completed."""
+
+
+@dataclass
+class LimitChange:
+    """A change of the concurrency limit.
+
+    Args:
+        time (float): `time.monotonic()` of the change.
+        limit (float): The new limit.
+        reason (str): "increase", "overload", "queue" or "latency".
+    """
+
+    time: float
+    limit: float
+    reason: str
+
+
+def _percentile(values: Iterable[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ClassMetrics:
+    """Queue wait and latency of the most recent requests of one priority class or tenant."""
+
+    def __init__(self, size: int = 10_000) -> None:
+        self.count = 0
+        self.deadline_misses = 0
+        self.queue_waits: Deque[float] = deque(maxlen=size)
+        self.latencies: Deque[float] = deque(maxlen=size)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.count,
+            "deadline_misses": self.deadline_misses,
+            "queue_wait_p50": _percentile(self.queue_waits, 0.5),
+            "queue_wait_p95": _percentile(self.queue_waits, 0.95),
+            "latency_p50": _percentile(self.latencies, 0.5),
+            "latency_p95": _percentile(self.latencies, 0.95),
+        }
+
+
+class Slot:
+    """A permit to send one request, returned by `AdaptiveConcurrencyLimiter.acquire`."""
+
+    def __init__(
+        self,
+        limiter: "AdaptiveConcurrencyLimiter",
+        priority: float = 0,
+        tenant: str = DEFAULT_TENANT,
+        queued_at: Optional[float] = None,
+    ) -> None:
+        self.limiter = limiter
+        self.start = time.monotonic()
+        self.priority = priority
+        self.tenant = tenant
+        self.queue_wait = self.start - queued_at if queued_at is not None else 0.0
+        self.released = False
+
+    def release(
+        self,
+        latency: Optional[float] = None,
+        tokens: Optional[int] = None,
+        queue_time: Optional[float] = None,
+        overloaded: bool = False,
+    ) -> None:
+        """Give the permit back and feed the outcome of the request to the limiter.
+
+        Args:
+            latency (Optional[float], optional): Seconds the request took, None when it failed. Defaults to None.
+            tokens (Optional[int], optional): Tokens generated, used to normalise the latency. Defaults to None,
+                which leaves the latency out of the limit (the number requested is no substitute: a request
+                stopping early would look many times faster than it is).
+            queue_time (Optional[float], optional): Seconds the engine reports the request queued. Defaults to None.
+            overloaded (bool, optional): Whether the endpoint rejected the request as overloaded
+                (429, 503, timeout). Defaults to False.
+        """
+        if self.released:
+            return
+        self.released = True
+        self.limiter._on_release(self, latency, tokens, queue_time, overloaded)
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        initial_limit: float = 32,
+        min_limit: float = 1,
+        max_limit: float = 1024,
+        increase: float = 1.0,
+        decrease_factor: float = 0.7,
+        latency_tolerance: float = 2.0,
+        max_queue_time: Optional[float] = 1.0,
+        slow_start: bool = True,
+        history_size: int = 10_000,
+        baseline_window: int = 256,
+        baseline_quantile: float = 0.1,
+        min_latency_tokens: int = 8,
+    ) -> None:
+        """AIMD limit on the number of requests in flight, driven by latency, queue time and overload signals.
+
+        While the limit is saturated and requests come back fast, it grows by `increase`
+        per limit's worth of completed requests (about one per round trip), or by `increase`
+        per completed request during slow start, i.e. until the first decrease. It is multiplied
+        by `decrease_factor` when a request is rejected as overloaded, queued longer than
+        `max_queue_time` in the engine, or took more than `latency_tolerance` times the baseline
+        latency per token, i.e. the `baseline_quantile` of the last `baseline_window` requests.
+        Responses shorter than `min_latency_tokens`, whose latency is mostly the prompt's, don't
+        take part in the latency rule. At most one decrease is applied per round trip.
+
+        When the limit is reached, waiting requests get a slot by decreasing `priority`. Within
+        a priority, tenants (e.g. the clients of several jobs sharing a swarm) take turns in
+        proportion to their weight (see `set_weight`), and each tenant's requests go by earliest
+        deadline, then in arrival order.
+
+        Args:
+            initial_limit (float, optional): Starting limit. Defaults to 32.
+            min_limit (float, optional): Lower bound of the limit. Defaults to 1.
+            max_limit (float, optional): Upper bound of the limit. Defaults to 1024.
+            increase (float, optional): Additive increase per round trip. Defaults to 1.0.
+            decrease_factor (float, optional): Multiplicative decrease. Defaults to 0.7.
+            latency_tolerance (float, optional): Latency per token, relative to the baseline, that counts as
+                congestion. Defaults to 2.0.
+            max_queue_time (Optional[float], optional): Engine queue time that counts as congestion.
+                Defaults to 1.0. None ignores queue time.
+            slow_start (bool, optional): Grow exponentially until the first sign of congestion. Defaults to True.
+            history_size (int, optional): Number of limit changes kept in `history`. Defaults to 10_000.
+            baseline_window (int, optional): Recent latencies per token the baseline is taken from. Defaults to 256.
+            baseline_quantile (float, optional): Quantile of the window used as baseline. Defaults to 0.1.
+            min_latency_tokens (int, optional): Generated tokens below which a response's latency is ignored.
+                Defaults to 8.
+        """
+        if not (0 < min_limit <= initial_limit <= max_limit):
+            raise ValueError("Limits must satisfy 0 < min_limit <= initial_limit <= max_limit")
+        if not (0 < decrease_factor < 1):
+            raise ValueError("decrease_factor must be between 0 and 1")
+        if not (0 <= baseline_quantile < 1):
+            raise ValueError("baseline_quantile must be between 0 and 1")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_queue_time = max_queue_time
+        self.slow_start = slow_start
+        self.in_flight = 0
+        self.waiting = 0
+        self.baseline: Optional[float] = None
+        self.baseline_quantile = baseline_quantile
+        self.min_latency_tokens = min_latency_tokens
+        self._latencies_per_token: Deque[float] = deque(maxlen=baseline_window)
+        self.history: Deque[LimitChange] = deque([LimitChange(time.monotonic(), self.limit, "initial")], maxlen=history_size)
+        self._last_decrease = float("-inf")
+        # priority -> tenant -> heap of (deadline, arrival, waiter)
+        self._queues: Dict[float, Dict[str, List[Tuple[float, int, asyncio.Future]]]] = {}
+        self._sequence = itertools.count()
+        self.weights: Dict[str, float] = {}
+        # start-time fair queuing: a tenant's virtual time advances by 1 / weight per slot it gets
+        self._virtual_times: Dict[str, float] = defaultdict(float)
+        self._virtual_clock = 0.0
+        self.class_metrics: Dict[float, ClassMetrics] = defaultdict(ClassMetrics)
+        self.tenant_metrics: Dict[str, ClassMetrics] = defaultdict(ClassMetrics)
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        """Give `tenant` a `weight` times larger share of the slots than a tenant of weight 1 when both wait."""
+        if weight <= 0:
+            raise ValueError("weight must be greater than zero")
+        self.weights[tenant] = weight
+
+    def _grant(self, tenant: str) -> None:
+        self.in_flight += 1
+        self._virtual_clock = max(self._virtual_clock, self._virtual_times[tenant])
+        self._virtual_times[tenant] += 1 / self.weights.get(tenant, 1.0)
+
+    async def acquire(self, priority: float = 0, tenant: str = DEFAULT_TENANT, deadline: Optional[float] = None) -> Slot:
+        """Wait until fewer than `limit` requests are in flight and take a slot.
+
+        Args:
+            priority (float, optional): Waiting requests with a higher priority get a slot first. Defaults to 0.
+            tenant (str, optional): Who the request is for, to share slots fairly between tenants. Defaults to "default".
+            deadline (Optional[float], optional): `time.monotonic()` after which the request is useless. Defaults to None.
+
+        Raises:
+            DeadlineExceeded: When `deadline` passes before a slot is free.
+        """
+        queued_at = time.monotonic()
+        if self.waiting == 0 and self.in_flight < int(self.limit):
+            self._grant(tenant)
+            return Slot(self, priority, tenant, queued_at)
+        # futures are created here rather than in __init__ so the limiter can be built outside of the event loop
+        waiter = asyncio.get_running_loop().create_future()
+        tenants = self._queues.setdefault(priority, {})
+        if tenant not in tenants:
+            # a tenant that was idle doesn't get to spend the turns it didn't take
+            self._virtual_times[tenant] = max(self._virtual_times[tenant], self._virtual_clock)
+        heapq.heappush(
+            tenants.setdefault(tenant, []),
+            (deadline if deadline is not None else float("inf"), next(self._sequence), waiter),
+        )
+        self.waiting += 1
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - queued_at)
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over right as we gave up: give it to the next waiter
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.class_metrics[priority].deadline_misses += 1
+                self.tenant_metrics[tenant].deadline_misses += 1
+                raise DeadlineExceeded(f"No slot free before the deadline ({time.monotonic() - queued_at:.1f}s queued)")
+            raise
+        finally:
+            self.waiting -= 1
+        return Slot(self, priority, tenant, queued_at)
+
+    def _next_waiter(self) -> Optional[Tuple[str, asyncio.Future]]:
+        while self._queues:
+            priority = max(self._queues)
+            tenants = self._queues[priority]
+            tenant = min(tenants, key=lambda name: (self._virtual_times[name], name))
+            heap = tenants[tenant]
+            _, _, waiter = heapq.heappop(heap)
+            if not heap:
+                del tenants[tenant]
+                if not tenants:
+                    del self._queues[priority]
+            if not waiter.done():
+                return tenant, waiter
+        return None
+
+    def _wake(self) -> None:
+        """Hand free slots over to the next waiters: by priority, then fair share between tenants, then deadline."""
+        while self.in_flight < int(self.limit):
+            next_waiter = self._next_waiter()
+            if next_waiter is None:
+                return
+            tenant, waiter = next_waiter
+            self._grant(tenant)
+            waiter.set_result(None)
+
+    def _set_limit(self, limit: float, reason: str) -> None:
+        limit = min(self.max_limit, max(self.min_limit, limit))
+        changed = int(limit) != int(self.limit)
+        self.limit = limit
+        if changed or reason != "increase":
+            self.history.append(LimitChange(time.monotonic(), limit, reason))
+
+    def _on_release(
+        self, slot: Slot, latency: Optional[float], tokens: Optional[int], queue_time: Optional[float], overloaded: bool
+    ) -> None:
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+        for metrics in (self.class_metrics[slot.priority], self.tenant_metrics[slot.tenant]):
+            metrics.count += 1
+            metrics.queue_waits.append(slot.queue_wait)
+            if latency is not None:
+                metrics.latencies.append(slot.queue_wait + latency)
+
+        reason = None
+        if overloaded:
+            reason = "overload"
+        elif queue_time is not None and self.max_queue_time is not None and queue_time > self.max_queue_time:
+            reason = "queue"
+        elif latency is not None and tokens is not None and tokens >= self.min_latency_tokens:
+            per_token = latency / tokens
+            # a low quantile of a window rather than the minimum: a single outlier can't drag the baseline
+            # down for good, and it follows lasting changes of the workload
+            self._latencies_per_token.append(per_token)
+            self.baseline = _percentile(self._latencies_per_token, self.baseline_quantile)
+            # compared once the window says what normal looks like
+            warm = len(self._latencies_per_token) >= min(16, self._latencies_per_token.maxlen)
+            if warm and per_token > self.latency_tolerance * self.baseline:
+                reason = "latency"
+
+        if reason is not None:
+            # requests sent before the last decrease already saw the old limit: don't decrease twice
+            if slot.start > self._last_decrease:
+                self._last_decrease = time.monotonic()
+                self.slow_start = False
+                self._set_limit(self.limit * self.decrease_factor, reason)
+        elif latency is not None and saturated:
+            step = self.increase if self.slow_start else self.increase / self.limit
+            self._set_limit(self.limit + step, "increase")
+
+        self._wake()
+
+    def limits(self) -> List[float]:
+        """The successive values of the limit, oldest first."""
+        return [change.limit for change in self.history]
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "baseline_latency_per_token": self.baseline,
+            "classes": {priority: metrics.stats() for priority, metrics in sorted(self.class_metrics.items())},
+            "tenants": {tenant: metrics.stats() for tenant, metrics in sorted(self.tenant_metrics.items())},
+        }
@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .client import GenerationRequest, GenerationResponse, SwarmClient
+from .pipeline import Pipeline, Row, Watermark
+from .sink import ParquetSink
+from .tracing import span
+
+Message = Dict[str, str]
+
+
+@dataclass
+class Conversation:
+    """A chat whose turns are generated by the swarm, one after the other.
+
+    Every turn is sent with a priority that grows with the number of turns already
+    generated, so once the client's concurrency limit is reached, the next turn of a
+    conversation in progress is sent before the first turn of a new one.
+
+    Args:
+        client (SwarmClient): Client sending the turns.
+        render (Callable[[List[Message]], str]): Renders the messages into a prompt ending with the
+            assistant's cue (e.g. `apply_chat_template(..., add_generation_prompt=True)`).
+        messages (List[Message]): The chat so far.
+        parameters (Dict[str, Any]): Default `GenerationRequest` fields of every turn.
+        priority (float): Priority of the first turn.
+        responses (List[GenerationResponse]): Responses of the turns generated so far.
+    """
+
+    client: SwarmClient
+    render: Callable[[List[Message]], str]
+    messages: List[Message] = field(default_factory=list)
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    priority: float = 0
+    responses: List[GenerationResponse] = field(default_factory=list)
+
+    @property
+    def depth(self) -> int:
+        """Number of assistant turns in the chat."""
+        return sum(message["role"] == "assistant" for message in self.messages)
+
+    async def say(self, content: str, role: str = "user", **parameters) -> str:
+        """Append a message, generate the assistant's reply and return it.
+
+        Args:
+            content (str): The message.
+            role (str, optional): Its role. Defaults to "user".
+            **parameters: `GenerationRequest` fields overriding `parameters` for this turn.
+
+        Raises:
+            aiohttp.ClientError: When every attempt at generating the reply failed.
+
+        Returns:
+            str: The reply, also appended to `messages`.
+        """
+        self.messages.append({"role": role, "content": content})
+        return await self.reply(**parameters)
+
+    async def reply(self, **parameters) -> str:
+        """Generate the assistant's reply to the chat so far and return it."""
+        with span("render"):
+            prompt = self.render(self.messages)
+        request = GenerationRequest(
+            prompt=prompt,
+            priority=self.priority + self.depth + 1,
+            **{**self.parameters, **parameters},
+        )
+        response = await self.client.generate(request)
+        self.responses.append(response)
+        self.messages.append({"role": "assistant", "content": response.text})
+        return response.text
+
+    def fork(self) -> "Conversation":
+        """Copy the chat so far into an independent branch, e.g. to generate several follow-ups concurrently."""
+        return replace(self, messages=list(self.messages), responses=list(self.responses))
+
+
+class ConversationExecutor:
+    def __init__(
+        self,
+        client: SwarmClient,
+        render: Callable[[List[Message]], str],
+        max_active: int = 256,
+        progress: bool = True,
+        **parameters,
+    ) -> None:
+        """Run a multi-turn script over every row of a dataset, emitting each conversation as soon as it ends.
+
+        At most `max_active` conversations are in progress at any time and a new one only
+        starts when another finishes. Combined with the priority of follow-up turns, this
+        drives conversations to completion instead of generating every first turn of the
+        dataset before the first second turn.
+
+        Args:
+            client (SwarmClient): Client sending the turns.
+            render (Callable[[List[Message]], str]): Renders messages into a prompt.
+            max_active (int, optional): Conversations in progress at once. Set it to at least the
+                client's `max_parallel_requests` so the swarm stays busy. Defaults to 256.
+            progress (bool, optional): Show a progress bar. Defaults to True.
+            **parameters: Default `GenerationRequest` fields of every turn.
+        """
+        if max_active < 1:
+            raise ValueError("max_active must be at least 1")
+        self.client = client
+        self.render = render
+        self.max_active = max_active
+        self.progress = progress
+        self.parameters = parameters
+        self.time_to_first_row: Optional[float] = None
+
+    def conversation(self, messages: Optional[List[Message]] = None, priority: float = 0) -> Conversation:
+        return Conversation(self.client, self.render, list(messages or []), dict(self.parameters), priority)
+
+    def _pipeline(self, script: Callable[[Conversation, Row], Awaitable[Row]]) -> Pipeline:
+        # one pipeline per call, so concurrent runs of the executor each keep their own script
+        async def run_script(row: Row) -> Row:
+            return await script(self.conversation(), row)
+
+        return Pipeline(run_script, window=self.max_active, progress=self.progress, tracer=self.client.tracer)
+
+    async def stream(
+        self,
+        rows: Iterable[Row],
+        script: Callable[[Conversation, Row], Awaitable[Row]],
+        watermark: Optional[Watermark] = None,
+    ) -> AsyncIterator[Tuple[int, Row]]:
+        """Yield `(offset, result)` for every row as soon as `script(conversation, row)` returns.
+
+        Args:
+            rows (Iterable[Row]): Input rows.
+            script (Callable[[Conversation, Row], Awaitable[Row]]): Holds the conversation about a row,
+                e.g. through successive `conversation.say(...)`, and returns the result row.
+            watermark (Optional[Watermark], optional): Offsets already complete, skipped. Defaults to None.
+        """
+        start = time.perf_counter()
+        async for offset, result in self._pipeline(script).stream(rows, watermark):
+            if self.time_to_first_row is None:
+                self.time_to_first_row = time.perf_counter() - start
+            yield offset, result
+
+    async def run(
+        self, rows: Iterable[Row], script: Callable[[Conversation, Row], Awaitable[Row]], sink: ParquetSink
+    ) -> int:
+        """Write the result of every conversation to `sink` as it ends, resuming from its manifest."""
+        return await self._pipeline(script).run(rows, sink)
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+import requests
+
+if TYPE_CHECKING:
+    from . import LLMSwarm
+
+
+@dataclass
+class HealthEvent:
+    """Something the health monitor observed or did.
+
+    Args:
+        time (float): `time.time()` of the event.
+        kind (str): "unhealthy", "recovered", "ejected", "replacing", "admitted" or "replacement_failed".
+        job_id (str): The job concerned.
+        endpoint (Optional[str]): The job's endpoint, when known.
+        detail (Dict[str, str]): Extra context (e.g. the probe error or the replacement job).
+    """
+
+    time: float
+    kind: str
+    job_id: str
+    endpoint: Optional[str] = None
+    detail: Dict[str, str] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+
+def probe_endpoint(endpoint: str, timeout: float) -> Optional[str]:
+    """GET `{endpoint}/health` and return None when it answers 2xx within `timeout`, else the reason it didn't."""
+    try:
+        response = requests.get(f"{endpoint}/health", timeout=timeout)
+    except requests.RequestException as e:
+        return type(e).__name__
+    if not response.ok:
+        return f"HTTP {response.status_code}"
+    return None
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        swarm: "LLMSwarm",
+        interval: float = 10.0,
+        probe_timeout: float = 5.0,
+        failure_threshold: int = 3,
+        events_path: Optional[str] = None,
+        probe: Callable[[str, float], Optional[str]] = probe_endpoint,
+    ) -> None:
+        """Probe every instance of a running swarm and replace the ones that stop answering.
+
+        All endpoints are probed in parallel every `interval` seconds. An instance whose job is
+        gone, or whose endpoint failed `failure_threshold` probes in a row, is ejected from the
+        load balancer right away; its job is then cancelled and a replacement submitted, whose
+        endpoint is admitted once it answers. Every step is recorded as a `HealthEvent`.
+
+        Args:
+            swarm (LLMSwarm): The running swarm, started with the python load balancer.
+            interval (float, optional): Seconds between two rounds of probes. Defaults to 10.0.
+            probe_timeout (float, optional): Seconds an endpoint has to answer a probe. Defaults to 5.0.
+            failure_threshold (int, optional): Consecutive failed probes before ejecting an endpoint. Defaults to 3.
+            events_path (Optional[str], optional): File to append the events to as JSON lines. Defaults to None.
+            probe (Callable[[str, float], Optional[str]], optional): Returns None for a healthy endpoint, the
+                failure reason otherwise. Defaults to `probe_endpoint`.
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.swarm = swarm
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.events_path = events_path
+        self.probe = probe
+        self.events: List[HealthEvent] = []
+        self.failures: Dict[str, int] = {}
+        self._replacing: Dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _record(self, kind: str, job_id: str, endpoint: Optional[str] = None, **detail: str) -> HealthEvent:
+        event = HealthEvent(time.time(), kind, job_id, endpoint, detail)
+        self.events.append(event)
+        print(f"🩺 {event.to_json()}")
+        if self.events_path:
+            with open(self.events_path, "a") as f:
+                f.write(event.to_json() + "\n")
+        return event
+
+    def _check(self, job_id: str, endpoint: str) -> Optional[str]:
+        # None when the scheduler couldn't be queried: the probe alone decides, as for any other failure
+        if self.swarm.scheduler.job_running(job_id) is False:
+            return "job not running"
+        return self.probe(endpoint, self.probe_timeout)
+
+    def step(self) -> None:
+        """Probe every instance once and act on the results."""
+        job_endpoints = {
+            job_id: endpoint
+            for job_id, endpoint in self.swarm.job_endpoints.items()
+            if job_id in self.swarm.job_ids and job_id not in self._replacing
+        }
+        if not job_endpoints:
+            return
+        with ThreadPoolExecutor(max_workers=min(32, len(job_endpoints))) as pool:
+            futures = {job_id: pool.submit(self._check, job_id, endpoint) for job_id, endpoint in job_endpoints.items()}
+            results = {job_id: future.result() for job_id, future in futures.items()}
+
+        for job_id, reason in results.items():
+            endpoint = job_endpoints[job_id]
+            if reason is None:
+                if self.failures.pop(job_id, 0):
+                    self._record("recovered", job_id, endpoint)
+                continue
+            self.failures[job_id] = self.failures.get(job_id, 0) + 1
+            self._record("unhealthy", job_id, endpoint, reason=reason, failures=str(self.failures[job_id]))
+            # a job the scheduler no longer runs won't come back, no need to wait for more probes
+            if self.failures[job_id] >= self.failure_threshold or reason == "job not running":
+                self._eject_and_replace(job_id, endpoint)
+
+    def _eject_and_replace(self, job_id: str, endpoint: str) -> None:
+        self.failures.pop(job_id, None)
+        if self.swarm.load_balancer is not None:
+            self.swarm.load_balancer.remove_endpoint(endpoint)
+        self._record("ejected", job_id, endpoint)
+
+        def replace():
+            try:
+                self._record("replacing", job_id, endpoint)
+                new_job_id = self.swarm.replace_instance(job_id)
+                if new_job_id is not None:
+                    self._record("admitted", new_job_id, self.swarm.job_endpoints.get(new_job_id), replaces=job_id)
+            except Exception as e:
+                self._record("replacement_failed", job_id, endpoint, error=repr(e))
+            finally:
+                self._replacing.pop(job_id, None)
+
+        # replacements wait for a new job to start, keep probing the other instances meanwhile
+        thread = threading.Thread(target=replace, daemon=True)
+        self._replacing[job_id] = thread
+        thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Health check failed: {e}")
+
+    def start(self) -> "HealthMonitor":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop probing and wait for the replacements in progress, so that their jobs are in the swarm once it is cleaned up."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for thread in list(self._replacing.values()):
+            thread.join()
@@ -0,0 +1,181 @@
+"""State of a persistent swarm shared between processes, and the reaper tearing it down once idle.
+
+A swarm started with `state_file` set writes its jobs and endpoints there, so later processes
+attach to it (`LLMSwarm.attach`) instead of launching new instances. Every attached process
+renews the swarm's lease; a detached reaper cancels the jobs once nobody renewed it for
+`lease_timeout` seconds:
+
+    python -m llm_swarm.lease logs/swarm.json <swarm id>
+"""
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+@dataclass
+class SwarmState:
+    """What a process needs to use a swarm another process started.
+
+    Args:
+        swarm_id (str): Identifies the swarm (its job timestamp), so a reaper never tears down a newer swarm.
+        config (Dict[str, Any]): The `LLMSwarmConfig` the swarm was started with.
+        job_ids (List[str]): The swarm's jobs.
+        job_endpoints (Dict[str, str]): Job ID to endpoint.
+        job_config (List[str]): Job file path, template, job timestamp and hosts file, to add instances.
+        next_index (int): Index of the next instance added.
+        load_balancer (Optional[str]): Address of the starting process's load balancer, while it runs.
+        heartbeat (float): `time.time()` of the last lease renewal.
+        lease_timeout (float): Seconds without renewal after which the swarm is torn down.
+    """
+
+    swarm_id: str
+    config: Dict[str, Any]
+    job_ids: List[str] = field(default_factory=list)
+    job_endpoints: Dict[str, str] = field(default_factory=dict)
+    job_config: List[str] = field(default_factory=list)
+    next_index: int = 0
+    load_balancer: Optional[str] = None
+    heartbeat: float = 0.0
+    lease_timeout: float = 900.0
+
+    @property
+    def expires(self) -> float:
+        return self.heartbeat + self.lease_timeout
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires
+
+
+@contextlib.contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Serialize read-modify-write cycles of the state file between processes."""
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_state(path: str) -> Optional[SwarmState]:
+    """The swarm state in `path`, or None when there is none."""
+    try:
+        with open(path) as f:
+            return SwarmState(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def write_state(path: str, state: SwarmState) -> None:
+    # readers never see a half written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(asdict(state), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def remove_state(path: str) -> None:
+    for stale in (path, f"{path}.lock"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(stale)
+
+
+def renew(path: str, swarm_id: str) -> Optional[SwarmState]:
+    """Push back the expiry of the lease of swarm `swarm_id`; returns None when it is gone or expired."""
+    with locked(path):
+        state = read_state(path)
+        # an expired swarm may be torn down any moment, it can't be revived
+        if state is None or state.swarm_id != swarm_id or state.expired():
+            return None
+        state.heartbeat = time.time()
+        write_state(path, state)
+        return state
+
+
+class Lease:
+    def __init__(self, path: str, swarm_id: str, interval: float) -> None:
+        """Renew the lease of a swarm from a daemon thread while this process uses it.
+
+        Args:
+            path (str): The swarm's state file.
+            swarm_id (str): The swarm's ID.
+            interval (float): Seconds between two renewals, well below the lease timeout.
+        """
+        self.path = path
+        self.swarm_id = swarm_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if renew(self.path, self.swarm_id) is None:
+                    return
+            except OSError as e:
+                print(f"Lease renewal failed: {e}")
+
+    def start(self) -> "Lease":
+        renew(self.path, self.swarm_id)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop renewing; the lease runs out `lease_timeout` seconds from now unless another process renews it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        renew(self.path, self.swarm_id)
+
+
+def cancel_jobs(state: SwarmState) -> None:
+    """Cancel the jobs of a swarm with the scheduler it was started with."""
+    from . import LLMSwarm
+    from .utils import LLMSwarmConfig
+
+    config = LLMSwarmConfig(**{**state.config, "state_file": None})
+    swarm = LLMSwarm(config)
+    swarm.job_ids = state.job_ids
+    swarm.cleanup()
+
+
+def reap(path: str, swarm_id: str, poll_interval: float = 30.0) -> bool:
+    """Wait until the lease of swarm `swarm_id` expires, then cancel its jobs and remove its state.
+
+    Returns:
+        bool: Whether the swarm was torn down here (False when its state disappeared or was replaced).
+    """
+    while True:
+        with locked(path):
+            state = read_state(path)
+            if state is None or state.swarm_id != swarm_id:
+                return False
+            if state.expired():
+                remove_state(path)
+                break
+        time.sleep(max(0.1, min(poll_interval, state.expires - time.time())))
+
+    print(f"💤 lease of swarm {swarm_id} expired, cancelling {len(state.job_ids)} jobs")
+    cancel_jobs(state)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tear down a persistent swarm once its lease expires")
+    parser.add_argument("path", help="State file of the swarm")
+    parser.add_argument("swarm_id", help="ID of the swarm in the state file")
+    parser.add_argument("--poll_interval", type=float, default=30.0, help="Seconds between two checks of the lease")
+    args = parser.parse_args()
+    reap(args.path, args.swarm_id, args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import copy
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from .metrics import (
+    CONTENT_TYPE,
+    ENDPOINT_ERRORS,
+    ENDPOINT_GENERATED_TOKENS,
+    ENDPOINT_IN_FLIGHT,
+    ENDPOINT_LATENCY,
+    ENDPOINT_QUEUE_DEPTH,
+    ENDPOINT_REQUESTS,
+    REGISTRY,
+)
+from .routing import (
+    MODEL_HEADER,
+    ROUTING_POLICIES,
+    Backend,
+    LeastOutstandingRequests,
+    ProxyRequest,
+    RoutingPolicy,
+    parse_queue_depth,
+)
+from .utils import get_unused_port
+
+# headers that only make sense for a single hop and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+    "content-length",
+}
+STATS_PATH = "/_swarm/stats"
+METRICS_PATH = "/_swarm/metrics"
+
+
+def _forwardable(headers) -> Dict[str, str]:
+    return {key: value for key, value in headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+class LoadBalancer:
+    def __init__(
+        self,
+        endpoints: List[str],
+        policy: Optional[RoutingPolicy] = None,
+        host: str = "0.0.0.0",
+        port: Optional[int] = None,
+        read_timeout: float = 300,
+        connect_timeout: float = 60,
+        queue_poll_interval: Optional[float] = None,
+    ) -> None:
+        """Asynchronous reverse proxy spreading requests over the swarm's endpoints.
+
+        Responses are streamed back chunk by chunk as they arrive from the endpoint, and
+        endpoints can be added or removed while requests are in flight. Endpoints added with
+        a `model` form a pool of their own: requests go to the pool named by their
+        `X-Swarm-Model` header (or the `model` of their JSON body), and each pool is routed by
+        its own copy of `policy`.
+
+        Args:
+            endpoints (List[str]): Endpoints to balance over (e.g. ["http://26.0.154.245:13120"]).
+            policy (Optional[RoutingPolicy], optional): How requests are routed. Defaults to LeastOutstandingRequests.
+            host (str, optional): Interface to listen on. Defaults to "0.0.0.0".
+            port (Optional[int], optional): Port to listen on. Defaults to an unused port.
+            read_timeout (float, optional): Seconds to wait for data from an endpoint. Defaults to 300.
+            connect_timeout (float, optional): Seconds to wait to connect to an endpoint. Defaults to 60.
+            queue_poll_interval (Optional[float], optional): How often to read each endpoint's `/metrics` to
+                update its engine queue depth. Defaults to None (never).
+        """
+        self.policy = policy or LeastOutstandingRequests()
+        # pristine copy the policies of model pools are made from, so pools don't share routing state
+        self._policy_template = copy.deepcopy(self.policy)
+        self._policies: Dict[Optional[str], RoutingPolicy] = {None: self.policy}
+        self.host = host
+        self.port = port or get_unused_port()
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_read=read_timeout, sock_connect=connect_timeout)
+        self.queue_poll_interval = queue_poll_interval
+        self._set_backends([Backend(endpoint) for endpoint in endpoints])
+        self._queue_poller: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._runner: Optional[web.ServerRunner] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://localhost:{self.port}"
+
+    def _set_backends(self, backends: List[Backend]) -> None:
+        # copy-on-write so requests being routed keep a consistent view
+        pools: Dict[Optional[str], List[Backend]] = {}
+        for backend in backends:
+            pools.setdefault(backend.model, []).append(backend)
+        self.backends = backends
+        self.pools = pools
+
+    def _policy(self, model: Optional[str]) -> RoutingPolicy:
+        policy = self._policies.get(model)
+        if policy is None:
+            policy = self._policies[model] = copy.deepcopy(self._policy_template)
+        return policy
+
+    def add_endpoint(self, endpoint: str, job_id: Optional[str] = None, model: Optional[str] = None) -> None:
+        """Start routing requests to `endpoint`, served by the scheduler job `job_id` when known.
+
+        Args:
+            endpoint (str): The endpoint.
+            job_id (Optional[str], optional): Scheduler job serving it; labels its metrics. Defaults to None.
+            model (Optional[str], optional): Model pool it joins, in a swarm serving several models. Defaults to None.
+        """
+        for backend in self.backends:
+            if backend.url == endpoint:
+                backend.job_id = job_id or backend.job_id
+                if model is not None and model != backend.model:
+                    backend.model = model
+                    self._set_backends(list(self.backends))
+                return
+        self._set_backends(self.backends + [Backend(endpoint, job_id=job_id, model=model)])
+
+    def pool(self, model: str) -> "ModelPool":
+        """The part of this load balancer serving `model`, to hand to the `LLMSwarm` running that model's instances."""
+        return ModelPool(self, model)
+
+    def remove_endpoint(self, endpoint: str) -> Optional[Backend]:
+        """Stop routing new requests to `endpoint`; requests already sent to it still complete.
+
+        Returns:
+            Optional[Backend]: The removed backend, whose `outstanding` count drops to 0 once drained.
+        """
+        for backend in self.backends:
+            if backend.url == endpoint:
+                backend.draining = True
+                self._set_backends([other for other in self.backends if other is not backend])
+                return backend
+        return None
+
+    def stats(self) -> Dict[str, Dict]:
+        stats = {
+            "backends": {backend.url: backend.stats() for backend in self.backends},
+            "policy": self.policy.stats(),
+        }
+        if any(model is not None for model in self._policies):
+            stats["policies"] = {model: policy.stats() for model, policy in self._policies.items() if model is not None}
+        return stats
+
+    def _select_pool(self, request: ProxyRequest) -> Tuple[Optional[str], Optional[List[Backend]], Optional[str]]:
+        """The pool serving `request` as `(model, backends, None)`, or `(None, None, reason)` when there is none."""
+        pools = self.pools
+        model = request.model
+        if model in pools:
+            return model, pools[model], None
+        if len(pools) == 1 and (model is None or None in pools):
+            # a single pool serves every request; one without a model name serves any model
+            only = next(iter(pools))
+            return only, pools[only], None
+        served = ", ".join(sorted(str(name) for name in pools))
+        if model is None:
+            return None, None, f"the swarm serves several models ({served}), name one with the {MODEL_HEADER} header"
+        return None, None, f"no endpoint serves model {model!r} (serving {served})"
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        if request.path == STATS_PATH:
+            return web.json_response(self.stats())
+        if request.path == METRICS_PATH:
+            return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+        if not self.backends:
+            return web.Response(status=503, text="no endpoint available")
+
+        proxy_request = ProxyRequest(request.method, request.path_qs, await request.read(), request.headers)
+        model, backends, reason = self._select_pool(proxy_request)
+        if backends is None:
+            return web.Response(status=404 if proxy_request.model else 400, text=reason)
+        policy = self._policy(model)
+        backend = policy.choose(backends, proxy_request)
+        backend.outstanding += 1
+        backend.requests += 1
+        policy.on_start(backend, proxy_request)
+        labels = {"endpoint": backend.url, "job_id": backend.job_id, "model": backend.model}
+        ENDPOINT_REQUESTS.inc(**labels)
+        ENDPOINT_IN_FLIGHT.inc(**labels)
+        start = time.perf_counter()
+        response = None
+        try:
+            async with self._session.request(
+                request.method,
+                backend.url + request.path_qs,
+                data=proxy_request.body,
+                headers=_forwardable(request.headers),
+            ) as upstream:
+                if upstream.status >= 500:
+                    ENDPOINT_ERRORS.inc(reason=str(upstream.status), **labels)
+                response = web.StreamResponse(status=upstream.status, headers=_forwardable(upstream.headers))
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+                await response.write_eof()
+                generated_tokens = upstream.headers.get("x-generated-tokens")
+                if generated_tokens:
+                    ENDPOINT_GENERATED_TOKENS.inc(int(generated_tokens), **labels)
+                return response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            backend.errors += 1
+            ENDPOINT_ERRORS.inc(reason="unreachable", **labels)
+            if response is not None and response.prepared:
+                # the status line is already sent, all we can do is cut the stream short
+                return response
+            return web.Response(status=502, text=f"{backend.url}: {e!r}")
+        finally:
+            backend.outstanding -= 1
+            policy.on_finish(backend, proxy_request)
+            ENDPOINT_IN_FLIGHT.dec(**labels)
+            ENDPOINT_LATENCY.observe(time.perf_counter() - start, **labels)
+
+    async def _poll_queue_depths(self) -> None:
+        async def poll(backend: Backend):
+            try:
+                async with self._session.get(f"{backend.url}/metrics", timeout=aiohttp.ClientTimeout(total=2)) as response:
+                    if response.status == 200:
+                        backend.queue_depth = parse_queue_depth(await response.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                backend.queue_depth = None
+            labels = {"endpoint": backend.url, "job_id": backend.job_id, "model": backend.model}
+            if backend.queue_depth is None:
+                ENDPOINT_QUEUE_DEPTH.remove(**labels)
+            else:
+                ENDPOINT_QUEUE_DEPTH.set(backend.queue_depth, **labels)
+
+        while True:
+            await asyncio.gather(*(poll(backend) for backend in self.backends))
+            await asyncio.sleep(self.queue_poll_interval)
+
+    async def start(self) -> None:
+        """Start serving on the current event loop."""
+        self._session = aiohttp.ClientSession(
+            timeout=self.timeout,
+            connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=None),
+            auto_decompress=False,
+        )
+        server = web.Server(self._handle)
+        self._runner = web.ServerRunner(server, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        if self.queue_poll_interval:
+            self._queue_poller = asyncio.ensure_future(self._poll_queue_depths())
+
+    async def stop(self) -> None:
+        if self._queue_poller is not None:
+            self._queue_poller.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self._session is not None:
+            await self._session.close()
+
+    def start_in_thread(self) -> "LoadBalancer":
+        """Run the load balancer on its own event loop in a daemon thread and return once it listens."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+class ModelPool:
+    def __init__(self, load_balancer: LoadBalancer, model: str) -> None:
+        """The endpoints of a shared `LoadBalancer` serving one model.
+
+        Has the part of the `LoadBalancer` interface an `LLMSwarm` uses to add and remove its
+        instances, so each model's swarm scales and heals its own pool behind one front end.
+        """
+        self.load_balancer = load_balancer
+        self.model = model
+
+    @property
+    def endpoint(self) -> str:
+        return self.load_balancer.endpoint
+
+    @property
+    def backends(self) -> List[Backend]:
+        return self.load_balancer.pools.get(self.model, [])
+
+    def add_endpoint(self, endpoint: str, job_id: Optional[str] = None) -> None:
+        self.load_balancer.add_endpoint(endpoint, job_id, model=self.model)
+
+    def remove_endpoint(self, endpoint: str) -> Optional[Backend]:
+        return self.load_balancer.remove_endpoint(endpoint)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            "backends": {backend.url: backend.stats() for backend in self.backends},
+            "policy": self.load_balancer._policy(self.model).stats(),
+        }
+
+
+def _parse_endpoints(value: str) -> List[str]:
+    """Endpoints from `--endpoints`: a comma-separated list, or a hosts file of `<endpoint> [<job id>]` lines."""
+    try:
+        with open(value) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return [endpoint for endpoint in value.split(",") if endpoint]
+    return [line.split()[0] for line in lines if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Standalone llm-swarm load balancer")
+    parser.add_argument("--endpoints", required=True, help="Comma-separated endpoints, or a hosts file with one per line")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--routing-policy", choices=sorted(ROUTING_POLICIES), default="least_requests")
+    parser.add_argument("--queue-poll-interval", type=float, default=None)
+    args = parser.parse_args()
+    endpoints = _parse_endpoints(args.endpoints)
+
+    async def serve():
+        load_balancer = LoadBalancer(
+            endpoints,
+            policy=ROUTING_POLICIES[args.routing_policy](),
+            host=args.host,
+            port=args.port,
+            queue_poll_interval=args.queue_poll_interval,
+        )
+        await load_balancer.start()
+        print(f"🔥 load balancer ready {load_balancer.endpoint}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await load_balancer.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
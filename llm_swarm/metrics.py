@@ -0,0 +1,267 @@
+import bisect
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# latency buckets in seconds, from a proxied health check to a long generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name) or "") for name in self.labelnames)
+
+    def value(self, **labels) -> float:
+        """Current value of the series with these labels (0 when it was never recorded)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            labelnames = self.labelnames + (("le",) if len(key) > len(self.labelnames) else ())
+            lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels) -> None:
+        """Stop reporting the series with these labels, e.g. of an endpoint that left the swarm."""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per series: a count per bucket (the last one is +Inf), then the sum
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def value(self, **labels) -> float:
+        """Number of observations of the series with these labels."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[:-1]) if series else 0.0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` quantile, e.g. for a summary printed at the end of a run."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if not series:
+                return None
+            counts = series[:-1]
+        rank, seen = q * sum(counts), 0.0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        samples = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key + (_format_value(bound),), cumulative))
+                samples.append((f"{self.name}_sum", key, series[-1]))
+                samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        """Metrics recorded in-process and rendered in the Prometheus text format.
+
+        Recording is thread-safe, so the load balancer's thread, the client's event loop and
+        the sink's writer thread share one registry. Asking twice for a metric of the same
+        name returns the same metric.
+        """
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host: str = "0.0.0.0", port: int = 9090) -> None:
+        """Serve `registry` on `http://{host}:{port}/metrics` from a daemon thread, for Prometheus to scrape."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?")[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode()
+                handler.send_response(200)
+                handler.send_header("Content-Type", CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://localhost:{self.port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# the registry every component records into unless given another one
+REGISTRY = MetricsRegistry()
+
+ENDPOINT_LABELS = ("endpoint", "job_id", "model")
+ENDPOINT_REQUESTS = REGISTRY.counter(
+    "llm_swarm_endpoint_requests_total", "Requests proxied to an endpoint", ENDPOINT_LABELS
+)
+ENDPOINT_IN_FLIGHT = REGISTRY.gauge(
+    "llm_swarm_endpoint_in_flight_requests", "Requests being proxied to an endpoint", ENDPOINT_LABELS
+)
+ENDPOINT_LATENCY = REGISTRY.histogram(
+    "llm_swarm_endpoint_request_duration_seconds", "Time to proxy a whole response from an endpoint", ENDPOINT_LABELS
+)
+ENDPOINT_ERRORS = REGISTRY.counter(
+    "llm_swarm_endpoint_errors_total",
+    "Requests to an endpoint that failed, by reason (unreachable or the HTTP status)",
+    ENDPOINT_LABELS + ("reason",),
+)
+ENDPOINT_GENERATED_TOKENS = REGISTRY.counter(
+    "llm_swarm_endpoint_generated_tokens_total", "Tokens generated by an endpoint, when it reports them", ENDPOINT_LABELS
+)
+ENDPOINT_QUEUE_DEPTH = REGISTRY.gauge(
+    "llm_swarm_endpoint_queue_depth", "Requests waiting in an endpoint's engine queue", ENDPOINT_LABELS
+)
+CLIENT_REQUESTS = REGISTRY.counter(
+    "llm_swarm_client_requests_total", "Generations by outcome (ok, cached, error or deadline)", ("tenant", "outcome")
+)
+CLIENT_RETRIES = REGISTRY.counter("llm_swarm_client_retries_total", "Attempts retried after a failure", ("tenant",))
+CLIENT_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_swarm_client_queue_wait_seconds", "Time waiting for a concurrency slot in the client", ("tenant",)
+)
+CLIENT_LATENCY = REGISTRY.histogram(
+    "llm_swarm_client_request_duration_seconds", "Time from sending an attempt to reading its response", ("tenant",)
+)
+CLIENT_GENERATED_TOKENS = REGISTRY.counter(
+    "llm_swarm_client_generated_tokens_total", "Tokens generated for the client's requests", ("tenant",)
+)
+SINK_WRITE_LATENCY = REGISTRY.histogram(
+    "llm_swarm_sink_write_duration_seconds", "Time to write rows to a shard or commit it", ("operation",)
+)
+SINK_ROWS = REGISTRY.counter("llm_swarm_sink_rows_total", "Rows written to shards and committed", ("operation",))
@@ -0,0 +1,413 @@
+"""A CPU-only stand-in for TGI and vLLM, to develop and benchmark the swarm without GPUs.
+
+    python -m llm_swarm.mock_server --inference-engine tgi --instances 4 --endpoints-file logs/mock_endpoints.txt
+    python -m llm_swarm.load_balancer --endpoints logs/mock_endpoints.txt
+
+The server speaks the engines' `/generate` (TGI also `/` and `/generate_stream`), `/health`
+and `/metrics` protocols, streaming included, and simulates continuous batching: up to
+`max_batch_size` sequences decode together, the rest queue. Whitespace-separated words of the
+prompt count as tokens, and every sequence generates exactly `max_new_tokens` tokens.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Literal, Optional, Set
+
+from aiohttp import web
+
+from .utils import get_unused_port
+
+MOCK_CONFIG_PATH = "/_mock/config"
+VOCABULARY = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit")
+
+
+@dataclass
+class LatencyModel:
+    """How long the simulated engine takes to serve requests.
+
+    Every decoding step generates one token for each running sequence and lasts
+    `max(1 / decode_tokens_per_s, running / batch_tokens_per_s)`, plus the time to prefill
+    the prompts of the sequences joining the batch at that step.
+
+    Args:
+        prefill_tokens_per_s (float): Prompt tokens processed per second. Defaults to 20000.
+        decode_tokens_per_s (float): Tokens per second of a sequence decoding alone. Defaults to 50.
+        batch_tokens_per_s (float): Tokens per second of the whole batch at most. Defaults to 2000.
+        max_batch_size (int): Sequences decoding together; the others queue. Defaults to 128.
+        max_queue (int): Queued requests above which new ones are rejected as overloaded. Defaults to 2000.
+    """
+
+    prefill_tokens_per_s: float = 20_000
+    decode_tokens_per_s: float = 50
+    batch_tokens_per_s: float = 2_000
+    max_batch_size: int = 128
+    max_queue: int = 2_000
+
+    def step_time(self, running: int, prefill_tokens: int) -> float:
+        return prefill_tokens / self.prefill_tokens_per_s + max(
+            1 / self.decode_tokens_per_s, running / self.batch_tokens_per_s
+        )
+
+
+@dataclass
+class Faults:
+    """Failures injected by the mock server, changeable at runtime with a POST of JSON to `/_mock/config`.
+
+    Args:
+        startup_delay (float): Seconds to wait before listening, as engines do while loading weights. Defaults to 0.
+        error_rate (float): Fraction of generation requests answered with a 500. Defaults to 0.
+        hang_rate (float): Fraction of generation requests never answered. Defaults to 0.
+        slowdown (float): Factor applied to the duration of every decoding step. Defaults to 1.
+        unhealthy (bool): Answer 503 on `/health`. Defaults to False.
+    """
+
+    startup_delay: float = 0.0
+    error_rate: float = 0.0
+    hang_rate: float = 0.0
+    slowdown: float = 1.0
+    unhealthy: bool = False
+
+
+@dataclass
+class _Sequence:
+    prompt_tokens: int
+    max_new_tokens: int
+    queued_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+    generated: int = 0
+    cancelled: bool = False
+    tokens: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+    @property
+    def queue_time(self) -> float:
+        return (self.started_at or time.perf_counter()) - self.queued_at
+
+
+class MockServer:
+    def __init__(
+        self,
+        inference_engine: Literal["tgi", "vllm"] = "tgi",
+        host: str = "0.0.0.0",
+        port: Optional[int] = None,
+        model: str = "mock",
+        latency: Optional[LatencyModel] = None,
+        faults: Optional[Faults] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Serve a simulated TGI or vLLM engine.
+
+        Args:
+            inference_engine (Literal["tgi", "vllm"], optional): Protocol to speak. Defaults to "tgi".
+            host (str, optional): Interface to listen on. Defaults to "0.0.0.0".
+            port (Optional[int], optional): Port to listen on. Defaults to an unused port.
+            model (str, optional): Model name reported by `/info` and `/metrics`. Defaults to "mock".
+            latency (Optional[LatencyModel], optional): Speed of the engine. Defaults to LatencyModel().
+            faults (Optional[Faults], optional): Failures to inject. Defaults to Faults() (none).
+            seed (Optional[int], optional): Seed of the failure injection. Defaults to None.
+        """
+        self.inference_engine = inference_engine
+        self.host = host
+        self.port = port or get_unused_port()
+        self.model = model
+        self.latency = latency or LatencyModel()
+        self.faults = faults or Faults()
+        self.requests = 0
+        self.errors = 0
+        self.generated_tokens = 0
+        self._random = random.Random(seed)
+        self._waiting: Deque[_Sequence] = deque()
+        self._running: List[_Sequence] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._engine: Optional[asyncio.Task] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://localhost:{self.port}"
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "generated_tokens": self.generated_tokens,
+            "running": len(self._running),
+            "waiting": len(self._waiting),
+        }
+
+    async def _run_engine(self) -> None:
+        while True:
+            if not self._waiting and not self._running:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            joining = []
+            while self._waiting and len(self._running) < self.latency.max_batch_size:
+                sequence = self._waiting.popleft()
+                if not sequence.cancelled:
+                    sequence.started_at = time.perf_counter()
+                    joining.append(sequence)
+                    self._running.append(sequence)
+            prefill_tokens = sum(sequence.prompt_tokens for sequence in joining)
+            await asyncio.sleep(self.latency.step_time(len(self._running), prefill_tokens) * self.faults.slowdown)
+            for sequence in self._running:
+                sequence.generated += 1
+                sequence.tokens.put_nowait(VOCABULARY[sequence.generated % len(VOCABULARY)])
+            self.generated_tokens += len(self._running)
+            self._running = [
+                sequence
+                for sequence in self._running
+                if sequence.generated < sequence.max_new_tokens and not sequence.cancelled
+            ]
+
+    async def _admit(self, prompt: str, max_new_tokens: int) -> _Sequence:
+        """Queue a sequence, or raise the HTTP error the injected faults or a full queue call for."""
+        self.requests += 1
+        if self._random.random() < self.faults.error_rate:
+            self.errors += 1
+            raise web.HTTPInternalServerError(
+                text=json.dumps({"error": "injected failure", "error_type": "generation"}),
+                content_type="application/json",
+            )
+        if self._random.random() < self.faults.hang_rate:
+            await asyncio.Event().wait()
+        if len(self._waiting) >= self.latency.max_queue:
+            self.errors += 1
+            raise web.HTTPTooManyRequests(
+                text=json.dumps({"error": "Model is overloaded", "error_type": "overloaded"}),
+                content_type="application/json",
+            )
+        sequence = _Sequence(prompt_tokens=max(1, len(prompt.split())), max_new_tokens=max(1, max_new_tokens))
+        self._waiting.append(sequence)
+        self._wakeup.set()
+        return sequence
+
+    def _headers(self, sequence: _Sequence, start: float) -> Dict[str, str]:
+        # the headers TGI sets on every generation response, in milliseconds
+        inference_time = time.perf_counter() - start - sequence.queue_time
+        return {
+            "x-compute-type": "mock",
+            "x-queue-time": str(int(sequence.queue_time * 1000)),
+            "x-inference-time": str(int(inference_time * 1000)),
+            "x-time-per-token": str(int(inference_time * 1000 / max(1, sequence.generated))),
+            "x-prompt-tokens": str(sequence.prompt_tokens),
+            "x-generated-tokens": str(sequence.generated),
+        }
+
+    async def _generate(self, request: web.Request) -> web.StreamResponse:
+        # tracked so `stop` doesn't wait on hung or abandoned requests
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            body = await request.json()
+            if self.inference_engine == "vllm":
+                return await self._generate_vllm(request, body)
+            if request.path == "/generate_stream" or body.get("stream"):
+                return await self._generate_tgi_stream(request, body)
+            return await self._generate_tgi(request, body)
+        finally:
+            self._handlers.discard(handler)
+
+    async def _generate_tgi(self, request: web.Request, body: Dict) -> web.Response:
+        start = time.perf_counter()
+        parameters = body.get("parameters") or {}
+        sequence = await self._admit(body["inputs"], parameters.get("max_new_tokens", 20))
+        tokens = []
+        try:
+            while len(tokens) < sequence.max_new_tokens:
+                tokens.append(" " + await sequence.tokens.get())
+        finally:
+            sequence.cancelled = True
+        result = {"generated_text": "".join(tokens)}
+        if parameters.get("details"):
+            result["details"] = {"finish_reason": "length", "generated_tokens": len(tokens), "seed": parameters.get("seed")}
+        # TGI answers a list on `/` and an object on `/generate`
+        return web.json_response([result] if request.path == "/" else result, headers=self._headers(sequence, start))
+
+    async def _generate_tgi_stream(self, request: web.Request, body: Dict) -> web.StreamResponse:
+        parameters = body.get("parameters") or {}
+        sequence = await self._admit(body["inputs"], parameters.get("max_new_tokens", 20))
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        text = ""
+        try:
+            for index in range(sequence.max_new_tokens):
+                token = " " + await sequence.tokens.get()
+                text += token
+                event = {
+                    "index": index,
+                    "token": {"id": index, "text": token, "logprob": 0.0, "special": False},
+                    "generated_text": None,
+                    "details": None,
+                }
+                if index == sequence.max_new_tokens - 1:
+                    event["generated_text"] = text
+                    event["details"] = {"finish_reason": "length", "generated_tokens": index + 1, "seed": None}
+                await response.write(b"data:" + json.dumps(event).encode() + b"\n\n")
+        finally:
+            sequence.cancelled = True
+        await response.write_eof()
+        return response
+
+    async def _generate_vllm(self, request: web.Request, body: Dict) -> web.StreamResponse:
+        start = time.perf_counter()
+        prompt = body["prompt"]
+        sequence = await self._admit(prompt, body.get("max_tokens", 16))
+        # vLLM's api_server echoes the prompt in front of the completion
+        text = prompt
+        try:
+            if not body.get("stream"):
+                for _ in range(sequence.max_new_tokens):
+                    text += " " + await sequence.tokens.get()
+                return web.json_response({"text": [text]}, headers=self._headers(sequence, start))
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for _ in range(sequence.max_new_tokens):
+                text += " " + await sequence.tokens.get()
+                await response.write(json.dumps({"text": [text]}).encode() + b"\0")
+            await response.write_eof()
+            return response
+        finally:
+            sequence.cancelled = True
+
+    async def _health(self, request: web.Request) -> web.Response:
+        if self.faults.unhealthy:
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _info(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"model_id": self.model, "max_batch_size": self.latency.max_batch_size, "version": "mock"}
+        )
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        if self.inference_engine == "vllm":
+            labels = f'{{model_name="{self.model}"}}'
+            lines = [
+                f"vllm:num_requests_waiting{labels} {len(self._waiting)}",
+                f"vllm:num_requests_running{labels} {len(self._running)}",
+                f"vllm:generation_tokens_total{labels} {self.generated_tokens}",
+            ]
+        else:
+            lines = [
+                f"tgi_queue_size {len(self._waiting)}",
+                f"tgi_batch_current_size {len(self._running)}",
+                f"tgi_request_count {self.requests}",
+            ]
+        return web.Response(text="\n".join(lines) + "\n")
+
+    async def _configure(self, request: web.Request) -> web.Response:
+        for key, value in (await request.json()).items():
+            if not hasattr(self.faults, key):
+                raise web.HTTPBadRequest(text=f"unknown fault {key!r}")
+            setattr(self.faults, key, type(getattr(self.faults, key))(value))
+        return web.json_response(asdict(self.faults))
+
+    async def start(self) -> None:
+        """Start serving on the current event loop, once `faults.startup_delay` has elapsed."""
+        self._wakeup = asyncio.Event()
+        self._engine = asyncio.ensure_future(self._run_engine())
+        app = web.Application()
+        app.router.add_post("/generate", self._generate)
+        if self.inference_engine == "tgi":
+            app.router.add_post("/", self._generate)
+            app.router.add_post("/generate_stream", self._generate)
+            app.router.add_get("/info", self._info)
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_post(MOCK_CONFIG_PATH, self._configure)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await asyncio.sleep(self.faults.startup_delay)
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        for handler in list(self._handlers):
+            handler.cancel()
+        if self._engine is not None:
+            self._engine.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def start_in_thread(self) -> "MockServer":
+        """Run the server on its own event loop in a daemon thread and return once it listens."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+def main():
+    latency, faults = LatencyModel(), Faults()
+    parser = argparse.ArgumentParser(description="Mock TGI or vLLM engine with a configurable latency model")
+    parser.add_argument("--inference-engine", choices=["tgi", "vllm"], default="tgi")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None, help="Port of the first instance, the others follow")
+    parser.add_argument("--instances", type=int, default=1)
+    parser.add_argument("--endpoints-file", default=None, help="Write the endpoints there, one per line")
+    parser.add_argument("--model", default="mock")
+    parser.add_argument("--seed", type=int, default=None)
+    for name, value in list(asdict(latency).items()) + list(asdict(faults).items()):
+        if isinstance(value, bool):
+            parser.add_argument(f"--{name.replace('_', '-')}", action="store_true")
+        else:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    async def serve():
+        servers = []
+        for index in range(args.instances):
+            servers.append(
+                MockServer(
+                    args.inference_engine,
+                    host=args.host,
+                    port=args.port + index if args.port else None,
+                    model=args.model,
+                    latency=LatencyModel(**{name: getattr(args, name) for name in asdict(latency)}),
+                    faults=Faults(**{name: getattr(args, name) for name in asdict(faults)}),
+                    seed=None if args.seed is None else args.seed + index,
+                )
+            )
+            await servers[-1].start()
+            print(f"🔥 mock {args.inference_engine} ready {servers[-1].endpoint}")
+        if args.endpoints_file:
+            with open(args.endpoints_file, "w") as f:
+                f.write("".join(f"{server.endpoint}\n" for server in servers))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for server in servers:
+                await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from . import LLMSwarm
+from .client import SwarmClient
+from .concurrency import AdaptiveConcurrencyLimiter
+from .load_balancer import LoadBalancer
+from .routing import ROUTING_POLICIES
+from .utils import LLMSwarmConfig
+
+
+class MultiModelSwarm:
+    def __init__(
+        self,
+        configs: Sequence[LLMSwarmConfig],
+        routing_policy: str = "least_requests",
+        engine_metrics_poll_interval: Optional[float] = None,
+    ) -> None:
+        """One swarm hosting a pool of instances per model behind a single load balancer.
+
+        Each pool is an `LLMSwarm` with its own configuration (instances, engine, template,
+        scaling and health checks), registering its instances with the shared load balancer,
+        which routes every request to the pool of the model it names. Pools start in parallel,
+        so the swarm is ready once its slowest model is.
+
+        Args:
+            configs (Sequence[LLMSwarmConfig]): One configuration per pool, each for a different `model`.
+            routing_policy (str, optional): How requests are spread within a pool (see `ROUTING_POLICIES`).
+                Defaults to "least_requests".
+            engine_metrics_poll_interval (Optional[float], optional): How often the load balancer reads the
+                engines' queue depths. Defaults to None (never).
+        """
+        models = [config.model for config in configs]
+        if not models:
+            raise ValueError("A multi-model swarm needs at least one pool")
+        if len(set(models)) != len(models):
+            raise ValueError(f"Each pool must serve a different model, got {models}")
+        self.load_balancer = LoadBalancer(
+            [], policy=ROUTING_POLICIES[routing_policy](), queue_poll_interval=engine_metrics_poll_interval
+        )
+        self.pools: Dict[str, LLMSwarm] = {
+            config.model: LLMSwarm(config, load_balancer=self.load_balancer.pool(config.model)) for config in configs
+        }
+        self.endpoint = None
+        self.limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+        self.cleaned_up = False
+
+    @property
+    def models(self) -> List[str]:
+        return list(self.pools)
+
+    @property
+    def suggested_max_parallel_requests(self) -> int:
+        return sum(pool.suggested_max_parallel_requests for pool in self.pools.values())
+
+    def start(self) -> None:
+        """Start the load balancer and every pool, and wait for all of them to be reachable."""
+        self.load_balancer.start_in_thread()
+        self.endpoint = self.load_balancer.endpoint
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.pools)) as executor:
+                for future in [executor.submit(pool.start) for pool in self.pools.values()]:
+                    future.result()
+        except BaseException:
+            # don't leave the pools that did start running
+            self.cleanup()
+            raise
+        print(f"🔥 {len(self.pools)} model pools ready at {self.endpoint}: {', '.join(self.models)}")
+
+    def client(self, tenant: str = "default", priority: float = 0, weight: Optional[float] = None, **kwargs) -> SwarmClient:
+        """Return an async generation client for every model of the swarm, over one connection pool.
+
+        Requests name their model (`GenerationRequest.model`, or `SwarmClient.fan_out` to ask
+        several); each model has its own adaptive concurrency limit sized to its pool, shared
+        by the clients of the swarm.
+
+        Args:
+            tenant (str, optional): Name of the job using the client. Defaults to "default".
+            priority (float, optional): Priority of the client's requests over other tenants'. Defaults to 0.
+            weight (Optional[float], optional): Share of the swarm given to `tenant`. Defaults to None (1).
+            **kwargs: Overrides for `SwarmClient` arguments.
+
+        Returns:
+            SwarmClient: The client.
+        """
+        for model, pool in self.pools.items():
+            if model not in self.limiters:
+                self.limiters[model] = AdaptiveConcurrencyLimiter(
+                    initial_limit=max(1, pool.suggested_max_parallel_requests // 4),
+                    max_limit=2 * pool.suggested_max_parallel_requests,
+                )
+        options = {
+            "inference_engine": next(iter(self.pools.values())).config.inference_engine,
+            "max_parallel_requests": self.suggested_max_parallel_requests,
+            "model_engines": {model: pool.config.inference_engine for model, pool in self.pools.items()},
+            "model_limiters": self.limiters,
+            "tenant": tenant,
+            "priority": priority,
+            "weight": weight,
+        }
+        options.update(kwargs)
+        return SwarmClient(self.endpoint, **options)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def cleanup(self) -> None:
+        if self.cleaned_up:
+            return
+        with ThreadPoolExecutor(max_workers=len(self.pools)) as executor:
+            list(executor.map(LLMSwarm.cleanup, self.pools.values()))
+        self.load_balancer.stop_thread()
+        print("load balancer terminated")
+        self.cleaned_up = True
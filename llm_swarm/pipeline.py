@@ -0,0 +1,176 @@
+import asyncio
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+
+from tqdm.auto import tqdm
+
+from .sink import ParquetSink
+from .tracing import Trace, Tracer
+
+Row = Dict[str, Any]
+Rows = Union[Iterable[Row], AsyncIterable[Row]]
+
+
+async def _enumerate(rows: Rows) -> AsyncIterator[Tuple[int, Row]]:
+    # async iterables (e.g. `PromptRenderer.aiter_rendered`) produce their rows without blocking the event loop
+    if hasattr(rows, "__aiter__"):
+        offset = 0
+        async for row in rows:
+            yield offset, row
+            offset += 1
+    else:
+        for offset, row in enumerate(rows):
+            yield offset, row
+
+
+class Watermark:
+    """Tracks which offsets of a stream completed, when they complete out of order.
+
+    Args:
+        offset (int): Every offset below it is complete.
+        done (Set[int]): Completed offsets at or above `offset`; at most the size of the window.
+    """
+
+    def __init__(self, offset: int = 0, done: Iterable[int] = ()) -> None:
+        self.offset = offset
+        self.done: Set[int] = set(done)
+
+    def complete(self, offset: int) -> None:
+        self.done.add(offset)
+        while self.offset in self.done:
+            self.done.remove(self.offset)
+            self.offset += 1
+
+    def is_complete(self, offset: int) -> bool:
+        return offset < self.offset or offset in self.done
+
+    def state(self) -> Dict[str, Any]:
+        return {"watermark": self.offset, "done": sorted(self.done)}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Watermark":
+        return cls(state.get("watermark", 0), state.get("done", ()))
+
+
+class Pipeline:
+    def __init__(
+        self,
+        process: Callable[[Row], Awaitable[Row]],
+        window: int = 256,
+        progress: bool = True,
+        tracer: Optional[Tracer] = None,
+    ) -> None:
+        """Run `process` over a stream of rows with a sliding window of requests in flight.
+
+        Rows are pulled lazily from the (sync or async) iterable and a new one starts as soon as any in-flight
+        one completes, so a single long generation never holds back the rest of the swarm the
+        way chunking with `asyncio.gather` does.
+
+        Args:
+            process (Callable[[Row], Awaitable[Row]]): Turns an input row into a result row.
+            window (int, optional): Rows processed at the same time. Set it to at least the swarm's
+                `suggested_max_parallel_requests` so the swarm stays busy. Defaults to 256.
+            progress (bool, optional): Show a progress bar. Defaults to True.
+            tracer (Optional[Tracer], optional): Trace (a sample of) the rows, from the start of `process`
+                to their write to the sink; the client's requests join the row's trace. Defaults to None.
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.process = process
+        self.window = window
+        self.progress = progress
+        self.tracer = tracer
+
+    async def _process(self, offset: int, row: Row) -> Tuple[int, Row, Optional[Trace]]:
+        if self.tracer is None:
+            return offset, await self.process(row), None
+        with self.tracer.trace(defer=True, offset=offset) as trace:
+            return offset, await self.process(row), trace
+
+    async def stream(self, rows: Rows, watermark: Optional[Watermark] = None) -> AsyncIterator[Tuple[int, Row]]:
+        """Yield `(offset, result)` in completion order, skipping offsets `watermark` marks as complete.
+
+        No new row starts while the consumer handles a result, so a slow consumer throttles
+        the pipeline instead of letting results pile up in memory.
+        """
+        async for offset, result, trace in self._stream(rows, watermark):
+            if trace is not None:
+                self.tracer.emit(trace)
+            yield offset, result
+
+    async def _stream(
+        self, rows: Rows, watermark: Optional[Watermark] = None
+    ) -> AsyncIterator[Tuple[int, Row, Optional[Trace]]]:
+        watermark = watermark or Watermark()
+        total = len(rows) if hasattr(rows, "__len__") else None
+        progress_bar = tqdm(total=total, initial=watermark.offset + len(watermark.done), disable=not self.progress)
+        iterator = _enumerate(rows)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.window:
+                    try:
+                        offset, row = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    if watermark.is_complete(offset):
+                        continue
+                    pending.add(asyncio.ensure_future(self._process(offset, row)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    offset, result, trace = task.result()
+                    watermark.complete(offset)
+                    progress_bar.update()
+                    yield offset, result, trace
+        finally:
+            for task in pending:
+                task.cancel()
+            await iterator.aclose()
+            progress_bar.close()
+
+    async def run(self, rows: Rows, sink: ParquetSink) -> int:
+        """Process `rows` into `sink`, resuming from the progress recorded in its manifest.
+
+        Each result is written with the watermark of completed offsets, so a rerun after a
+        crash skips exactly the rows in committed shards. Results are written from a worker
+        thread; while a write is in progress no new request starts.
+
+        Returns:
+            int: Number of rows processed by this run.
+        """
+        watermark = Watermark.from_state(sink.state)
+        if watermark.offset or watermark.done:
+            print(f"⏩ resuming after {watermark.offset + len(watermark.done)} completed rows")
+        processed = 0
+        batch = []
+        traces = []
+        async for _, result, trace in self._stream(rows, watermark):
+            processed += 1
+            batch.append((result, watermark.state()))
+            if trace is not None:
+                traces.append((trace, time.perf_counter()))
+            # write in batches: one thread hop per completed row would cost more than the write itself
+            if len(batch) >= max(1, self.window // 8):
+                await self._write(sink, batch, traces)
+                batch, traces = [], []
+        await self._write(sink, batch, traces)
+        await asyncio.to_thread(sink.close)
+        return processed
+
+    async def _write(self, sink: ParquetSink, batch, traces) -> None:
+        start = time.perf_counter()
+        await asyncio.to_thread(self._write_rows, sink, batch)
+        end = time.perf_counter()
+        for trace, completed in traces:
+            trace.add("sink_buffer", completed, start)
+            trace.add("sink", start, end)
+            self.tracer.emit(trace)
+
+    @staticmethod
+    def _write_rows(sink: ParquetSink, batch) -> None:
+        for result, state in batch:
+            sink.write(result, state=state)
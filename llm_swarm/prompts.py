@@ -0,0 +1,163 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+Message = Dict[str, str]
+Row = Dict[str, Any]
+
+# tokenizer of each worker process, loaded once by `_init_worker`
+_worker_tokenizer = None
+
+
+def _load_tokenizer(tokenizer: Union[str, Any], revision: str) -> Any:
+    if isinstance(tokenizer, str):
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(tokenizer, revision=revision)
+    return tokenizer
+
+
+def render_conversations(
+    tokenizer: Any, conversations: List[List[Message]], add_generation_prompt: bool = True
+) -> Tuple[List[str], List[int]]:
+    """Render conversations with the tokenizer's chat template and count the tokens of each prompt.
+
+    Returns:
+        Tuple[List[str], List[int]]: The prompts and their lengths in tokens.
+    """
+    prompts = [
+        tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=add_generation_prompt)
+        for messages in conversations
+    ]
+    # the chat template already spells out the special tokens it needs
+    lengths = [len(ids) for ids in tokenizer(prompts, add_special_tokens=False)["input_ids"]]
+    return prompts, lengths
+
+
+def _init_worker(tokenizer: Union[str, Any], revision: str) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = _load_tokenizer(tokenizer, revision)
+
+
+def _render_in_worker(conversations: List[List[Message]], add_generation_prompt: bool) -> Tuple[List[str], List[int]]:
+    return render_conversations(_worker_tokenizer, conversations, add_generation_prompt)
+
+
+class PromptRenderer:
+    def __init__(
+        self,
+        tokenizer: Union[str, Any],
+        messages: Union[str, Callable[[Row], List[Message]]] = "messages",
+        revision: str = "main",
+        add_generation_prompt: bool = True,
+        prompt_column: str = "rendered_prompt",
+        length_column: str = "prompt_tokens",
+        batch_size: int = 256,
+        num_workers: int = 4,
+        prefetch: int = 8,
+    ) -> None:
+        """Render the chat template of every row once, in batches and ahead of dispatch.
+
+        Each row gets its rendered prompt and its length in tokens, which retries, cache
+        lookups and token-aware routing then reuse instead of rendering again in the hot
+        path. Either map it over a dataset up front (`ds.map(renderer, batched=True,
+        num_proc=...)`, cached by `datasets`), or wrap the rows fed to a `Pipeline` with
+        `aiter_rendered`, which renders the next batches in a process pool while the
+        current ones are being generated, without blocking the event loop.
+
+        Args:
+            tokenizer (Union[str, Any]): A `transformers` tokenizer, or the name of the model to load it from.
+            messages (Union[str, Callable[[Row], List[Message]]], optional): Column holding the messages, or a
+                function extracting them from a row. Defaults to "messages".
+            revision (str, optional): Revision of the model, when loading the tokenizer by name. Defaults to "main".
+            add_generation_prompt (bool, optional): End the prompt with the assistant's cue. Defaults to True.
+            prompt_column (str, optional): Column receiving the rendered prompt. Defaults to "rendered_prompt".
+            length_column (str, optional): Column receiving its length in tokens. Defaults to "prompt_tokens".
+            batch_size (int, optional): Rows rendered per batch. Defaults to 256.
+            num_workers (int, optional): Processes of the rendering pool. Defaults to 4.
+            prefetch (int, optional): Batches rendered ahead of the rows being consumed. Defaults to 8.
+        """
+        self.tokenizer = tokenizer
+        self.messages = messages
+        self.revision = revision
+        self.add_generation_prompt = add_generation_prompt
+        self.prompt_column = prompt_column
+        self.length_column = length_column
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = max(1, prefetch)
+        self._local_tokenizer = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # `datasets.map(num_proc=...)` pickles the renderer: leave the pool and loaded tokenizer behind
+        state = dict(self.__dict__)
+        state["_local_tokenizer"] = None
+        state["_pool"] = None
+        return state
+
+    def _messages(self, row: Row) -> List[Message]:
+        if callable(self.messages):
+            return self.messages(row)
+        return row[self.messages]
+
+    def __call__(self, batch: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """Render a batch of `datasets` rows (for `Dataset.map(..., batched=True)`)."""
+        if self._local_tokenizer is None:
+            self._local_tokenizer = _load_tokenizer(self.tokenizer, self.revision)
+        rows = [dict(zip(batch, values)) for values in zip(*batch.values())]
+        prompts, lengths = render_conversations(
+            self._local_tokenizer, [self._messages(row) for row in rows], self.add_generation_prompt
+        )
+        return {self.prompt_column: prompts, self.length_column: lengths}
+
+    def _render_ahead(self, rows: Iterable[Row]) -> Iterator[Tuple[List[Row], "Future[Tuple[List[str], List[int]]]"]]:
+        """Yield the batches of `rows` with the future of their rendering, keeping `prefetch` batches submitted."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers, initializer=_init_worker, initargs=(self.tokenizer, self.revision)
+            )
+        iterator = iter(rows)
+        pending = deque()
+
+        def submit() -> None:
+            batch = list(islice(iterator, self.batch_size))
+            if batch:
+                conversations = [self._messages(row) for row in batch]
+                pending.append((batch, self._pool.submit(_render_in_worker, conversations, self.add_generation_prompt)))
+
+        for _ in range(self.prefetch):
+            submit()
+        while pending:
+            batch, future = pending.popleft()
+            submit()
+            yield batch, future
+
+    def _with_prompts(self, batch: List[Row], prompts: List[str], lengths: List[int]) -> Iterator[Row]:
+        for row, prompt, length in zip(batch, prompts, lengths):
+            row = dict(row)
+            row[self.prompt_column] = prompt
+            row[self.length_column] = length
+            yield row
+
+    def iter_rendered(self, rows: Iterable[Row]) -> Iterator[Row]:
+        """Yield the rows in order with their prompt rendered, rendering `prefetch` batches ahead in worker processes.
+
+        Blocks while a batch renders: use `aiter_rendered` from an event loop (e.g. for a `Pipeline`).
+        """
+        for batch, future in self._render_ahead(rows):
+            yield from self._with_prompts(batch, *future.result())
+
+    async def aiter_rendered(self, rows: Iterable[Row]) -> AsyncIterator[Row]:
+        """Like `iter_rendered`, but awaits each batch so the requests in flight keep going while it renders."""
+        for batch, future in self._render_ahead(rows):
+            prompts, lengths = await asyncio.wrap_future(future)
+            for row in self._with_prompts(batch, prompts, lengths):
+                yield row
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class PhaseTiming:
+    """Time it took every item of a startup phase to become ready.
+
+    Args:
+        phase (str): Name of the phase (e.g. "jobs" or "endpoints").
+        ready_after (Dict[str, float]): Seconds from the start of the phase until each item was ready.
+    """
+
+    phase: str
+    ready_after: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return max(self.ready_after.values(), default=0.0)
+
+    @property
+    def slowest(self) -> Optional[str]:
+        if not self.ready_after:
+            return None
+        return max(self.ready_after, key=self.ready_after.get)
+
+    def summary(self) -> str:
+        return f"{self.phase}: {len(self.ready_after)} ready in {self.total:.1f}s (slowest {self.slowest})"
+
+
+class ReadinessTracker:
+    def __init__(
+        self,
+        poll_interval: float = 3.0,
+        max_poll_interval: float = 5.0,
+        backoff: float = 1.5,
+        timeout: Optional[float] = None,
+        max_workers: int = 32,
+    ) -> None:
+        """Watch many jobs or endpoints at once until all of them are ready.
+
+        Every item is polled from its own worker so the time spent in a phase is bounded
+        by the slowest item instead of the sum of all of them.
+
+        Args:
+            poll_interval (float, optional): Initial delay between two polls of an item. Defaults to 3.0.
+            max_poll_interval (float, optional): Upper bound of the delay once backoff kicks in. Defaults to 5.0.
+            backoff (float, optional): Factor applied to the delay after every unsuccessful poll. Defaults to 1.5.
+            timeout (Optional[float], optional): Seconds after which a phase is aborted. Defaults to None (wait forever).
+            max_workers (int, optional): Maximum number of concurrent pollers. Defaults to 32.
+        """
+        if poll_interval <= 0:
+            raise ValueError("poll_interval must be greater than zero")
+        if backoff < 1:
+            raise ValueError("backoff must be at least 1")
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.timings: List[PhaseTiming] = []
+
+    def wait_until(self, phase: str, items: List[str], is_ready: Callable[[str], bool]) -> PhaseTiming:
+        """Block until `is_ready(item)` returned True for every item.
+
+        Exceptions raised by `is_ready` count as "not ready yet", except for `RuntimeError`
+        which schedulers use to signal a job that died and is propagated right away.
+
+        Args:
+            phase (str): Name of the phase, used in the timing report.
+            items (List[str]): Job IDs or endpoints to watch.
+            is_ready (Callable[[str], bool]): Readiness probe for a single item.
+
+        Returns:
+            PhaseTiming: Per-item time to readiness.
+        """
+        timing = PhaseTiming(phase)
+        if not items:
+            self.timings.append(timing)
+            return timing
+
+        start = time.monotonic()
+        deadline = start + self.timeout if self.timeout is not None else None
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            futures = {pool.submit(self._poll, item, is_ready, start, deadline, stop): item for item in items}
+            try:
+                for future in as_completed(futures):
+                    timing.ready_after[futures[future]] = future.result()
+            except BaseException:
+                stop.set()
+                raise
+        self.timings.append(timing)
+        return timing
+
+    def _poll(
+        self,
+        item: str,
+        is_ready: Callable[[str], bool],
+        start: float,
+        deadline: Optional[float],
+        stop: threading.Event,
+    ) -> float:
+        interval = self.poll_interval
+        while not stop.is_set():
+            try:
+                if is_ready(item):
+                    return time.monotonic() - start
+            except RuntimeError:
+                raise
+            except Exception:
+                pass
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise TimeoutError(f"{item} was not ready after {self.timeout}s")
+            wait = interval if deadline is None else min(interval, deadline - now)
+            stop.wait(wait)
+            interval = min(interval * self.backoff, self.max_poll_interval)
+        raise RuntimeError(f"Stopped waiting for {item}")
+
+    def report(self) -> str:
+        """Return a human readable summary of every phase tracked so far."""
+        lines = [timing.summary() for timing in self.timings]
+        lines.append(f"total: {sum(timing.total for timing in self.timings):.1f}s")
+        return "\n".join(lines)
@@ -0,0 +1,331 @@
+import bisect
+import hashlib
+import json
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+AFFINITY_KEY_HEADER = "X-Swarm-Affinity-Key"
+# set by clients that know the prompt's length in tokens (e.g. rendered by `PromptRenderer`)
+PROMPT_TOKENS_HEADER = "X-Swarm-Prompt-Tokens"
+# names the model pool a request is for, when the swarm serves several models
+MODEL_HEADER = "X-Swarm-Model"
+
+# Prometheus gauges reporting how many requests wait in the engine's queue
+QUEUE_DEPTH_METRICS = ("tgi_queue_size", "vllm:num_requests_waiting")
+_QUEUE_DEPTH_PATTERN = re.compile(
+    r"^(" + "|".join(re.escape(name) for name in QUEUE_DEPTH_METRICS) + r")(?:\{[^}]*\})?\s+([0-9.eE+-]+)$", re.MULTILINE
+)
+
+
+@dataclass
+class Backend:
+    """An inference endpoint behind the load balancer and its live routing counters.
+
+    Args:
+        url (str): Base URL of the endpoint (e.g. "http://26.0.154.245:13120").
+        outstanding (int): Requests currently being proxied to the endpoint.
+        requests (int): Requests routed to the endpoint so far.
+        errors (int): Requests that failed to reach the endpoint.
+        draining (bool): Whether the endpoint stopped receiving new requests.
+        outstanding_tokens (float): Estimated token work of the requests in flight.
+        queue_depth (Optional[float]): Requests waiting in the engine's queue, when the engine reports it.
+        job_id (Optional[str]): Scheduler job serving the endpoint, when known; labels its metrics.
+        model (Optional[str]): Model pool the endpoint belongs to, in a swarm serving several models.
+    """
+
+    url: str
+    outstanding: int = 0
+    requests: int = 0
+    errors: int = 0
+    draining: bool = False
+    outstanding_tokens: float = 0.0
+    queue_depth: Optional[float] = None
+    job_id: Optional[str] = None
+    model: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "draining": self.draining,
+            "outstanding_tokens": self.outstanding_tokens,
+            "queue_depth": self.queue_depth,
+        }
+
+
+def parse_queue_depth(metrics: str) -> Optional[float]:
+    """Extract the engine queue depth from a TGI or vLLM `/metrics` page."""
+    values = [float(value) for _, value in _QUEUE_DEPTH_PATTERN.findall(metrics)]
+    return sum(values) if values else None
+
+
+@dataclass
+class ProxyRequest:
+    """The part of an incoming request routing policies can look at.
+
+    Args:
+        method (str): HTTP method.
+        path (str): Path and query string.
+        body (bytes): Raw request body.
+        headers (Dict[str, str]): Request headers.
+    """
+
+    method: str
+    path: str
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @cached_property
+    def json(self) -> Optional[Dict[str, Any]]:
+        """The body decoded as a JSON object, or None when it isn't one."""
+        if not self.body:
+            return None
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    @property
+    def prompt(self) -> str:
+        """The prompt of a TGI (`inputs`) or vLLM (`prompt`) request, empty when there is none."""
+        payload = self.json or {}
+        prompt = payload.get("inputs", payload.get("prompt", ""))
+        if isinstance(prompt, list):
+            prompt = "".join(item for item in prompt if isinstance(item, str))
+        return prompt if isinstance(prompt, str) else ""
+
+    @property
+    def model(self) -> Optional[str]:
+        """The model the request is for: the `X-Swarm-Model` header, or the body's `model` (OpenAI style)."""
+        model = self.headers.get(MODEL_HEADER)
+        if model is None:
+            model = (self.json or {}).get("model")
+        return model if isinstance(model, str) else None
+
+    @property
+    def prompt_tokens(self) -> Optional[int]:
+        """The prompt's length in tokens, when the client sent it."""
+        value = self.headers.get(PROMPT_TOKENS_HEADER)
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    @property
+    def max_new_tokens(self) -> Optional[int]:
+        """The TGI `parameters.max_new_tokens` or vLLM `max_tokens` of the request."""
+        payload = self.json or {}
+        parameters = payload.get("parameters") or {}
+        return parameters.get("max_new_tokens", payload.get("max_tokens"))
+
+
+class RoutingPolicy(ABC):
+    @abstractmethod
+    def choose(self, backends: Sequence[Backend], request: ProxyRequest) -> Backend:
+        """
+        Picks the backend a request is sent to.
+
+        Args:
+            backends (Sequence[Backend]): Backends accepting new requests, never empty.
+            request (ProxyRequest): The request to route.
+
+        Returns:
+            Backend: The chosen backend.
+        """
+        pass
+
+    def on_start(self, backend: Backend, request: ProxyRequest) -> None:
+        """Called once the request is sent to `backend`."""
+        pass
+
+    def on_finish(self, backend: Backend, request: ProxyRequest) -> None:
+        """Called once the response from `backend` is fully streamed back (or failed)."""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Policy specific counters reported by the load balancer."""
+        return {}
+
+
+class LeastOutstandingRequests(RoutingPolicy):
+    """Send each request to the backend with the fewest requests in flight (nginx `least_conn`)."""
+
+    def __init__(self) -> None:
+        self._offset = 0
+
+    def choose(self, backends: Sequence[Backend], request: ProxyRequest) -> Backend:
+        # rotate the starting point so ties are broken round-robin
+        start = self._offset % len(backends)
+        self._offset += 1
+        best = backends[start]
+        for i in range(1, len(backends)):
+            backend = backends[(start + i) % len(backends)]
+            if backend.outstanding < best.outstanding:
+                best = backend
+        return best
+
+
+class LeastOutstandingTokens(RoutingPolicy):
+    def __init__(
+        self,
+        chars_per_token: float = 4.0,
+        prompt_token_weight: float = 0.1,
+        default_max_new_tokens: int = 256,
+    ) -> None:
+        """Send each request to the backend with the least estimated token work in flight.
+
+        A request costs `prompt_token_weight * prompt_tokens + max_new_tokens`: prefill
+        processes the prompt in parallel so a prompt token weighs far less than a decoded
+        one. When the engine reports its queue depth, every queued request adds the mean
+        cost of the requests seen so far.
+
+        Args:
+            chars_per_token (float, optional): Used to estimate prompt tokens when the client doesn't send their
+                count. Defaults to 4.0.
+            prompt_token_weight (float, optional): Cost of a prompt token relative to a generated one. Defaults to 0.1.
+            default_max_new_tokens (int, optional): Assumed when the request doesn't set it. Defaults to 256.
+        """
+        self.chars_per_token = chars_per_token
+        self.prompt_token_weight = prompt_token_weight
+        self.default_max_new_tokens = default_max_new_tokens
+        self._total_cost = 0.0
+        self._routed = 0
+        self._offset = 0
+
+    def estimate_cost(self, request: ProxyRequest) -> float:
+        """Estimate the token work of a TGI (`inputs`/`parameters`) or vLLM (`prompt`/`max_tokens`) request."""
+        max_new_tokens = request.max_new_tokens or self.default_max_new_tokens
+        prompt_tokens = request.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = len(request.prompt) / self.chars_per_token
+        return self.prompt_token_weight * prompt_tokens + max_new_tokens
+
+    def load(self, backend: Backend) -> float:
+        load = backend.outstanding_tokens
+        if backend.queue_depth and self._routed:
+            load += backend.queue_depth * self._total_cost / self._routed
+        return load
+
+    def choose(self, backends: Sequence[Backend], request: ProxyRequest) -> Backend:
+        request.metadata["cost"] = self.estimate_cost(request)
+        # rotate the starting point so ties (e.g. idle backends) are broken round-robin
+        start = self._offset % len(backends)
+        self._offset += 1
+        best, best_load = backends[start], self.load(backends[start])
+        for i in range(1, len(backends)):
+            backend = backends[(start + i) % len(backends)]
+            load = self.load(backend)
+            if load < best_load:
+                best, best_load = backend, load
+        return best
+
+    def on_start(self, backend: Backend, request: ProxyRequest) -> None:
+        cost = request.metadata["cost"]
+        backend.outstanding_tokens += cost
+        self._total_cost += cost
+        self._routed += 1
+
+    def on_finish(self, backend: Backend, request: ProxyRequest) -> None:
+        backend.outstanding_tokens -= request.metadata["cost"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mean_cost": self._total_cost / self._routed if self._routed else 0.0}
+
+
+class PrefixAffinity(RoutingPolicy):
+    def __init__(
+        self,
+        prefix_chars: int = 2048,
+        load_factor: float = 1.25,
+        virtual_nodes: int = 100,
+        max_tracked_keys: int = 100_000,
+    ) -> None:
+        """Send requests sharing a prompt prefix (or an affinity key) to the same backend.
+
+        Requests are placed on a consistent hash ring by the `X-Swarm-Affinity-Key` header
+        when present (e.g. a conversation id) or else by a fingerprint of the first
+        `prefix_chars` characters of the prompt, so they hit the engine's prefix cache.
+        A backend is skipped while it has more than `load_factor` times the average number
+        of requests in flight (consistent hashing with bounded loads).
+
+        Args:
+            prefix_chars (int, optional): Length of the prompt prefix fingerprinted. Defaults to 2048.
+            load_factor (float, optional): Bound on a backend's load relative to the average. Defaults to 1.25.
+            virtual_nodes (int, optional): Points per backend on the hash ring. Defaults to 100.
+            max_tracked_keys (int, optional): Keys remembered to measure affinity hits. Defaults to 100_000.
+        """
+        if load_factor < 1:
+            raise ValueError("load_factor must be at least 1")
+        self.prefix_chars = prefix_chars
+        self.load_factor = load_factor
+        self.virtual_nodes = virtual_nodes
+        self.max_tracked_keys = max_tracked_keys
+        self._ring: List[Tuple[int, str]] = []
+        self._ring_urls: Tuple[str, ...] = ()
+        self._last_backend: "OrderedDict[int, str]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "hits": 0, "spilled": 0})
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+    def affinity_key(self, request: ProxyRequest) -> int:
+        key = request.headers.get(AFFINITY_KEY_HEADER)
+        return self._hash(key if key is not None else request.prompt[: self.prefix_chars])
+
+    def _update_ring(self, backends: Sequence[Backend]) -> None:
+        urls = tuple(sorted(backend.url for backend in backends))
+        if urls == self._ring_urls:
+            return
+        self._ring = sorted((self._hash(f"{url}#{i}"), url) for url in urls for i in range(self.virtual_nodes))
+        self._ring_urls = urls
+
+    def choose(self, backends: Sequence[Backend], request: ProxyRequest) -> Backend:
+        self._update_ring(backends)
+        by_url = {backend.url: backend for backend in backends}
+        key = self.affinity_key(request)
+        capacity = math.ceil(self.load_factor * (sum(backend.outstanding for backend in backends) + 1) / len(backends))
+
+        start = bisect.bisect(self._ring, (key,))
+        chosen, preferred = None, None
+        for i in range(len(self._ring)):
+            url = self._ring[(start + i) % len(self._ring)][1]
+            preferred = preferred or url
+            if by_url[url].outstanding < capacity:
+                chosen = by_url[url]
+                break
+        if chosen is None:  # every backend is at capacity
+            chosen = by_url[preferred]
+
+        stats = self._stats[chosen.url]
+        stats["requests"] += 1
+        stats["spilled"] += chosen.url != preferred
+        stats["hits"] += self._last_backend.get(key) == chosen.url
+        self._last_backend[key] = chosen.url
+        self._last_backend.move_to_end(key)
+        if len(self._last_backend) > self.max_tracked_keys:
+            self._last_backend.popitem(last=False)
+        return chosen
+
+    def stats(self) -> Dict[str, Any]:
+        """Per backend: requests routed, affinity hits (same backend as the key's previous request) and hit rate."""
+        return {
+            url: {**stats, "hit_rate": stats["hits"] / stats["requests"] if stats["requests"] else 0.0}
+            for url, stats in self._stats.items()
+        }
+
+
+ROUTING_POLICIES = {
+    "least_requests": LeastOutstandingRequests,
+    "least_tokens": LeastOutstandingTokens,
+    "prefix_affinity": PrefixAffinity,
+}
@@ -1,8 +1,24 @@
 from abc import ABC, abstractmethod
 from llm_swarm.utils import LLMSwarmConfig
-from typing import List, Optional, Tuple
+from .job_status import JobStatus, JobStatusCache
+from typing import Dict, List, Optional, Tuple
+
+
+class UnlabeledEndpointsError(RuntimeError):
+    """The hosts file lists endpoints without the job serving each, as templates predating job IDs write it."""
+
 
 class Scheduler(ABC):
+    # states of a job that ended for good (e.g. failed or cancelled); a job missing from the listing ended too
+    finished_states: Tuple[str, ...] = ()
+
+    def __init__(self, status_ttl: float = 3.0) -> None:
+        """
+        Args:
+            status_ttl (float, optional): Seconds a job status snapshot is shared between callers. Defaults to 3.0.
+        """
+        self.job_statuses = JobStatusCache(self.query_job_statuses, ttl=status_ttl)
+
     @abstractmethod
     def read_job_template(self, template_path: str) -> str:
         """
@@ -30,7 +46,7 @@ class Scheduler(ABC):
         pass
     
     @abstractmethod
-    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1) -> List[str]:
+    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1, start_index: int = 0) -> List[str]:
         """
         Starts Slurm jobs based on the provided job configuration.
 
@@ -38,17 +54,65 @@ class Scheduler(ABC):
             config (LLMSwarmConfig): The LLMSwarmConfig object containing configuration parameters.
             path (str): The path to the job file.
             template (str): The customized template string.
+            start_index (int, optional): Index of the first instance, when adding instances to a running swarm. Defaults to 0.
 
         Returns:
             List[str]: A list of job IDs.
         """
         pass
 
+    def attach_jobs(self, job_timestamp: str, job_ids: List[str]) -> None:
+        """
+        Start tracking jobs another process started, e.g. when attaching to a persistent swarm.
+
+        Args:
+            job_timestamp (str): The job timestamp of the jobs.
+            job_ids (List[str]): A list of job IDs.
+        """
+        pass
+
     @abstractmethod
-    def is_job_running(self, job_id: str) -> bool:
-        """Checks if a job is still running."""
+    def query_job_statuses(self) -> Dict[str, JobStatus]:
+        """
+        Queries the scheduler once for the state of all the user's jobs.
+
+        Callers should go through `self.job_statuses` which caches the result.
+
+        Returns:
+            Dict[str, JobStatus]: Job ID to status.
+        """
         pass
 
+    def job_running(self, job_id: str) -> Optional[bool]:
+        """Checks if a job is still running, using the shared status snapshot.
+
+        Returns:
+            Optional[bool]: None when the scheduler couldn't be queried, so a failed query isn't taken for a finished job.
+        """
+        try:
+            status = self.job_statuses.get(job_id)
+        except Exception as e:
+            print(f"Exception occurred: {str(e)}")
+            return None
+        return status is not None and status.running
+
+    def job_finished(self, job_id: str) -> Optional[bool]:
+        """Checks if a job ended, as opposed to pending or running, using the shared status snapshot.
+
+        Returns:
+            Optional[bool]: None when the scheduler couldn't be queried.
+        """
+        try:
+            status = self.job_statuses.get(job_id)
+        except Exception as e:
+            print(f"Exception occurred: {str(e)}")
+            return None
+        return status is None or status.state in self.finished_states
+
+    def is_job_running(self, job_id: str) -> bool:
+        """Checks if a job is known to be running; False as well when the scheduler couldn't be queried."""
+        return bool(self.job_running(job_id))
+
     @abstractmethod
     def make_sure_jobs_are_still_running(self, job_ids: List[str], log_path: str) -> None:
         """
@@ -76,6 +140,24 @@ class Scheduler(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_job_endpoints(self, host_path: str, config: LLMSwarmConfig, job_ids: List[str]) -> Dict[str, str]:
+        """
+        Retrieve the endpoint of each of the given jobs, waiting until all of them are known.
+
+        Args:
+            host_path (str): The path to the endpoint file.
+            config (LLMSwarmConfig): The LLMSwarmConfig object containing configuration parameters.
+            job_ids (List[str]): A list of job IDs.
+
+        Raises:
+            UnlabeledEndpointsError: When the hosts file doesn't say which job serves which endpoint.
+
+        Returns:
+            Dict[str, str]: Job ID to endpoint.
+        """
+        pass
+
     @abstractmethod
     def check_if_endpoint_reachable(self, endpoint: str) -> bool:
         """
@@ -98,3 +180,9 @@ class Scheduler(ABC):
             job_ids (List[str]): A list of job IDs to cancel.
         """
         pass
+
+    def shutdown(self) -> None:
+        """
+        Release resources held by the scheduler itself (e.g. watches), once the swarm is cleaned up.
+        """
+        pass
@@ -0,0 +1,63 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    """State of a single scheduler job as seen in the last snapshot.
+
+    Args:
+        state (str): Scheduler specific state (e.g. "R" for Slurm, "Running" for RunAI).
+        running (bool): Whether the job is running.
+        host (Optional[str]): Address of the node the job runs on, when the scheduler reports it.
+    """
+
+    state: str
+    running: bool
+    host: Optional[str] = None
+
+
+class JobStatusCache:
+    def __init__(self, fetch: Callable[[], Dict[str, JobStatus]], ttl: float = 3.0) -> None:
+        """Share a single scheduler query between every caller asking for job states.
+
+        The snapshot returned by `fetch` is kept for `ttl` seconds. Concurrent callers that
+        find it stale wait for the one query in flight instead of issuing their own.
+
+        Args:
+            fetch (Callable[[], Dict[str, JobStatus]]): Queries the scheduler once and returns the state of all jobs.
+            ttl (float, optional): Seconds a snapshot stays valid. Defaults to 3.0.
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.queries = 0
+        self._snapshot: Dict[str, JobStatus] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age: Optional[float] = None) -> Dict[str, JobStatus]:
+        """Return the state of all jobs, querying the scheduler only if the cached snapshot is stale.
+
+        Args:
+            max_age (Optional[float], optional): Override the TTL for this call. Defaults to None.
+
+        Returns:
+            Dict[str, JobStatus]: Job ID to status.
+        """
+        ttl = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._fetched_at is None or time.monotonic() - self._fetched_at >= ttl:
+                self._snapshot = self.fetch()
+                self._fetched_at = time.monotonic()
+                self.queries += 1
+            return self._snapshot
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        return self.snapshot().get(job_id)
+
+    def invalidate(self) -> None:
+        """Force the next caller to query the scheduler."""
+        with self._lock:
+            self._fetched_at = None
@@ -0,0 +1,83 @@
+from .slurm_scheduler import SlurmScheduler
+from .job_status import JobStatus
+import os
+import signal
+import subprocess
+from llm_swarm.utils import LLMSwarmConfig
+from typing import Dict, List, Optional, Tuple
+
+
+class LocalScheduler(SlurmScheduler):
+    """Runs each instance as a local process, e.g. `templates/mock.template.sh` serving `llm_swarm.mock_server`.
+
+    The template is rendered like the Slurm ones and run with bash; the process id stands in for
+    the job id (`$$` in the template), and endpoints are read from the same hosts file.
+    """
+
+    def __init__(self, status_ttl: float = 3.0) -> None:
+        super().__init__(status_ttl=status_ttl)
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def generate_job_config(self, config: LLMSwarmConfig, template: str) -> Tuple[str, str, str, str]:
+        template = template.replace(r"{{logs_folder}}", os.path.abspath(config.logs_folder))
+        template = template.replace(r"{{inference_engine}}", config.inference_engine)
+        job_timestamp, path, host_path, template = super().generate_job_config(config, template)
+        return job_timestamp, path[: -len(".slurm")] + ".sh", host_path, template
+
+    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1, start_index: int = 0) -> List[str]:
+        with open(path, "w") as f:
+            f.write(template)
+        job_ids = []
+        for _ in range(instances):
+            # a session of its own so cancelling the job also stops what the script started;
+            # the script redirects its output to `llm-swarm_$$.out` itself, like Slurm's `-o %x_%j.out`
+            process = subprocess.Popen(["bash", path], stdin=subprocess.DEVNULL, start_new_session=True)
+            self.processes[str(process.pid)] = process
+            job_ids.append(str(process.pid))
+        return job_ids
+
+    def query_job_statuses(self) -> Dict[str, JobStatus]:
+        statuses = {}
+        for job_id, process in self.processes.items():
+            returncode = process.poll()
+            state = "R" if returncode is None else ("CD" if returncode == 0 else "F")
+            statuses[job_id] = JobStatus(state=state, running=returncode is None, host="127.0.0.1")
+        return statuses
+
+    def job_running(self, job_id: str) -> Optional[bool]:
+        if job_id in self.processes:
+            return super().job_running(job_id)
+        # started by another process, e.g. a swarm this one attached to
+        try:
+            os.kill(int(job_id), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # the process exists, it only belongs to another user
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Exception occurred: {str(e)}")
+            return None
+        return True
+
+    def job_finished(self, job_id: str) -> Optional[bool]:
+        if job_id in self.processes:
+            return super().job_finished(job_id)
+        running = self.job_running(job_id)
+        return None if running is None else not running
+
+    def cleanup_jobs(self, job_ids: List[str]):
+        for job_id in job_ids:
+            process = self.processes.get(job_id)
+            if process is None:
+                # not started here: the job id is the pid of its own process group
+                try:
+                    os.killpg(int(job_id), signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            elif process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+        for job_id in job_ids:
+            process = self.processes.pop(job_id, None)
+            if process is not None:
+                process.wait()
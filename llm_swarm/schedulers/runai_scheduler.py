@@ -1,24 +1,29 @@
 from .base_scheduler import Scheduler
-from llm_swarm.utils import run_command, Loader, LLMSwarmConfig
-import time
+from .job_status import JobStatus
+from llm_swarm.utils import run_command, Loader, LLMSwarmConfig, new_job_timestamp
 import os
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from time import sleep
 import requests
 
 class RunaiScheduler(Scheduler):
+    # job statuses of `runai list`, which are also the phases of a job's pod once it ended
+    finished_states = ("Completed", "Deleted", "Error", "Failed", "Succeeded")
+
     def read_job_template(self, template_path: str) -> str:
         with open(template_path) as f:
             return f.read()
 
     def generate_job_config(self, config: LLMSwarmConfig, template: str) -> Tuple[str, str, str, str]:
-        job_timestamp = f"{int(time.time())}"
+        job_timestamp = new_job_timestamp()
         path = os.path.join(config.logs_folder, f"{job_timestamp}_{config.inference_engine}.yml")
         host_path = os.path.join(config.logs_folder, f"{job_timestamp}_host_{config.inference_engine}.txt")
 
         # Customize the template
         template = template.replace(r"{{HUGGING_FACE_HUB_TOKEN}}", config.huggingface_token or "")
         template = template.replace(r"{{hosts_path}}", host_path)
+        template = template.replace(r"{{job_timestamp}}", job_timestamp)
         template = template.replace(r"{{model}}", config.model)
         template = template.replace(r"{{port}}", str(config.port))
         template = template.replace(r"{{gpus}}", str(config.gpus))
@@ -29,86 +34,58 @@ class RunaiScheduler(Scheduler):
         return job_timestamp, path, "", template
 
 
-    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1) -> List[str]:
-        job_ids = []
-        for i in range(instances):
-            job_name = f"runai-{job_timestamp}-{i}"
-            with open(path, "w") as f:
-                f.write(template.replace(r"{{job_name}}", job_name))
-            run_command(f"kubectl create -f {path}")
-            job_ids.append(job_name)
+    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1, start_index: int = 0) -> List[str]:
+        job_ids = [f"runai-{job_timestamp}-{i}" for i in range(start_index, start_index + instances)]
+        # one multi-document manifest, so all the jobs are created by a single `kubectl create`
+        with open(path, "w") as f:
+            f.write("\n---\n".join(template.replace(r"{{job_name}}", job_name) for job_name in job_ids))
+        run_command(f"kubectl create -f {path}")
         return job_ids
 
-    def is_job_running(self, job_id: str) -> bool:
-        # Run the command to list jobs
-        command = "runai list jobs -A"
-        try:
-            # Execute the command and capture the output
-            result = run_command(command)
-
-            lines = result.splitlines()
-            for line in lines:
-                # Skip the header line
-                if line.startswith("NAME"):
-                    continue
-                
-                # Extract job details
-                columns = line.split()
-                name = columns[0]
-                status = columns[1]
-                
-                # Check if the job name matches and the status is Running
-                if name == job_id and status == "Running":
-                    return True
-        except Exception as e:
-            print(e)
+    def query_job_statuses(self) -> Dict[str, JobStatus]:
+        statuses = {}
+        for line in run_command("runai list jobs -A").splitlines():
+            # Skip the header line
+            if line.startswith("NAME"):
+                continue
 
-        return False
+            # Extract job details
+            columns = line.split()
+            if len(columns) < 4:
+                continue
+            name, status, host = columns[0], columns[1], columns[3]
+            statuses[name] = JobStatus(state=status, running=status == "Running", host=None if host == "-" else host)
+        return statuses
 
     def make_sure_jobs_are_still_running(self, job_ids: List[str], log_path: str) -> None:
         if job_ids:
             for job_id in job_ids:
-                if not self.is_job_running(job_id):
+                # a failed query isn't a failed job: keep waiting
+                if self.job_running(job_id) is False:
                     print(f"\n❌ Failed! Job {job_id} is not running; Checkout the logs with $runai logs {job_id}")
                     raise RuntimeError(f"Job {job_id} is not running")
 
     def get_endpoints(self, host_path: str, config: LLMSwarmConfig, instances: int = 1, job_ids: Optional[List[str]] = None) -> List[str]:
-        trying = True
+        job_endpoints = self.get_job_endpoints(host_path, config, job_ids or [])
+        assert len(job_endpoints) == instances, f"#endpoints {len(job_endpoints)} doesn't match #instances {instances}"
+        return list(job_endpoints.values())
+
+    def get_job_endpoints(self, host_path: str, config: LLMSwarmConfig, job_ids: List[str]) -> Dict[str, str]:
         with Loader(f"Waiting for endpoints to be reachable"):
-            while trying:
+            while True:
                 try:
-                    endpoints = []
-                    # Run the command to list jobs
-                    command = "runai list jobs -A"
-                    # Execute the command and capture the output
-                    result = run_command(command)
-                    
-                    # Parse the command's output
-                    lines = result.splitlines()
-                    for line in lines:
-                        # Skip the header line
-                        if line.startswith("NAME"):
-                            continue
-                        
-                        # Extract job details
-                        columns = line.split()
-                        name = columns[0]
-                        endpoint = columns[3]
-                        
-                        # Check if the job name matches and the status is Running
-                        if name in job_ids and endpoint != "-":
-                            endpoints.append(f"http://{endpoint}:{config.port}")
-
-                    assert (
-                        len(endpoints) == instances
-                    ), f"#endpoints {len(endpoints)} doesn't match #instances {instances}"  # could read an empty file
-                    # due to race condition (slurm writing & us reading)
-                    trying = False
+                    statuses = self.job_statuses.snapshot()
+                    job_endpoints = {
+                        job_id: f"http://{statuses[job_id].host}:{config.port}"
+                        for job_id in job_ids
+                        if job_id in statuses and statuses[job_id].host
+                    }
+                    if len(job_endpoints) == len(job_ids):
+                        return job_endpoints
                 except (OSError, AssertionError) as e:
                     print(e)
-                    self.make_sure_jobs_are_still_running(job_ids, config)
-                    sleep(1)
-        return endpoints
+                self.make_sure_jobs_are_still_running(job_ids, config.logs_folder)
+                sleep(1)
 
     def check_if_endpoint_reachable(self, endpoint: str) -> bool:
         try:
@@ -119,6 +96,8 @@ class RunaiScheduler(Scheduler):
             return False
 
     def cleanup_jobs(self, job_ids: List[str]):
-        for job_id in job_ids:
-            run_command(f"runai delete job {job_id}")
-        pass
+        if not job_ids:
+            return
+        # each deletion is a round-trip to the cluster, run them side by side
+        with ThreadPoolExecutor(max_workers=min(16, len(job_ids))) as pool:
+            list(pool.map(lambda job_id: run_command(f"runai delete job {job_id}"), job_ids))
@@ -0,0 +1,263 @@
+from .runai_scheduler import RunaiScheduler
+from .job_status import JobStatus
+from llm_swarm.utils import Loader, LLMSwarmConfig
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+WatchEvent = Dict[str, Any]
+StreamFactory = Callable[[str], Iterable[WatchEvent]]
+# returns the pods matching a label selector and the resource version of the list
+ListFactory = Callable[[str], Tuple[Iterable[Any], Optional[str]]]
+
+
+# recorded streams use the JSON keys of the Kubernetes API instead of the client's attribute names
+_JSON_KEYS = {"resource_version": "resourceVersion", "host_ip": "hostIP", "deletion_timestamp": "deletionTimestamp"}
+
+
+class ResourceVersionExpired(Exception):
+    """The watch's resource version is too old for the API server (410 Gone): the pods must be listed again."""
+
+
+def _expired(error: Exception) -> bool:
+    # the kubernetes client raises an ApiException with the HTTP status for an expired watch
+    return isinstance(error, ResourceVersionExpired) or getattr(error, "status", None) == 410
+
+
+def _field(obj: Any, *names: str) -> Any:
+    """Read a nested field from either a kubernetes client model or its JSON (dict) form."""
+    for name in names:
+        if obj is None:
+            return None
+        if isinstance(obj, dict):
+            obj = obj.get(name, obj.get(_JSON_KEYS.get(name, name)))
+        else:
+            obj = getattr(obj, name, None)
+    return obj
+
+
+class PodIndex:
+    def __init__(self, job_label: str = "release") -> None:
+        """In-memory index of the swarm's pods, fed by Kubernetes watch events.
+
+        A job keeps one status, that of its current pod: the last one seen that isn't terminating.
+        Events of the pods it replaced (e.g. their deletion) don't change it.
+
+        Args:
+            job_label (str, optional): Pod label holding the job name. Defaults to "release".
+        """
+        self.job_label = job_label
+        self.resource_version: Optional[str] = None
+        self._statuses: Dict[str, JobStatus] = {}
+        # job ID to the uid of its current pod
+        self._pods: Dict[str, str] = {}
+        self._changed = threading.Condition()
+
+    def _update(self, event_type: str, pod: Any) -> None:
+        job_id = (_field(pod, "metadata", "labels") or {}).get(self.job_label)
+        if job_id is None:
+            return
+        uid = _field(pod, "metadata", "uid") or _field(pod, "metadata", "name")
+        current = self._pods.get(job_id)
+        terminating = _field(pod, "metadata", "deletion_timestamp") is not None
+        if current is not None and uid != current and (event_type == "DELETED" or terminating):
+            # the pod was already replaced
+            return
+        if event_type == "DELETED":
+            self._statuses.pop(job_id, None)
+            self._pods.pop(job_id, None)
+            return
+        phase = "Terminating" if terminating else _field(pod, "status", "phase") or "Unknown"
+        host = _field(pod, "status", "host_ip")
+        self._statuses[job_id] = JobStatus(state=phase, running=phase == "Running", host=host)
+        self._pods[job_id] = uid
+
+    def apply(self, event: WatchEvent) -> None:
+        """Update the index with one watch event (`{"type": ..., "object": pod}`).
+
+        Raises:
+            ResourceVersionExpired: When the API server reports the watch's resource version expired.
+        """
+        pod = event["object"]
+        if event["type"] == "ERROR":
+            # the object is a Status, e.g. `{"code": 410, "reason": "Expired"}`
+            if _field(pod, "code") == 410:
+                with self._changed:
+                    self.resource_version = None
+                raise ResourceVersionExpired(_field(pod, "message") or "resource version expired")
+            raise RuntimeError(f"Watch error: {_field(pod, 'message') or pod}")
+        resource_version = _field(pod, "metadata", "resource_version")
+        with self._changed:
+            if resource_version:
+                self.resource_version = resource_version
+            self._update(event["type"], pod)
+            self._changed.notify_all()
+
+    def reset(self, pods: Iterable[Any], resource_version: Optional[str]) -> None:
+        """Replace the index with a fresh list of the pods, to watch from `resource_version` on."""
+        with self._changed:
+            self._statuses = {}
+            self._pods = {}
+            for pod in pods:
+                self._update("ADDED", pod)
+            self.resource_version = resource_version
+            self._changed.notify_all()
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        return self._statuses.get(job_id)
+
+    def snapshot(self) -> Dict[str, JobStatus]:
+        with self._changed:
+            return dict(self._statuses)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the next event changes the index or `timeout` expires."""
+        with self._changed:
+            self._changed.wait(timeout)
+
+
+def recorded_stream(path: str) -> StreamFactory:
+    """Replay watch events recorded as JSON lines (one `{"type", "object"}` per line)."""
+
+    def stream(label_selector: str) -> Iterable[WatchEvent]:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    return stream
+
+
+class RunaiWatchScheduler(RunaiScheduler):
+    def __init__(
+        self,
+        status_ttl: float = 3.0,
+        namespace: Optional[str] = None,
+        stream_factory: Optional[StreamFactory] = None,
+        reconnect_delay: float = 1.0,
+        list_factory: Optional[ListFactory] = None,
+    ) -> None:
+        """RunAI scheduler that tracks its pods through a Kubernetes watch stream instead of polling `runai list`.
+
+        The pods are listed once, then watched from the list's resource version on; they are
+        listed again whenever the API server reports that version expired (410 Gone).
+
+        Args:
+            status_ttl (float, optional): TTL of `job_statuses`, which here only copies the index. Defaults to 3.0.
+            namespace (Optional[str], optional): Namespace of the RunAI project. Defaults to the current kube context's.
+            stream_factory (Optional[StreamFactory], optional): Returns the watch events for a label selector.
+                Defaults to a `kubernetes` client watch on the namespace's pods.
+            reconnect_delay (float, optional): Delay before resuming a watch that ended. Defaults to 1.0.
+            list_factory (Optional[ListFactory], optional): Lists the pods for a label selector. Defaults to the
+                `kubernetes` client's when `stream_factory` isn't given, else None (replayed streams need no list).
+        """
+        super().__init__(status_ttl)
+        self.namespace = namespace
+        self.stream_factory = stream_factory or self._kubernetes_stream
+        self.list_factory = list_factory or (None if stream_factory else self._kubernetes_list)
+        self.reconnect_delay = reconnect_delay
+        self.index = PodIndex()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _kubernetes_api(self) -> Tuple[Any, str]:
+        try:
+            from kubernetes import client, config
+        except ImportError as e:
+            raise ImportError("The runai-watch scheduler requires `pip install kubernetes`") from e
+
+        config.load_kube_config()
+        namespace = self.namespace or config.list_kube_config_contexts()[1]["context"].get("namespace", "default")
+        return client.CoreV1Api(), namespace
+
+    def _kubernetes_list(self, label_selector: str) -> Tuple[Iterable[Any], Optional[str]]:
+        api, namespace = self._kubernetes_api()
+        pods = api.list_namespaced_pod(namespace, label_selector=label_selector)
+        return pods.items, pods.metadata.resource_version
+
+    def _kubernetes_stream(self, label_selector: str) -> Iterable[WatchEvent]:
+        from kubernetes import watch
+
+        api, namespace = self._kubernetes_api()
+        kwargs = {"label_selector": label_selector}
+        if self.index.resource_version:
+            kwargs["resource_version"] = self.index.resource_version
+        return watch.Watch().stream(api.list_namespaced_pod, namespace, **kwargs)
+
+    def relist(self, label_selector: str) -> None:
+        """Rebuild the index from a fresh list of the pods, when there is a `list_factory`."""
+        if self.list_factory is not None:
+            pods, resource_version = self.list_factory(label_selector)
+            self.index.reset(pods, resource_version)
+
+    def consume(self, events: Iterable[WatchEvent]) -> None:
+        """Apply a (recorded or live) stream of watch events to the index until it ends or the watch is stopped."""
+        for event in events:
+            if self._stop.is_set():
+                return
+            self.index.apply(event)
+
+    def watch(self, label_selector: str) -> None:
+        """Start following the pods matching `label_selector` in a background thread."""
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    if self.index.resource_version is None:
+                        self.relist(label_selector)
+                    self.consume(self.stream_factory(label_selector))
+                except Exception as e:
+                    if _expired(e):
+                        # resuming from the stale version would fail forever
+                        self.index.resource_version = None
+                    print(f"Watch on {label_selector} interrupted: {e}")
+                self._stop.wait(self.reconnect_delay)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop_watch(self) -> None:
+        self._stop.set()
+
+    def _ensure_watch(self, job_timestamp: str) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self.watch(f"llm-swarm={job_timestamp}")
+
+    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1, start_index: int = 0) -> List[str]:
+        self._ensure_watch(job_timestamp)
+        return super().start_jobs(path, template, job_timestamp, instances, start_index)
+
+    def attach_jobs(self, job_timestamp: str, job_ids: List[str]) -> None:
+        self._ensure_watch(job_timestamp)
+
+    def query_job_statuses(self) -> Dict[str, JobStatus]:
+        return self.index.snapshot()
+
+    def job_running(self, job_id: str) -> Optional[bool]:
+        status = self.index.get(job_id)
+        if status is None:
+            # not seen by the watch (yet), which says nothing about the job
+            return None
+        return status.running
+
+    def job_finished(self, job_id: str) -> Optional[bool]:
+        status = self.index.get(job_id)
+        if status is None:
+            return None
+        return status.state in self.finished_states
+
+    def get_job_endpoints(self, host_path: str, config: LLMSwarmConfig, job_ids: List[str]) -> Dict[str, str]:
+        with Loader("Waiting for endpoints to be reachable"):
+            while True:
+                statuses = {job_id: self.index.get(job_id) for job_id in job_ids}
+                job_endpoints = {
+                    job_id: f"http://{status.host}:{config.port}" for job_id, status in statuses.items() if status and status.host
+                }
+                if len(job_endpoints) == len(job_ids):
+                    return job_endpoints
+                self.make_sure_jobs_are_still_running(job_ids, config.logs_folder)
+                self.index.wait(timeout=1)
+
+    def shutdown(self) -> None:
+        self.stop_watch()
@@ -1,19 +1,26 @@
-from .base_scheduler import Scheduler
-from llm_swarm.utils import run_command, Loader, LLMSwarmConfig
-import time
+from .base_scheduler import Scheduler, UnlabeledEndpointsError
+from .job_status import JobStatus
+from llm_swarm.utils import run_command, Loader, LLMSwarmConfig, new_job_timestamp
 import os
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from time import sleep
-from huggingface_hub import get_session
 
 
 class SlurmScheduler(Scheduler):
+    # squeue's codes of completing, completed, cancelled, failed, timed out, preempted... jobs
+    finished_states = ("BF", "CA", "CD", "CG", "DL", "F", "NF", "OOM", "PR", "TO")
+
+    def __init__(self, status_ttl: float = 3.0) -> None:
+        super().__init__(status_ttl=status_ttl)
+        # $SLURM_JOB_ID of each array task to its "<array job id>_<task id>" job id
+        self.array_task_ids: Dict[str, str] = {}
+
     def read_job_template(self, template_path: str) -> str:
         with open(template_path) as f:
             return f.read()
     
     def generate_job_config(self, config: LLMSwarmConfig, template: str) -> Tuple[str, str, str, str]:
-        job_timestamp = f"{int(time.time())}"
+        job_timestamp = new_job_timestamp()
         path = os.path.join(config.logs_folder, f"{job_timestamp}_{config.inference_engine}.slurm")
         host_path = os.path.join(config.logs_folder, f"{job_timestamp}_host_{config.inference_engine}.txt")
 
@@ -29,26 +36,31 @@ class SlurmScheduler(Scheduler):
         
         return job_timestamp, path, host_path, template
     
-    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1) -> List[str]:
+    def start_jobs(self, path: str, template: str, job_timestamp: str, instances: int = 1, start_index: int = 0) -> List[str]:
         with open(path, "w") as f:
             f.write(template)
-        return [run_command(f"sbatch --parsable {path}") for _ in range(instances)]
-         
+        # a single job array for all the instances: one submission whatever the size of the swarm
+        array_job_id = run_command(f"sbatch --parsable --array=0-{instances - 1} {path}").split(";")[0]
+        return [f"{array_job_id}_{task_id}" for task_id in range(instances)]
 
-    def is_job_running(self, job_id: str) -> bool:
-        command = "squeue --me --states=R | awk '{print $1}' | tail -n +2"
-        try:
-            my_running_jobs = run_command(command).splitlines()
-            return job_id in my_running_jobs
-        except Exception as e:
-            print(f"Exception occurred: {str(e)}")
-            return False
-    
+    def query_job_statuses(self) -> Dict[str, JobStatus]:
+        statuses = {}
+        # -r lists the tasks of an array one per line instead of folding pending ones into "<id>_[0-9]"
+        for line in run_command("squeue --me --noheader -r --format='%i %t %A'").splitlines():
+            columns = line.split()
+            if len(columns) < 2:
+                continue
+            job_id, state = columns[0], columns[1]
+            statuses[job_id] = JobStatus(state=state, running=state == "R")
+            if len(columns) > 2 and columns[2] != job_id:
+                self.array_task_ids[columns[2]] = job_id
+        return statuses
 
     def make_sure_jobs_are_still_running(self, job_ids: List[str], log_path: str) -> None:
         if job_ids:
             for job_id in job_ids:
-                if not self.is_job_running(job_id):
+                # a failed query isn't a failed job: keep waiting
+                if self.job_running(job_id) is False:
                     slurm_log_path = os.path.join(log_path, f"llm-swarm_{job_id}.out")
                     print(f"\n❌ Failed! Job {job_id} is not running; checkout {slurm_log_path} ")
                     raise RuntimeError(f"Job {job_id} is not running")
@@ -59,20 +71,43 @@ class SlurmScheduler(Scheduler):
         with Loader(f"Waiting for {host_path} to be created"):
             while trying:
                 try:
-                    endpoints = open(host_path).read().splitlines()
+                    # each job appends "<endpoint> <job id>" (older templates only write the endpoint)
+                    endpoints = [line.split()[0] for line in open(host_path).read().splitlines() if line.strip()]
                     assert len(endpoints) == instances, f"#endpoints {len(endpoints)} doesn't match #instances {instances}"
                     # due to race condition (slurm writing & us reading)
                     trying = False
                 except (OSError, AssertionError):
-                    self.make_sure_jobs_are_still_running(job_ids, config)
+                    self.make_sure_jobs_are_still_running(job_ids, config.logs_folder)
                     sleep(1)
+        return endpoints
+
+    def get_job_endpoints(self, host_path: str, config: LLMSwarmConfig, job_ids: List[str]) -> Dict[str, str]:
+        with Loader(f"Waiting for the endpoints of {len(job_ids)} jobs in {host_path}"):
+            while True:
+                try:
+                    job_endpoints = {}
+                    for line in open(host_path).read().splitlines():
+                        columns = line.split()
+                        if len(columns) == 1:
+                            raise UnlabeledEndpointsError(f"{config.template_path} writes no '<endpoint> $SLURM_JOB_ID' to {host_path}")
+                        # templates writing $SLURM_JOB_ID report the task's own id rather than "<array>_<task>"
+                        job_id = self.array_task_ids.get(columns[1], columns[1]) if len(columns) == 2 else None
+                        if job_id in job_ids:
+                            job_endpoints[job_id] = columns[0]
+                    if len(job_endpoints) == len(job_ids):
+                        return job_endpoints
+                except OSError:
+                    pass
+                self.make_sure_jobs_are_still_running(job_ids, config.logs_folder)
+                sleep(1)
 
     def check_if_endpoint_reachable(self, endpoint: str) -> bool:
+        from huggingface_hub import get_session
+
         get_session().get(f"{endpoint}/health") #TODO: Might not be the same for runai
         print(f"\nConnected to {endpoint}")
         return True
 
     def cleanup_jobs(self, job_ids: List[str]):
-        for job_id in job_ids:
-            run_command(f"scancel {job_id}")
-        pass
+        if job_ids:
+            run_command(f"scancel {' '.join(job_ids)}")
@@ -0,0 +1,194 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .metrics import SINK_ROWS, SINK_WRITE_LATENCY
+
+MANIFEST_NAME = "manifest.json"
+DATA_DIR = "data"
+# dataset card pointing `datasets.load_dataset(directory)` at the committed shards only
+README = """---
+configs:
+- config_name: default
+  data_files:
+  - split: train
+    path: data/*.parquet
+---
+"""
+
+
+class ParquetSink:
+    def __init__(
+        self,
+        directory: str,
+        rows_per_shard: int = 50_000,
+        buffer_rows: int = 1_000,
+        fsync_interval: Optional[float] = 300.0,
+        schema: Optional[pa.Schema] = None,
+    ) -> None:
+        """Append-only writer of result rows into rolling Parquet shards.
+
+        Rows are buffered in memory up to `buffer_rows`, then written as one row group of
+        the open shard, so memory stays bounded and each write costs the same however much
+        was written before. The open shard is written under a `.tmp` name; once it holds
+        `rows_per_shard` rows or is `fsync_interval` seconds old, it is closed, fsynced,
+        renamed to `data/shard-XXXXX.parquet` and recorded in `manifest.json`. A crash thus
+        loses at most the rows of the open shard, and `datasets.load_dataset(directory)`
+        only ever sees committed shards.
+
+        Reopening a directory appends new shards after the committed ones; rows of a
+        shard left open by a crash are discarded. To resume exactly where the committed
+        rows end, pass each row's progress as `state` to `write`: the manifest's `state`
+        is always the one of the last committed row.
+
+        Args:
+            directory (str): Output directory, created if needed.
+            rows_per_shard (int, optional): Rows after which a shard is committed. Defaults to 50_000.
+            buffer_rows (int, optional): Rows buffered in memory before being written. Defaults to 1_000.
+            fsync_interval (Optional[float], optional): Seconds after which the open shard is committed even if
+                it isn't full. Defaults to 300.0. None only commits full shards.
+            schema (Optional[pa.Schema], optional): Schema of the rows. Defaults to the schema inferred from
+                the first rows written.
+        """
+        if rows_per_shard < 1 or buffer_rows < 1:
+            raise ValueError("rows_per_shard and buffer_rows must be at least 1")
+        self.directory = directory
+        self.rows_per_shard = rows_per_shard
+        self.buffer_rows = min(buffer_rows, rows_per_shard)
+        self.fsync_interval = fsync_interval
+        self.schema = schema
+        self.manifest = self._load_manifest()
+        self.state: Dict[str, Any] = dict(self.manifest.get("state", {}))
+        self._buffer: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = []
+        self._written_state: Optional[Dict[str, Any]] = None
+        self._file = None
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._shard_rows = 0
+        self._shard_opened = 0.0
+        os.makedirs(os.path.join(directory, DATA_DIR), exist_ok=True)
+        for name in os.listdir(os.path.join(directory, DATA_DIR)):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(directory, DATA_DIR, name))
+        readme_path = os.path.join(directory, "README.md")
+        if not os.path.exists(readme_path):
+            with open(readme_path, "w") as f:
+                f.write(README)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"shards": [], "rows": 0, "state": {}}
+
+    @property
+    def rows_committed(self) -> int:
+        """Rows in committed shards, i.e. that survive a crash."""
+        return self.manifest["rows"]
+
+    @property
+    def rows_written(self) -> int:
+        return self.manifest["rows"] + self._shard_rows + len(self._buffer)
+
+    def write(self, row: Dict[str, Any], state: Optional[Dict[str, Any]] = None) -> None:
+        """Append `row`; `state`, if given, becomes the manifest's `state` once the row is committed."""
+        self._buffer.append((row, state))
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+        elif self._should_commit():
+            self.flush()
+
+    def write_many(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def _should_commit(self) -> bool:
+        if self._writer is None:
+            return False
+        if self._shard_rows >= self.rows_per_shard:
+            return True
+        return self.fsync_interval is not None and time.monotonic() - self._shard_opened >= self.fsync_interval
+
+    def flush(self) -> None:
+        """Write the buffered rows to the open shard, committing it when it is full or old enough."""
+        while self._buffer:
+            if self._writer is None:
+                self._open_shard()
+            take = min(len(self._buffer), self.rows_per_shard - self._shard_rows)
+            batch, self._buffer = self._buffer[:take], self._buffer[take:]
+            start = time.perf_counter()
+            table = pa.Table.from_pylist([row for row, _ in batch], schema=self.schema)
+            self._writer.write_table(table)
+            SINK_WRITE_LATENCY.observe(time.perf_counter() - start, operation="write")
+            SINK_ROWS.inc(len(batch), operation="written")
+            self._shard_rows += len(batch)
+            for _, state in batch:
+                if state is not None:
+                    self._written_state = state
+            if self._should_commit():
+                self.commit()
+        if self._should_commit():
+            self.commit()
+
+    def _shard_name(self, index: int) -> str:
+        return os.path.join(DATA_DIR, f"shard-{index:05d}.parquet")
+
+    def _open_shard(self) -> None:
+        if self.schema is None:
+            self.schema = pa.Table.from_pylist([row for row, _ in self._buffer[: self.buffer_rows]]).schema
+        name = self._shard_name(len(self.manifest["shards"]))
+        self._file = open(os.path.join(self.directory, name + ".tmp"), "wb")
+        self._writer = pq.ParquetWriter(self._file, self.schema)
+        self._shard_rows = 0
+        self._shard_opened = time.monotonic()
+
+    def commit(self) -> None:
+        """Close the open shard, make it durable and record it in the manifest along with `state`."""
+        start = time.perf_counter()
+        if self._writer is not None:
+            SINK_ROWS.inc(self._shard_rows, operation="committed")
+            self._writer.close()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            name = self._shard_name(len(self.manifest["shards"]))
+            path = os.path.join(self.directory, name)
+            os.replace(path + ".tmp", path)
+            self.manifest["shards"].append({"path": name, "rows": self._shard_rows})
+            self.manifest["rows"] += self._shard_rows
+            self._writer = None
+            self._file = None
+            self._shard_rows = 0
+            if self._written_state is not None:
+                self.state = self._written_state
+                self._written_state = None
+        self.manifest["state"] = self.state
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_path + ".tmp", manifest_path)
+        SINK_WRITE_LATENCY.observe(time.perf_counter() - start, operation="commit")
+
+    def close(self) -> None:
+        """Write and commit everything written so far."""
+        self.flush()
+        self.commit()
+
+    def __enter__(self) -> "ParquetSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shards": len(self.manifest["shards"]),
+            "rows_committed": self.rows_committed,
+            "rows_written": self.rows_written,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple, Union
+
+
+class TokenCounter:
+    def __init__(
+        self,
+        tokenizer: Union[str, Any],
+        revision: str = "main",
+        max_workers: int = 2,
+        batch_size: int = 256,
+        batch_delay: float = 0.005,
+    ) -> None:
+        """Count tokens off the event loop, batching the texts of concurrent callers.
+
+        Texts submitted within `batch_delay` of each other are encoded with one call to the
+        tokenizer in a worker thread; fast (Rust) tokenizers encode a batch in parallel and
+        release the GIL meanwhile, so the event loop never tokenizes inline. Prefer the counts
+        reported by the engine (`GenerationResponse.generated_tokens`) when there are some.
+
+        Args:
+            tokenizer (Union[str, Any]): A `transformers` tokenizer, or the name of the model to load it from.
+            revision (str, optional): Revision of the model, when loading the tokenizer by name. Defaults to "main".
+            max_workers (int, optional): Threads encoding batches. Defaults to 2.
+            batch_size (int, optional): Texts encoded by one call at most. Defaults to 256.
+            batch_delay (float, optional): Seconds to wait for more texts before encoding a batch. Defaults to 0.005.
+        """
+        if isinstance(tokenizer, str):
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer, revision=revision)
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="token-counter")
+        self.batches = 0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def _encode(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    async def count(self, text: str) -> int:
+        """Number of tokens of `text`, without special tokens."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+        return await future
+
+    async def count_many(self, texts: List[str]) -> List[int]:
+        return list(await asyncio.gather(*(self.count(text) for text in texts)))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        loop = asyncio.get_running_loop()
+        encoded = loop.run_in_executor(self.executor, self._encode, [text for text, _ in batch])
+
+        def resolve(result: asyncio.Future) -> None:
+            for index, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if result.exception() is not None:
+                    future.set_exception(result.exception())
+                else:
+                    future.set_result(result.result()[index])
+
+        encoded.add_done_callback(resolve)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,230 @@
+"""Per-request traces breaking a request's lifetime down into stages, and their analysis.
+
+    python -m llm_swarm.tracing logs/traces.jsonl
+
+Each trace is one JSON line: `{"id", "t" (start, epoch seconds), "attrs", "spans"}`, where
+every span is `[stage, start, duration]` in milliseconds from the start of the trace. The
+stages recorded by the client are `cache`, `queue` (waiting for a concurrency slot), `network`,
+`engine_queue` and `engine` (split using the engine's timing headers; `request` when the engine
+doesn't report them), `backoff` between retries and `postprocess`. `Pipeline` adds `sink_buffer`
+and `sink` (waiting for and writing to the sink), and code rendering prompts inline wraps them
+in `span("render")`.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("llm_swarm_trace", default=None)
+# set inside work that was not sampled, so the requests it sends aren't sampled on their own
+_not_sampled: ContextVar[bool] = ContextVar("llm_swarm_not_sampled", default=False)
+
+
+class Trace:
+    def __init__(self, trace_id: int, **attrs) -> None:
+        """Stage spans of one unit of work, e.g. a request or a dataset row."""
+        self.id = trace_id
+        self.attrs: Dict[str, Any] = attrs
+        self.spans: List[Tuple[str, float, float]] = []
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+
+    def add(self, stage: str, start: float, end: float) -> None:
+        """Record that `stage` ran from `start` to `end` (`time.perf_counter()` values)."""
+        self.spans.append((stage, start, end))
+
+    @contextlib.contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, start, time.perf_counter())
+
+    def to_json(self) -> str:
+        spans = [
+            [stage, round((start - self.start) * 1000, 3), round((end - start) * 1000, 3)] for stage, start, end in self.spans
+        ]
+        return json.dumps({"id": self.id, "t": round(self.wall_start, 6), "attrs": self.attrs, "spans": spans})
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the work in progress in this task, if it is traced."""
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Record the enclosed block as `stage` of the current trace; does nothing when there is none."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(stage):
+        yield
+
+
+class Tracer:
+    def __init__(self, path: str, sample_rate: float = 1.0, seed: Optional[int] = None, buffer_lines: int = 1_000) -> None:
+        """Record stage timings of a sample of requests to a JSON lines file.
+
+        Args:
+            path (str): File the traces are appended to.
+            sample_rate (float, optional): Fraction of the requests traced. Defaults to 1.0.
+            seed (Optional[int], optional): Seed of the sampling. Defaults to None.
+            buffer_lines (int, optional): Traces kept in memory before being written. Defaults to 1000.
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.buffer_lines = buffer_lines
+        self.traced = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+
+    @contextlib.contextmanager
+    def trace(self, defer: bool = False, **attrs) -> Iterator[Optional[Trace]]:
+        """Make the enclosed block a sampled trace, or join the trace already in progress.
+
+        Args:
+            defer (bool, optional): Don't write the trace on exit; the caller `emit`s it once
+                later stages are recorded. Defaults to False.
+            **attrs: Attributes of a new trace.
+
+        Yields:
+            Optional[Trace]: The trace, or None when the block isn't sampled.
+        """
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.attrs.update(attrs)
+            yield trace
+            return
+        if _not_sampled.get():
+            yield None
+            return
+        if self._random.random() >= self.sample_rate:
+            token = _not_sampled.set(True)
+            try:
+                yield None
+            finally:
+                _not_sampled.reset(token)
+            return
+        trace = Trace(next(self._ids), **attrs)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            if not defer:
+                self.emit(trace)
+
+    def emit(self, trace: Trace) -> None:
+        """Queue `trace` for writing; safe to call from any thread."""
+        line = trace.to_json()
+        with self._lock:
+            self.traced += 1
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_lines:
+                self._write()
+
+    def _write(self) -> None:
+        lines, self._buffer = self._buffer, []
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._buffer:
+                self._write()
+
+    def close(self) -> None:
+        self.flush()
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def critical_path(spans: Sequence[Sequence[Any]]) -> Dict[str, float]:
+    """Attribute the trace's wall time to the stages on its critical path.
+
+    Walking back from the end of the trace, time is attributed to the span that ended last
+    before the current point; when spans overlap (e.g. concurrent requests of one row), only
+    the one the trace waited for counts. Gaps between spans are attributed to `other`.
+    """
+    if not spans:
+        return {}
+    attribution: Dict[str, float] = defaultdict(float)
+    cursor = max(start + duration for _, start, duration in spans)
+    remaining = sorted(spans, key=lambda span: span[1] + span[2])
+    while remaining:
+        stage, start, duration = remaining.pop()
+        end = min(start + duration, cursor)
+        if end <= start:
+            continue
+        if end < cursor:
+            attribution["other"] += cursor - end
+        attribution[stage] += end - start
+        cursor = start
+        # spans ending after the new cursor were hidden behind this one
+        remaining = [span for span in remaining if span[1] < cursor]
+    if cursor > 0:
+        attribution["other"] += cursor
+    return dict(attribution)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def analyze(traces: List[Dict[str, Any]]) -> str:
+    """Per-stage latency breakdown and critical-path attribution of a run's traces."""
+    if not traces:
+        return "no traces"
+    per_stage: Dict[str, List[float]] = defaultdict(list)
+    critical: Dict[str, float] = defaultdict(float)
+    totals = []
+    for trace in traces:
+        spans = trace["spans"]
+        stage_totals: Dict[str, float] = defaultdict(float)
+        for stage, _, duration in spans:
+            stage_totals[stage] += duration
+        for stage, duration in stage_totals.items():
+            per_stage[stage].append(duration)
+        for stage, duration in critical_path(spans).items():
+            critical[stage] += duration
+        totals.append(max((start + duration for _, start, duration in spans), default=0.0))
+    wall = sum(totals) or 1.0
+    lines = [
+        f"{len(traces)} traces, end to end p50 {_percentile(totals, 0.5):.1f}ms p95 {_percentile(totals, 0.95):.1f}ms "
+        f"p99 {_percentile(totals, 0.99):.1f}ms",
+        f"{'stage':>14} {'traces':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'critical':>9}",
+    ]
+    for stage in sorted(critical, key=critical.get, reverse=True) + sorted(set(per_stage) - set(critical)):
+        durations = per_stage.get(stage)
+        if durations:
+            quantiles = " ".join(f"{_percentile(durations, q):>9.1f}" for q in (0.5, 0.95, 0.99))
+        else:
+            quantiles = " ".join(f"{'-':>9}" for _ in range(3))
+        lines.append(f"{stage:>14} {len(durations or ()):>7} {quantiles} {critical.get(stage, 0.0) / wall:>9.1%}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down where requests spent their time")
+    parser.add_argument("path", help="JSON lines file written by a Tracer")
+    args = parser.parse_args()
+    print(analyze(load_traces(args.path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
+import argparse
+import dataclasses
 import socket
-import requests
 import subprocess
+import typing
 from itertools import cycle
 from shutil import get_terminal_size
-from threading import Thread
+from threading import Lock, Thread
+import time
 from time import sleep
-from typing import Literal, Optional, TypeVar
+from typing import Any, List, Literal, Optional, Sequence, Tuple, Type, TypeVar, Union
 from dataclasses import dataclass, field
 
 
@@ -17,6 +20,22 @@ def run_command(command: str):
     assert return_code == 0, f"Command failed with error: {errors.decode('utf-8')}"
     return output.decode("utf-8").strip()
 
+_job_timestamp_lock = Lock()
+_last_job_timestamp = 0
+
+
+def new_job_timestamp() -> str:
+    """Seconds since the epoch naming a swarm's jobs and files, unique within the process.
+
+    Swarms started together (e.g. the pools of a `MultiModelSwarm`) get consecutive values
+    instead of sharing job names and hosts files.
+    """
+    global _last_job_timestamp
+    with _job_timestamp_lock:
+        _last_job_timestamp = max(int(time.time()), _last_job_timestamp + 1)
+        return str(_last_job_timestamp)
+
+
 def get_unused_port(start=50000, end=65535):
     for port in range(start, end + 1):
         try:
@@ -86,15 +105,80 @@ class Loader:
 
 DataclassT = TypeVar("DataclassT")
 
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("true", "t", "yes", "y", "1"):
+        return True
+    if value.lower() in ("false", "f", "no", "n", "0"):
+        return False
+    raise argparse.ArgumentTypeError(f"expected a boolean, got {value!r}")
+
+
+class DataclassArgumentParser(argparse.ArgumentParser):
+    def __init__(self, dataclass_types: Union[Type, Sequence[Type]], **kwargs) -> None:
+        """Command line parser with an option per field of the given dataclasses.
+
+        A dependency-free stand-in for `transformers.HfArgumentParser`, so `python -m llm_swarm`
+        starts without importing transformers. Handles `str`, `int`, `float`, `bool` (`--flag`
+        or `--flag false`), `Optional` and `Literal` fields; a field's `metadata["help"]` is its help.
+
+        Args:
+            dataclass_types (Union[Type, Sequence[Type]]): Dataclass or dataclasses to fill in.
+            **kwargs: `argparse.ArgumentParser` arguments.
+        """
+        kwargs.setdefault("formatter_class", argparse.ArgumentDefaultsHelpFormatter)
+        super().__init__(**kwargs)
+        self.dataclass_types = list(dataclass_types) if isinstance(dataclass_types, (list, tuple)) else [dataclass_types]
+        for dataclass_type in self.dataclass_types:
+            hints = typing.get_type_hints(dataclass_type)
+            for dataclass_field in dataclasses.fields(dataclass_type):
+                if dataclass_field.init:
+                    self._add_field(dataclass_field, hints[dataclass_field.name])
+
+    def _add_field(self, dataclass_field: dataclasses.Field, annotation: Any) -> None:
+        kwargs = {"help": dataclass_field.metadata.get("help")}
+        if dataclass_field.default is not dataclasses.MISSING:
+            kwargs["default"] = dataclass_field.default
+        elif dataclass_field.default_factory is not dataclasses.MISSING:
+            kwargs["default"] = dataclass_field.default_factory()
+        else:
+            kwargs["required"] = True
+        # Optional[X] is parsed as X; its default stays None
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if typing.get_origin(annotation) is Union and len(args) == 1:
+            annotation = args[0]
+        if typing.get_origin(annotation) is Literal:
+            choices = typing.get_args(annotation)
+            kwargs.update(choices=choices, type=type(choices[0]))
+        elif annotation is bool:
+            kwargs.update(type=_parse_bool, nargs="?", const=True)
+        elif typing.get_origin(annotation) in (list, List):
+            kwargs.update(type=typing.get_args(annotation)[0], nargs="+")
+        else:
+            kwargs["type"] = annotation
+        self.add_argument(f"--{dataclass_field.name}", **kwargs)
+
+    def parse_args_into_dataclasses(self, args: Optional[Sequence[str]] = None) -> Tuple[Any, ...]:
+        """Parse `args` (the command line by default) into one instance of each dataclass."""
+        namespace = vars(self.parse_args(args))
+        return tuple(
+            dataclass_type(**{f.name: namespace[f.name] for f in dataclasses.fields(dataclass_type) if f.init})
+            for dataclass_type in self.dataclass_types
+        )
+
 @dataclass
 class LLMSwarmConfig:
     instances: int = 1
+    max_instances: Optional[int] = None
     inference_engine: Literal["tgi", "vllm"] = "tgi"
-    job_scheduler: Literal["slurm", "runai"] = "slurm"
+    job_scheduler: Literal["slurm", "runai", "runai-watch", "local"] = "slurm"
     template_path: Optional[str] = "templates/tgi_h100.template.slurm"
     model: str = "mistralai/Mistral-7B-Instruct-v0.1"
     revision: str = "main"
     gpus: float = 0.4
+    load_balancer: Literal["python", "nginx"] = "nginx"
+    routing_policy: Literal["least_requests", "least_tokens", "prefix_affinity"] = "least_requests"
+    engine_metrics_poll_interval: Optional[float] = None
     load_balancer_template_path: Optional[str] = "templates/nginx.template.conf"
     per_instance_max_parallel_requests: int = 128
     debug_endpoint: Optional[str] = None
@@ -103,9 +187,27 @@ class LLMSwarmConfig:
     model_max_total: int = 300
     port: int = 6969
     logs_folder: str = "logs"
+    poll_interval: float = 3.0
+    max_poll_interval: float = 5.0
+    poll_backoff: float = 1.5
+    start_timeout: Optional[float] = None
+    job_status_ttl: float = 3.0
+    kubernetes_namespace: Optional[str] = None
+    health_check_interval: Optional[float] = None
+    health_check_timeout: float = 5.0
+    health_failure_threshold: int = 3
+    response_cache_path: Optional[str] = None
+    response_cache_max_bytes: Optional[int] = 10 * 1024**3
+    metrics_port: Optional[int] = None
+    trace_path: Optional[str] = None
+    trace_sample_rate: float = 1.0
+    state_file: Optional[str] = None
+    lease_timeout: float = 900.0
 
     def __post_init__(self):
         if not (1024 <= self.port <= 65535):
             raise ValueError("Port must be between 1024 and 65535")
         if self.gpus <= 0:
-            raise ValueError("Number of GPUs must be greater than zero")
\ No newline at end of file
+            raise ValueError("Number of GPUs must be greater than zero")
+        if self.poll_interval <= 0:
+            raise ValueError("Poll interval must be greater than zero")
\ No newline at end of file
@@ -0,0 +1,17 @@
+#!/bin/bash
+# Local stand-in for a TGI/vLLM job (job_scheduler="local"): serves llm_swarm.mock_server on CPU.
+# $$ is the job id reported to the swarm.
+exec > {{logs_folder}}/llm-swarm_$$.out 2>&1
+
+# start the search at a random port so instances starting together pick different ones
+export PORT=$(python -c "import random; from llm_swarm.utils import get_unused_port; print(get_unused_port(random.randint(20000, 60000)))")
+echo "Starting mock {{inference_engine}} server port $PORT"
+echo "http://127.0.0.1:$PORT $$" >> {{hosts_path}}
+exec python -m llm_swarm.mock_server \
+    --inference-engine {{inference_engine}} \
+    --model {{model}} \
+    --port $PORT \
+    --max-batch-size {{max_concurrent_requests}} \
+    --decode-tokens-per-s 50 \
+    --batch-tokens-per-s 2000 \
+    --startup-delay 5
@@ -0,0 +1,23 @@
+import pytest
+
+from llm_swarm.mock_server import Faults, LatencyModel, MockServer
+
+# fast enough that a request completes in milliseconds
+FAST = LatencyModel(decode_tokens_per_s=10_000, batch_tokens_per_s=1_000_000)
+
+
+@pytest.fixture
+def mock_server():
+    """Start mock engines on demand, e.g. `mock_server("vllm", faults=Faults(hang_rate=1))`."""
+    servers = []
+
+    def start(inference_engine: str = "tgi", **kwargs) -> MockServer:
+        kwargs.setdefault("latency", FAST)
+        kwargs.setdefault("faults", Faults())
+        server = MockServer(inference_engine, host="127.0.0.1", **kwargs).start_in_thread()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop_thread()
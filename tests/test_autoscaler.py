@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+from llm_swarm.autoscaler import Autoscaler
+
+
+class FakeSwarm:
+    def __init__(self, instances):
+        self.job_ids = [str(i) for i in range(instances)]
+        self.config = SimpleNamespace(per_instance_max_parallel_requests=10)
+        self.scaled = []
+
+    def scale_to(self, instances):
+        self.scaled.append(instances)
+        self.job_ids = [str(i) for i in range(instances)]
+
+
+def test_desired_instances_follow_the_backlog_within_bounds():
+    autoscaler = Autoscaler(FakeSwarm(1), lambda: 0, min_instances=1, max_instances=4)
+    assert [autoscaler.desired_instances(backlog) for backlog in (0, 10, 11, 35, 1000)] == [1, 1, 2, 4, 4]
+    with pytest.raises(ValueError):
+        Autoscaler(FakeSwarm(1), lambda: 0, min_instances=3, max_instances=2)
+
+
+def test_scales_up_at_once_and_down_after_the_delay(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("llm_swarm.autoscaler.time.monotonic", lambda: now[0])
+    backlog = [25]
+    swarm = FakeSwarm(1)
+    autoscaler = Autoscaler(swarm, lambda: backlog[0], max_instances=4, scale_down_delay=60)
+    autoscaler.step()
+    assert swarm.scaled == [3]
+
+    backlog[0] = 5
+    autoscaler.step()
+    now[0] = 30
+    backlog[0] = 30  # a burst within the delay restarts it
+    autoscaler.step()
+    backlog[0] = 5
+    now[0] = 40
+    autoscaler.step()
+    now[0] = 90
+    autoscaler.step()
+    assert swarm.scaled == [3]
+    now[0] = 100
+    autoscaler.step()
+    assert swarm.scaled == [3, 1]
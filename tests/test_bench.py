@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+import pytest
+
+from llm_swarm.bench import compare, load_results, percentile, sweep
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3, 1, 2], 0.5) == 2
+
+
+@pytest.mark.parametrize("engine", ["tgi", "vllm"])
+def test_sweep_streams_every_token_from_the_mock_server(tmp_path, mock_server, engine):
+    server = mock_server(engine)
+    output = str(tmp_path / "results.jsonl")
+    endpoint = server.endpoint + ("/generate" if engine == "vllm" else "")
+    results = asyncio.run(
+        sweep(endpoint, engine, concurrency=(1, 4), prompt_tokens=(8,), max_new_tokens=(5,), min_requests=4, output=output)
+    )
+    assert [result.concurrency for result in results] == [1, 4]
+    for result in results:
+        assert result.errors == 0 and result.requests == max(4, 4 * result.concurrency)
+        assert result.output_tokens_per_s > 0 and result.ttft_p50 is not None and result.itl_p50 is not None
+    assert [json.loads(line)["concurrency"] for line in open(output)] == [1, 4]
+    assert load_results(output) == results
+
+
+def test_compare_shows_the_change_of_common_points(tmp_path, mock_server):
+    server = mock_server()
+    baseline = asyncio.run(sweep(server.endpoint, concurrency=(1, 2), prompt_tokens=(8,), max_new_tokens=(2,), min_requests=2))
+    candidate = asyncio.run(sweep(server.endpoint, concurrency=(2,), prompt_tokens=(8,), max_new_tokens=(2,), min_requests=2))
+    table = compare(baseline, candidate).splitlines()
+    assert len(table) == 2
+    assert table[1].split()[:3] == ["2", "8", "2"] and "%" in table[1]
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from llm_swarm.cache import ResponseCache
+from llm_swarm.client import SwarmClient
+
+
+def test_key_depends_on_model_revision_and_payload(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), model="m", revision="main")
+    other_revision = ResponseCache(str(tmp_path / "other.db"), model="m", revision="v2")
+    payload = {"inputs": "hi", "parameters": {"seed": 1}}
+    assert cache.key(payload) == cache.key({"parameters": {"seed": 1}, "inputs": "hi"})
+    assert cache.key(payload) != cache.key({"inputs": "hi", "parameters": {"seed": 2}})
+    assert cache.key(payload) != other_revision.key(payload)
+
+
+def test_put_get_and_reopen(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    assert cache.get("a") is None
+    cache.put("a", "text", "length", generated_tokens=3, prompt_tokens=2)
+    cached = cache.get("a")
+    assert (cached.text, cached.finish_reason, cached.generated_tokens, cached.prompt_tokens) == ("text", "length", 3, 2)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    cache.close()
+    reopened = ResponseCache(path)
+    assert reopened.get("a").text == "text"
+    assert reopened.stats()["size_bytes"] == 4
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=25)
+    for key in "abc":
+        cache.put(key, "x" * 10)
+    # "a" was evicted to make room for "c"; reading "b" makes "c" the next to go
+    assert cache.get("a") is None
+    cache.get("b")
+    cache.put("d", "x" * 10)
+    assert cache.get("b") is not None
+    assert cache.get("c") is None
+    assert len(cache) == 2
+
+
+def test_client_reads_and_writes_the_cache_off_the_event_loop(tmp_path, mock_server):
+    server = mock_server()
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    threads = []
+    get, put = cache.get, cache.put
+    cache.get = lambda *args: threads.append(threading.current_thread()) or get(*args)
+    cache.put = lambda *args: threads.append(threading.current_thread()) or put(*args)
+
+    async def run():
+        async with SwarmClient(server.endpoint, cache=cache) as client:
+            first = await client.generate("a b", max_new_tokens=3, seed=1)
+            second = await client.generate("a b", max_new_tokens=3, seed=1)
+            return first, second
+
+    first, second = asyncio.run(run())
+    cache.close()
+    assert not first.cached and second.cached
+    assert second.text == first.text and second.generated_tokens == 3
+    assert server.requests == 1
+    assert len(threads) == 3 and threading.main_thread() not in threads
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from llm_swarm.client import GenerationRequest, SwarmClient
+from llm_swarm.load_balancer import LoadBalancer
+from llm_swarm.mock_server import Faults
+
+
+def test_generate_tgi_and_vllm(mock_server):
+    async def run(endpoint, engine):
+        async with SwarmClient(endpoint, inference_engine=engine) as client:
+            return await client.generate("a b c", max_new_tokens=4)
+
+    for engine in ("tgi", "vllm"):
+        server = mock_server(engine)
+        endpoint = server.endpoint + ("/generate" if engine == "vllm" else "")
+        response = asyncio.run(run(endpoint, engine))
+        assert response.error is None
+        assert len(response.text.split()) == 4
+        assert response.attempts == 1
+
+
+# each token takes a second: requests outlive the client's timeout, but not the test
+SLOW = Faults(slowdown=10_000)
+
+
+def test_timeout_applies_without_deadline(mock_server):
+    server = mock_server(faults=SLOW)
+
+    async def run():
+        async with SwarmClient(server.endpoint, timeout=0.5, max_retries=1) as client:
+            await client.generate(GenerationRequest("slow", max_new_tokens=2))
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert time.perf_counter() - start < 1.5
+
+
+def test_deadline_narrows_timeout(mock_server):
+    server = mock_server(faults=SLOW)
+
+    async def run():
+        async with SwarmClient(server.endpoint, timeout=60, max_retries=1) as client:
+            await client.generate(GenerationRequest("slow", max_new_tokens=2, deadline=0.3))
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert time.perf_counter() - start < 1.5
+
+
+def test_failed_attempts_are_retried_with_backoff(mock_server):
+    server = mock_server(faults=Faults(error_rate=1.0))
+
+    async def run():
+        async with SwarmClient(server.endpoint, max_retries=3, retry_delay=0.01) as client:
+            await client.generate("a", max_new_tokens=1)
+
+    start = time.perf_counter()
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(run())
+    assert server.requests == 3
+    assert time.perf_counter() - start >= 0.03
+
+
+def test_generate_many_yields_failures_alongside_results(mock_server):
+    server = mock_server(faults=Faults(error_rate=0.5), seed=0)
+
+    async def run():
+        async with SwarmClient(server.endpoint, max_retries=1) as client:
+            requests = [GenerationRequest(f"p {i}", max_new_tokens=2) for i in range(20)]
+            return [response async for response in client.generate_many(requests, max_in_flight=4)]
+
+    responses = asyncio.run(run())
+    failed = [response for response in responses if response.error is not None]
+    assert len(responses) == 20 and 0 < len(failed) < 20
+    assert all(response.generated_tokens == 2 for response in responses if response.error is None)
+
+
+def test_engine_reported_token_counts_are_used(mock_server):
+    async def run(endpoint, engine):
+        async with SwarmClient(endpoint, inference_engine=engine) as client:
+            return await client.generate("a b c", max_new_tokens=5)
+
+    tgi = mock_server("tgi")
+    vllm = mock_server("vllm")
+    for response in (asyncio.run(run(tgi.endpoint, "tgi")), asyncio.run(run(vllm.endpoint + "/generate", "vllm"))):
+        assert (response.generated_tokens, response.prompt_tokens) == (5, 3)
+
+
+def test_rejected_requests_fail_at_once_and_overloads_are_retried(mock_server):
+    load_balancer = LoadBalancer([], host="127.0.0.1").start_in_thread()
+
+    async def run(model):
+        async with SwarmClient(load_balancer.endpoint, max_retries=3, retry_delay=0.05, model=model) as client:
+            await client.generate("a", max_new_tokens=1)
+
+    try:
+        # no endpoint yet: 503, retried
+        start = time.perf_counter()
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            asyncio.run(run("a"))
+        assert error.value.status == 503 and time.perf_counter() - start >= 0.15
+
+        load_balancer.pool("a").add_endpoint(mock_server().endpoint)
+        load_balancer.pool("b").add_endpoint(mock_server().endpoint)
+        start = time.perf_counter()
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            asyncio.run(run("c"))
+        assert error.value.status == 404 and time.perf_counter() - start < 0.05
+    finally:
+        load_balancer.stop_thread()
@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_swarm.concurrency import AdaptiveConcurrencyLimiter, DeadlineExceeded
+
+
+def test_limits_are_validated():
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=4)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(decrease_factor=1)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter().set_weight("a", 0)
+
+
+def test_slow_start_grows_then_overload_decreases_once_per_round_trip():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=100)
+        slots = [await limiter.acquire() for _ in range(2)]
+        slots[0].release(latency=0.1, tokens=10)
+        slots[1].release(latency=0.1, tokens=10)  # no longer saturated: no increase
+        assert limiter.limit == 3
+
+        slots = [await limiter.acquire() for _ in range(3)]
+        slots[0].release(overloaded=True)
+        slots[1].release(overloaded=True)  # sent before the decrease: ignored
+        assert limiter.limit == pytest.approx(3 * 0.7)
+        assert limiter.history[-1].reason == "overload"
+        assert not limiter.slow_start
+
+        slots[2].release(latency=0.1, tokens=10)
+        assert limiter.limit == pytest.approx(3 * 0.7)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter.stats()["classes"][0]["requests"] == 5
+
+
+async def release_one(limiter, latency, tokens):
+    slot = await limiter.acquire()
+    slot.release(latency=latency, tokens=tokens)
+
+
+def test_latency_well_above_the_baseline_decreases():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+        for _ in range(16):
+            await release_one(limiter, 0.1, 10)
+        assert limiter.limit == 10
+        await release_one(limiter, 1.0, 10)  # 10x the baseline latency per token
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == pytest.approx(7)
+    assert limiter.history[-1].reason == "latency"
+    assert limiter.baseline == pytest.approx(0.01)
+
+
+def test_short_and_uncounted_responses_dont_collapse_the_limit():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=32, max_limit=64)
+        for i in range(200):
+            if i % 10 == 0:
+                # stopped early: fast, but says nothing about the time per token
+                await release_one(limiter, 0.001, 1)
+            elif i % 10 == 1:
+                # an engine reporting no token count
+                await release_one(limiter, 0.001, None)
+            elif i == 50:
+                # one response much faster per token than the rest
+                await release_one(limiter, 0.01, 100)
+            else:
+                await release_one(limiter, 2.0 + (i % 3) * 0.1, 100)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == 32
+    assert [change.reason for change in limiter.history] == ["initial"]
+    assert limiter.baseline == pytest.approx(0.02)
+
+
+def test_engine_queue_time_counts_as_congestion():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, max_queue_time=0.5)
+        slot = await limiter.acquire()
+        slot.release(latency=0.1, queue_time=2.0)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == pytest.approx(7)
+    assert limiter.history[-1].reason == "queue"
+
+
+def test_waiters_get_slots_by_priority_then_deadline():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+        held = await limiter.acquire()
+        order = []
+
+        async def wait(name, **kwargs):
+            slot = await limiter.acquire(**kwargs)
+            order.append(name)
+            slot.release()
+
+        now = time.monotonic()
+        tasks = [
+            asyncio.create_task(wait("low")),
+            asyncio.create_task(wait("late", priority=1, deadline=now + 60)),
+            asyncio.create_task(wait("soon", priority=1, deadline=now + 30)),
+            asyncio.create_task(wait("high", priority=2)),
+        ]
+        await asyncio.sleep(0)
+        held.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["high", "soon", "late", "low"]
+
+
+def test_tenants_share_slots_by_weight():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+        limiter.set_weight("big", 3)
+        held = await limiter.acquire()
+        order = []
+
+        async def wait(tenant):
+            slot = await limiter.acquire(tenant=tenant)
+            order.append(tenant)
+            slot.release()
+
+        tasks = [asyncio.create_task(wait(tenant)) for tenant in ["small"] * 4 + ["big"] * 12]
+        await asyncio.sleep(0)
+        held.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(run())
+    assert order[:8].count("big") == 6
+
+
+def test_deadline_exceeded_while_waiting_frees_nothing():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+        held = await limiter.acquire()
+        with pytest.raises(DeadlineExceeded):
+            await limiter.acquire(tenant="t", deadline=time.monotonic() + 0.01)
+        assert limiter.in_flight == 1 and limiter.waiting == 0
+        held.release()
+        slot = await limiter.acquire()
+        slot.release()
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter.tenant_metrics["t"].deadline_misses == 1
+
+
+def test_cancelled_waiter_hands_its_slot_over():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+        held = await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        held.release()  # wakes `cancelled`, which gives the slot to `waiting`
+        cancelled.cancel()
+        slot = await asyncio.wait_for(waiting, 1)
+        slot.release()
+        slot.release()  # releasing twice is a no-op
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
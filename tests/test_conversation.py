@@ -0,0 +1,63 @@
+import asyncio
+
+from llm_swarm.client import SwarmClient
+from llm_swarm.conversation import ConversationExecutor
+
+
+def render(messages):
+    return " ".join(message["content"] for message in messages)
+
+
+def test_turns_build_up_the_chat_with_growing_priority(mock_server):
+    server = mock_server()
+    priorities = []
+
+    async def run():
+        async with SwarmClient(server.endpoint) as client:
+            generate = client.generate
+
+            async def spy(request):
+                priorities.append(request.priority)
+                return await generate(request)
+
+            client.generate = spy
+            executor = ConversationExecutor(client, render, progress=False, max_new_tokens=2)
+            conversation = executor.conversation()
+            await conversation.say("hi")
+            branch = conversation.fork()
+            await conversation.say("more")
+            await branch.say("other")
+            return conversation, branch
+
+    conversation, branch = asyncio.run(run())
+    assert [message["role"] for message in conversation.messages] == ["user", "assistant"] * 2
+    assert conversation.depth == 2 and branch.depth == 2
+    assert branch.messages[2]["content"] == "other"
+    assert priorities == [1, 2, 2]
+
+
+def test_concurrent_runs_keep_their_own_script(mock_server):
+    server = mock_server()
+
+    def script(name):
+        async def run(conversation, row):
+            await conversation.say(f"{name} {row['id']}")
+            await asyncio.sleep(0.01)
+            await conversation.say("again")
+            return {"id": row["id"], "script": name}
+
+        return run
+
+    async def collect(executor, name):
+        rows = [{"id": i} for i in range(5)]
+        return [result async for _, result in executor.stream(rows, script(name))]
+
+    async def run():
+        async with SwarmClient(server.endpoint) as client:
+            executor = ConversationExecutor(client, render, max_active=2, progress=False, max_new_tokens=2)
+            return await asyncio.gather(collect(executor, "a"), collect(executor, "b"))
+
+    first, second = asyncio.run(run())
+    assert {result["script"] for result in first} == {"a"}
+    assert {result["script"] for result in second} == {"b"}
+    assert sorted(result["id"] for result in first) == list(range(5))
@@ -0,0 +1,102 @@
+import threading
+from types import SimpleNamespace
+
+from llm_swarm.health import HealthMonitor
+from llm_swarm.schedulers.job_status import JobStatus
+from llm_swarm.schedulers.slurm_scheduler import SlurmScheduler
+
+
+class FlakySlurm(SlurmScheduler):
+    """A Slurm scheduler whose `squeue` answers from `statuses`, or fails while `failing`."""
+
+    def __init__(self, job_ids):
+        super().__init__(status_ttl=0)
+        self.statuses = {job_id: JobStatus(state="R", running=True) for job_id in job_ids}
+        self.failing = False
+
+    def query_job_statuses(self):
+        if self.failing:
+            raise RuntimeError("squeue: error: Unable to contact slurm controller")
+        return dict(self.statuses)
+
+
+def make_monitor(probe_results, failure_threshold=3):
+    job_ids = ["1_0", "1_1", "1_2"]
+    replaced = []
+    swarm = SimpleNamespace(
+        scheduler=FlakySlurm(job_ids),
+        job_ids=job_ids,
+        job_endpoints={job_id: f"http://node{i}:6969" for i, job_id in enumerate(job_ids)},
+        load_balancer=None,
+        replace_instance=replaced.append,
+    )
+    monitor = HealthMonitor(swarm, failure_threshold=failure_threshold, probe=lambda endpoint, timeout: probe_results.get(endpoint))
+    return monitor, swarm, replaced
+
+
+def ejected(monitor):
+    return [event.job_id for event in monitor.events if event.kind == "ejected"]
+
+
+def test_failed_scheduler_query_is_not_a_dead_job():
+    monitor, swarm, _ = make_monitor({})
+    swarm.scheduler.failing = True
+    monitor.step()
+    assert swarm.scheduler.job_running("1_0") is None
+    assert not swarm.scheduler.is_job_running("1_0")
+    assert monitor.events == []
+    assert ejected(monitor) == []
+
+
+def test_failed_scheduler_query_still_counts_failed_probes():
+    monitor, swarm, _ = make_monitor({"http://node1:6969": "ConnectionError"}, failure_threshold=2)
+    swarm.scheduler.failing = True
+    monitor.step()
+    assert ejected(monitor) == []
+    monitor.step()
+    assert ejected(monitor) == ["1_1"]
+
+
+def test_finished_job_is_replaced_right_away():
+    monitor, swarm, replaced = make_monitor({})
+    del swarm.scheduler.statuses["1_2"]
+    monitor.step()
+    assert ejected(monitor) == ["1_2"]
+    for thread in list(monitor._replacing.values()):
+        thread.join()
+    assert replaced == ["1_2"]
+
+
+def test_unhealthy_endpoint_waits_for_threshold_and_recovers():
+    probe_results = {"http://node0:6969": "HTTP 503"}
+    monitor, _, _ = make_monitor(probe_results)
+    monitor.step()
+    monitor.step()
+    assert monitor.failures == {"1_0": 2}
+    del probe_results["http://node0:6969"]
+    monitor.step()
+    assert monitor.failures == {}
+    assert [event.kind for event in monitor.events] == ["unhealthy", "unhealthy", "recovered"]
+    assert ejected(monitor) == []
+
+
+def test_stop_waits_for_replacements_in_progress():
+    monitor, swarm, replaced = make_monitor({})
+    release = threading.Event()
+
+    def replace_instance(job_id):
+        release.wait(5)
+        replaced.append(job_id)
+
+    swarm.replace_instance = replace_instance
+    del swarm.scheduler.statuses["1_2"]
+    monitor.step()
+    stopper = threading.Thread(target=monitor.stop)
+    stopper.start()
+    stopper.join(0.2)
+    assert stopper.is_alive()
+    release.set()
+    stopper.join(5)
+    # the swarm's cleanup, which runs after stop, sees the replacement's job
+    assert not stopper.is_alive()
+    assert replaced == ["1_2"]
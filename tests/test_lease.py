@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import llm_swarm
+from llm_swarm import LLMSwarmConfig
+from llm_swarm.lease import Lease, SwarmState, read_state, reap, renew, write_state
+
+
+def record(path, heartbeat, swarm_id="s1", lease_timeout=60.0, **kwargs):
+    state = SwarmState(swarm_id, {"job_scheduler": "local"}, heartbeat=heartbeat, lease_timeout=lease_timeout, **kwargs)
+    write_state(str(path), state)
+    return state
+
+
+def test_renew_pushes_back_the_expiry_of_a_live_lease(tmp_path):
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 30)
+    state = renew(str(path), "s1")
+    assert state is not None and state.expires > time.time() + 59
+    assert read_state(str(path)).heartbeat == state.heartbeat
+    assert renew(str(path), "other") is None
+
+
+def test_expired_lease_is_not_revived(tmp_path):
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 120)
+    assert renew(str(path), "s1") is None
+    assert read_state(str(path)).expired()
+    assert renew(str(tmp_path / "missing.json"), "s1") is None
+
+
+def test_lease_renews_from_a_thread(tmp_path):
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 30)
+    lease = Lease(str(path), "s1", interval=0.01).start()
+    time.sleep(0.05)
+    lease.stop()
+    assert time.time() - read_state(str(path)).heartbeat < 1
+
+
+def test_reap_cancels_the_jobs_once_the_lease_expires(tmp_path, monkeypatch):
+    cancelled = []
+    monkeypatch.setattr(llm_swarm.LLMSwarm, "cleanup", lambda swarm: cancelled.append(list(swarm.job_ids)))
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 59.9, job_ids=["1", "2"])
+    assert reap(str(path), "s1", poll_interval=0.05)
+    assert cancelled == [["1", "2"]]
+    assert read_state(str(path)) is None
+
+
+def test_reap_leaves_a_replaced_swarm_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_swarm.LLMSwarm, "cleanup", lambda swarm: pytest.fail("cancelled a newer swarm"))
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 120, swarm_id="s2")
+    assert not reap(str(path), "s1")
+
+
+
+def test_starting_over_an_expired_swarm_cancels_its_jobs(tmp_path, monkeypatch):
+    cancelled = []
+    monkeypatch.setattr(llm_swarm.LLMSwarm, "cleanup", lambda swarm: cancelled.append(list(swarm.job_ids)))
+    path = tmp_path / "swarm.json"
+    record(path, heartbeat=time.time() - 120, job_ids=["1", "2"])
+    swarm = llm_swarm.LLMSwarm(LLMSwarmConfig(job_scheduler="local", state_file=str(path), logs_folder=str(tmp_path / "logs")))
+    assert not swarm._attach()
+    # the jobs were cancelled before the new swarm overwrites the state, which would make the old reaper give up
+    assert cancelled == [["1", "2"]]
+    assert read_state(str(path)) is None
+    assert not reap(str(path), "s1")
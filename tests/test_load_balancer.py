@@ -0,0 +1,77 @@
+import asyncio
+
+import requests
+
+from llm_swarm.client import SwarmClient
+from llm_swarm.load_balancer import LoadBalancer, _parse_endpoints
+from llm_swarm.mock_server import Faults
+
+
+def generate_all(endpoint, prompts, **kwargs):
+    async def run():
+        async with SwarmClient(endpoint, max_retries=1, **kwargs) as client:
+            return await asyncio.gather(*(client.generate(prompt, max_new_tokens=2) for prompt in prompts))
+
+    return asyncio.run(run())
+
+
+def test_requests_are_spread_over_the_endpoints(mock_server):
+    servers = [mock_server(), mock_server()]
+    load_balancer = LoadBalancer([server.endpoint for server in servers], host="127.0.0.1").start_in_thread()
+    try:
+        responses = generate_all(load_balancer.endpoint, [f"prompt {i}" for i in range(20)])
+        assert all(len(response.text.split()) == 2 for response in responses)
+        requests_per_backend = [backend.requests for backend in load_balancer.backends]
+        assert sum(requests_per_backend) == 20 and min(requests_per_backend) > 0
+        stats = requests.get(f"{load_balancer.endpoint}/_swarm/stats").json()
+        assert set(stats["backends"]) == {server.endpoint for server in servers}
+    finally:
+        load_balancer.stop_thread()
+
+
+def test_removed_endpoint_drains_and_gets_no_new_requests(mock_server):
+    slow, fast = mock_server(faults=Faults(slowdown=100)), mock_server()
+    load_balancer = LoadBalancer([slow.endpoint, fast.endpoint], host="127.0.0.1").start_in_thread()
+
+    async def run():
+        async with SwarmClient(load_balancer.endpoint, max_retries=1) as client:
+            # least requests sends the first request to the first endpoint
+            in_flight = asyncio.ensure_future(client.generate("slow", max_new_tokens=2))
+            while not load_balancer.backends[0].outstanding:
+                await asyncio.sleep(0.01)
+            removed = await asyncio.to_thread(load_balancer.remove_endpoint, slow.endpoint)
+            after = await asyncio.gather(*(client.generate(f"fast {i}", max_new_tokens=2) for i in range(5)))
+            return removed, await in_flight, after
+
+    try:
+        removed, drained, after = asyncio.run(run())
+        assert drained.error is None and removed.draining and removed.outstanding == 0
+        assert removed.requests == 1
+        assert all(response.error is None for response in after)
+        assert [backend.url for backend in load_balancer.backends] == [fast.endpoint]
+    finally:
+        load_balancer.stop_thread()
+
+
+def test_no_endpoint_answers_503():
+    load_balancer = LoadBalancer([], host="127.0.0.1").start_in_thread()
+    try:
+        assert requests.post(load_balancer.endpoint, json={"inputs": "x"}).status_code == 503
+    finally:
+        load_balancer.stop_thread()
+
+
+def test_unreachable_endpoint_answers_502():
+    load_balancer = LoadBalancer(["http://127.0.0.1:1"], host="127.0.0.1").start_in_thread()
+    try:
+        assert requests.post(load_balancer.endpoint, json={"inputs": "x"}).status_code == 502
+        assert load_balancer.backends[0].errors == 1
+    finally:
+        load_balancer.stop_thread()
+
+
+def test_endpoints_are_read_from_hosts_files_or_lists(tmp_path):
+    hosts_path = tmp_path / "hosts.txt"
+    hosts_path.write_text("http://node0:6969 1_0\n\nhttp://node1:6969\n")
+    assert _parse_endpoints(str(hosts_path)) == ["http://node0:6969", "http://node1:6969"]
+    assert _parse_endpoints("http://node0:6969,,http://node1:6969") == ["http://node0:6969", "http://node1:6969"]
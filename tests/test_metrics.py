@@ -0,0 +1,75 @@
+import math
+
+import pytest
+import requests
+
+from llm_swarm.load_balancer import LoadBalancer
+from llm_swarm.metrics import ENDPOINT_REQUESTS, MetricsRegistry, MetricsServer
+
+
+def test_render_counters_gauges_and_histograms():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("tenant",))
+    counter.inc(tenant="a")
+    counter.inc(2, tenant='quote"d')
+    gauge = registry.gauge("in_flight", "In flight")
+    gauge.inc(3)
+    gauge.dec()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{tenant="a"} 1' in lines
+    assert 'requests_total{tenant="quote\\"d"} 2' in lines
+    assert "in_flight 2" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+    assert histogram.value() == 3
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(1.0) == math.inf
+
+
+def test_same_name_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("x", "X") is registry.counter("x", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x", "X")
+
+
+def test_gauge_series_can_be_removed():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("queue_depth", "Queue depth", ("endpoint",))
+    gauge.set(4, endpoint="a")
+    gauge.remove(endpoint="a")
+    assert 'endpoint="a"' not in registry.render()
+
+
+def test_server_exposes_the_registry():
+    registry = MetricsRegistry()
+    registry.counter("up_total", "Up").inc()
+    server = MetricsServer(registry, host="127.0.0.1", port=0).start()
+    try:
+        response = requests.get(server.endpoint)
+        assert response.ok and "up_total 1" in response.text
+        assert requests.get(server.endpoint.replace("/metrics", "/other")).status_code == 404
+    finally:
+        server.stop()
+
+
+def test_load_balancer_counts_requests_per_endpoint(mock_server):
+    server = mock_server()
+    load_balancer = LoadBalancer([], host="127.0.0.1")
+    load_balancer.add_endpoint(server.endpoint, job_id="42")
+    load_balancer.start_in_thread()
+    try:
+        before = ENDPOINT_REQUESTS.value(endpoint=server.endpoint, job_id="42")
+        requests.post(load_balancer.endpoint, json={"inputs": "x", "parameters": {"max_new_tokens": 1}})
+        assert ENDPOINT_REQUESTS.value(endpoint=server.endpoint, job_id="42") == before + 1
+        metrics = requests.get(f"{load_balancer.endpoint}/_swarm/metrics").text
+        assert f'llm_swarm_endpoint_requests_total{{endpoint="{server.endpoint}",job_id="42",model=""}}' in metrics
+    finally:
+        load_balancer.stop_thread()
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from llm_swarm.mock_server import MOCK_CONFIG_PATH, Faults, LatencyModel
+from llm_swarm.routing import parse_queue_depth
+
+
+def test_tgi_and_vllm_protocols(mock_server):
+    tgi = mock_server("tgi", model="m")
+    body = {"inputs": "a b c", "parameters": {"max_new_tokens": 3, "details": True}}
+    listed = requests.post(f"{tgi.endpoint}/", json=body)
+    assert listed.json()[0]["details"]["generated_tokens"] == 3
+    assert int(listed.headers["x-generated-tokens"]) == 3
+    assert len(requests.post(f"{tgi.endpoint}/generate", json=body).json()["generated_text"].split()) == 3
+    events = [line for line in requests.post(f"{tgi.endpoint}/generate_stream", json=body).text.splitlines() if line]
+    assert len(events) == 3
+    assert requests.get(f"{tgi.endpoint}/info").json()["model_id"] == "m"
+
+    vllm = mock_server("vllm")
+    text = requests.post(f"{vllm.endpoint}/generate", json={"prompt": "a b", "max_tokens": 4}).json()["text"][0]
+    assert text.startswith("a b") and len(text.split()) == 6
+
+
+def test_requests_beyond_the_batch_queue(mock_server):
+    # 100 tokens per second: the second request waits for the first one's 10 tokens
+    server = mock_server(latency=LatencyModel(decode_tokens_per_s=100, max_batch_size=1))
+    body = {"inputs": "x", "parameters": {"max_new_tokens": 10}}
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda _: requests.post(server.endpoint, json=body), range(2)))
+    # in milliseconds, as TGI reports it
+    queue_times = sorted(int(response.headers["x-queue-time"]) for response in responses)
+    assert queue_times[1] >= 50
+
+
+def test_faults_are_injected_and_reconfigured(mock_server):
+    server = mock_server(faults=Faults(unhealthy=True, error_rate=1.0))
+    assert requests.get(f"{server.endpoint}/health").status_code == 503
+    assert requests.post(server.endpoint, json={"inputs": "x"}).status_code == 500
+    assert requests.post(f"{server.endpoint}{MOCK_CONFIG_PATH}", json={"unhealthy": False, "error_rate": 0}).ok
+    assert requests.get(f"{server.endpoint}/health").ok
+    assert requests.post(server.endpoint, json={"inputs": "x", "parameters": {"max_new_tokens": 1}}).ok
+    assert requests.post(f"{server.endpoint}{MOCK_CONFIG_PATH}", json={"other": 1}).status_code == 400
+
+
+def test_metrics_report_the_queue(mock_server):
+    for engine in ("tgi", "vllm"):
+        server = mock_server(engine)
+        assert parse_queue_depth(requests.get(f"{server.endpoint}/metrics").text) == 0
+
+
+def test_hung_requests_dont_block_stop(mock_server):
+    server = mock_server(faults=Faults(hang_rate=1.0))
+    try:
+        requests.post(server.endpoint, json={"inputs": "x"}, timeout=0.2)
+    except requests.Timeout:
+        pass
+    start = time.perf_counter()
+    server.stop_thread()
+    assert time.perf_counter() - start < 2
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+import requests
+
+from llm_swarm import LLMSwarmConfig
+from llm_swarm.client import SwarmClient
+from llm_swarm.load_balancer import LoadBalancer
+from llm_swarm.multi_model import MultiModelSwarm
+from llm_swarm.routing import MODEL_HEADER
+
+from test_swarm import local_config
+
+
+@pytest.fixture
+def two_models(mock_server):
+    tgi, vllm = mock_server("tgi", model="a"), mock_server("vllm", model="b")
+    load_balancer = LoadBalancer([], host="127.0.0.1")
+    load_balancer.pool("a").add_endpoint(tgi.endpoint, "1")
+    load_balancer.pool("b").add_endpoint(vllm.endpoint, "2")
+    load_balancer.start_in_thread()
+    yield load_balancer
+    load_balancer.stop_thread()
+
+
+def test_requests_go_to_the_pool_of_their_model(two_models):
+    async def run():
+        async with SwarmClient(two_models.endpoint, model_engines={"a": "tgi", "b": "vllm"}, max_retries=1) as client:
+            return await client.fan_out("x y", ["a", "b", "c"], max_new_tokens=3)
+
+    responses = asyncio.run(run())
+    assert len(responses["a"].text.split()) == 3 and responses["a"].error is None
+    assert len(responses["b"].text.split()) == 3 and responses["b"].error is None
+    assert responses["c"].error is not None
+    assert [backend.requests for backend in two_models.pool("a").backends] == [1]
+    assert [backend.requests for backend in two_models.pool("b").backends] == [1]
+
+
+def test_unnamed_or_unknown_model_is_rejected(two_models):
+    body = {"inputs": "x", "parameters": {"max_new_tokens": 1}}
+    unnamed = requests.post(two_models.endpoint, json=body)
+    assert unnamed.status_code == 400 and MODEL_HEADER in unnamed.text
+    unknown = requests.post(two_models.endpoint, json=body, headers={MODEL_HEADER: "c"})
+    assert unknown.status_code == 404 and "'c'" in unknown.text
+    assert requests.post(two_models.endpoint, json=body, headers={MODEL_HEADER: "a"}).ok
+
+
+def test_pools_route_with_their_own_policy(two_models):
+    assert two_models._policy("a") is not two_models._policy("b")
+    assert set(two_models.stats()["policies"]) == {"a", "b"}
+
+
+def test_single_pool_serves_requests_without_a_model(mock_server):
+    server = mock_server(model="a")
+    load_balancer = LoadBalancer([], host="127.0.0.1")
+    load_balancer.pool("a").add_endpoint(server.endpoint)
+    load_balancer.start_in_thread()
+    try:
+        assert requests.post(load_balancer.endpoint, json={"inputs": "x", "parameters": {"max_new_tokens": 1}}).ok
+    finally:
+        load_balancer.stop_thread()
+
+
+def test_pools_need_distinct_models():
+    with pytest.raises(ValueError):
+        MultiModelSwarm([LLMSwarmConfig(model="a", job_scheduler="local"), LLMSwarmConfig(model="a", job_scheduler="local")])
+    with pytest.raises(ValueError):
+        MultiModelSwarm([])
+
+
+def test_multi_model_swarm_serves_each_model_from_its_pool(tmp_path):
+    for model in ("a", "b"):
+        (tmp_path / model).mkdir()
+    configs = [
+        local_config(tmp_path / "a", model="a", instances=1),
+        local_config(tmp_path / "b", model="b", instances=2, inference_engine="vllm"),
+    ]
+
+    async def run(swarm):
+        async with swarm.client() as client:
+            return await client.fan_out("x y", swarm.models, max_new_tokens=2)
+
+    with MultiModelSwarm(configs) as swarm:
+        responses = asyncio.run(run(swarm))
+        assert {model: len(response.text.split()) for model, response in responses.items()} == {"a": 2, "b": 2}
+        assert {model: len(swarm.load_balancer.pool(model).backends) for model in swarm.models} == {"a": 1, "b": 2}
+    assert swarm.load_balancer._loop is None
@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+from llm_swarm.pipeline import Pipeline, Watermark
+from llm_swarm.sink import ParquetSink
+
+
+def test_watermark_advances_over_contiguous_offsets():
+    watermark = Watermark()
+    for offset in (1, 3, 0):
+        watermark.complete(offset)
+    assert watermark.state() == {"watermark": 2, "done": [3]}
+    assert watermark.is_complete(1) and watermark.is_complete(3) and not watermark.is_complete(2)
+    restored = Watermark.from_state(watermark.state())
+    assert (restored.offset, restored.done) == (2, {3})
+
+
+def test_stream_keeps_the_window_full_and_skips_completed_offsets():
+    active = 0
+    peak = 0
+
+    async def process(row):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        # later rows finish first
+        await asyncio.sleep(0.001 * (10 - row["i"]))
+        active -= 1
+        return {"i": row["i"]}
+
+    async def run():
+        pipeline = Pipeline(process, window=3, progress=False)
+        return [offset async for offset, _ in pipeline.stream([{"i": i} for i in range(10)], Watermark(2, {4}))]
+
+    offsets = asyncio.run(run())
+    assert sorted(offsets) == [2, 3] + list(range(5, 10))
+    assert offsets != sorted(offsets)
+    assert peak == 3
+
+
+def test_stream_accepts_async_iterables():
+    async def rows():
+        for i in range(5):
+            yield {"i": i}
+
+    async def process(row):
+        return row
+
+    async def run():
+        return [offset async for offset, _ in Pipeline(process, progress=False).stream(rows())]
+
+    assert sorted(asyncio.run(run())) == list(range(5))
+
+
+def test_run_resumes_after_the_last_committed_row(tmp_path):
+    rows = [{"i": i} for i in range(20)]
+    calls = []
+
+    def make_process(fail_at=None):
+        async def process(row):
+            if row["i"] == fail_at:
+                raise RuntimeError("crash")
+            calls.append(row["i"])
+            return {"i": row["i"]}
+
+        return process
+
+    # window=1 writes and commits every row in order, until the crash
+    sink = ParquetSink(str(tmp_path), rows_per_shard=5, buffer_rows=1, fsync_interval=None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(Pipeline(make_process(fail_at=12), window=1, progress=False).run(rows, sink))
+    assert sink.rows_committed == 10
+
+    calls.clear()
+    sink = ParquetSink(str(tmp_path), rows_per_shard=5)
+    processed = asyncio.run(Pipeline(make_process(), window=4, progress=False).run(rows, sink))
+    assert processed == 10
+    assert sorted(calls) == list(range(10, 20))
+    table = pq.read_table(os.path.join(tmp_path, "data"))
+    assert sorted(table.column("i").to_pylist()) == list(range(20))
+
+
+def test_window_must_be_positive():
+    with pytest.raises(ValueError):
+        Pipeline(lambda row: row, window=0)
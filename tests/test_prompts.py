@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from llm_swarm.pipeline import Pipeline
+from llm_swarm.prompts import PromptRenderer
+
+
+class SlowTokenizer:
+    """Renders `role: content` lines and counts words as tokens, taking `delay` seconds per batch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        return "\n".join(f"{m['role']}: {m['content']}" for m in messages) + ("\nassistant:" if add_generation_prompt else "")
+
+    def __call__(self, prompts, add_special_tokens=True):
+        time.sleep(self.delay)
+        return {"input_ids": [prompt.split() for prompt in prompts]}
+
+
+def rows(count):
+    return [{"id": i, "messages": [{"role": "user", "content": f"question {i}"}]} for i in range(count)]
+
+
+def test_call_renders_a_datasets_batch():
+    renderer = PromptRenderer(SlowTokenizer())
+    batch = {"messages": [row["messages"] for row in rows(2)]}
+    rendered = renderer(batch)
+    assert rendered["rendered_prompt"] == ["user: question 0\nassistant:", "user: question 1\nassistant:"]
+    assert rendered["prompt_tokens"] == [4, 4]
+
+
+def test_iter_rendered_keeps_order():
+    renderer = PromptRenderer(SlowTokenizer(), batch_size=3, num_workers=2, prefetch=2)
+    try:
+        rendered = list(renderer.iter_rendered(rows(10)))
+    finally:
+        renderer.close()
+    assert [row["id"] for row in rendered] == list(range(10))
+    assert rendered[7]["rendered_prompt"] == "user: question 7\nassistant:"
+
+
+def test_pipeline_over_aiter_rendered_doesnt_stall_the_event_loop():
+    renderer = PromptRenderer(SlowTokenizer(delay=0.3), batch_size=4, num_workers=1, prefetch=1)
+    gaps = []
+
+    async def process(row):
+        await asyncio.sleep(0.01)
+        return {"id": row["id"], "prompt_tokens": row["prompt_tokens"]}
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    async def run():
+        tick = asyncio.ensure_future(ticker())
+        pipeline = Pipeline(process, window=4, progress=False)
+        results = [result async for _, result in pipeline.stream(renderer.aiter_rendered(rows(12)))]
+        tick.cancel()
+        return results
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        renderer.close()
+    assert sorted(result["id"] for result in results) == list(range(12))
+    # each batch takes 0.3s to render: a blocking wait would show up as a gap that long
+    assert max(gaps) < 0.15
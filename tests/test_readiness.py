@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from llm_swarm.readiness import ReadinessTracker
+
+
+def test_items_are_polled_concurrently():
+    ready_at = {"a": 0.1, "b": 0.2, "c": 0.2}
+    tracker = ReadinessTracker(poll_interval=0.02, max_poll_interval=0.05)
+    start = time.monotonic()
+    timing = tracker.wait_until("jobs", list(ready_at), lambda item: time.monotonic() - start >= ready_at[item])
+    # one after the other would take the sum of the delays
+    assert time.monotonic() - start < 0.4
+    assert set(timing.ready_after) == set(ready_at)
+    assert timing.slowest in ("b", "c")
+    assert tracker.report().startswith("jobs: 3 ready in")
+
+
+def test_probe_errors_mean_not_ready_yet():
+    calls = []
+
+    def is_ready(item):
+        calls.append(item)
+        if len(calls) < 3:
+            raise ConnectionError("not listening yet")
+        return True
+
+    timing = ReadinessTracker(poll_interval=0.01).wait_until("endpoints", ["http://a"], is_ready)
+    assert len(calls) == 3 and timing.total > 0
+
+
+def test_dead_job_aborts_the_phase():
+    def is_ready(item):
+        if item == "dead":
+            raise RuntimeError("Job dead is not running")
+        return False
+
+    with pytest.raises(RuntimeError, match="dead"):
+        ReadinessTracker(poll_interval=0.01).wait_until("jobs", ["alive", "dead"], is_ready)
+
+
+def test_phase_times_out():
+    tracker = ReadinessTracker(poll_interval=0.01, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        tracker.wait_until("jobs", ["never"], lambda item: False)
+
+
+def test_empty_phase_is_ready_at_once():
+    assert ReadinessTracker().wait_until("jobs", [], lambda item: False).total == 0.0
@@ -0,0 +1,87 @@
+import json
+from collections import Counter
+
+from llm_swarm.routing import (
+    AFFINITY_KEY_HEADER,
+    MODEL_HEADER,
+    PROMPT_TOKENS_HEADER,
+    Backend,
+    LeastOutstandingRequests,
+    LeastOutstandingTokens,
+    PrefixAffinity,
+    ProxyRequest,
+    parse_queue_depth,
+)
+
+
+def tgi_request(prompt="hello", max_new_tokens=100, headers=None):
+    body = json.dumps({"inputs": prompt, "parameters": {"max_new_tokens": max_new_tokens}}).encode()
+    return ProxyRequest("POST", "/", body, headers or {})
+
+
+def route(policy, backends, request):
+    backend = policy.choose(backends, request)
+    policy.on_start(backend, request)
+    return backend
+
+
+def test_proxy_request_reads_tgi_and_vllm_bodies():
+    tgi = tgi_request("abc", 7, {PROMPT_TOKENS_HEADER: "3", MODEL_HEADER: "m"})
+    assert (tgi.prompt, tgi.max_new_tokens, tgi.prompt_tokens, tgi.model) == ("abc", 7, 3, "m")
+    vllm = ProxyRequest("POST", "/generate", json.dumps({"prompt": "xyz", "max_tokens": 5, "model": "v"}).encode())
+    assert (vllm.prompt, vllm.max_new_tokens, vllm.prompt_tokens, vllm.model) == ("xyz", 5, None, "v")
+    assert ProxyRequest("GET", "/health").prompt == ""
+
+
+def test_parse_queue_depth():
+    assert parse_queue_depth("tgi_queue_size 3\ntgi_batch_current_size 8\n") == 3
+    assert parse_queue_depth('vllm:num_requests_waiting{model_name="m"} 2.0\n') == 2
+    assert parse_queue_depth("other 1\n") is None
+
+
+def test_least_requests_prefers_idle_backend_and_rotates_ties():
+    backends = [Backend("a"), Backend("b"), Backend("c")]
+    policy = LeastOutstandingRequests()
+    assert Counter(policy.choose(backends, tgi_request()).url for _ in range(9)) == {"a": 3, "b": 3, "c": 3}
+    backends[0].outstanding = backends[2].outstanding = 1
+    assert all(policy.choose(backends, tgi_request()).url == "b" for _ in range(3))
+
+
+def test_least_tokens_rotates_ties_between_idle_backends():
+    backends = [Backend("a"), Backend("b"), Backend("c")]
+    policy = LeastOutstandingTokens()
+    chosen = []
+    for _ in range(6):
+        request = tgi_request()
+        chosen.append(policy.choose(backends, request).url)
+    assert Counter(chosen) == {"a": 2, "b": 2, "c": 2}
+
+
+def test_least_tokens_balances_token_work():
+    backends = [Backend("a"), Backend("b")]
+    policy = LeastOutstandingTokens(prompt_token_weight=0)
+    long = tgi_request(max_new_tokens=1000)
+    assert route(policy, backends, long).url == "a"
+    # the short requests all go to the other backend until it holds as much work
+    shorts = [route(policy, backends, tgi_request(max_new_tokens=100)) for _ in range(9)]
+    assert {backend.url for backend in shorts} == {"b"}
+    assert backends[1].outstanding_tokens == 900
+    policy.on_finish(backends[0], long)
+    assert backends[0].outstanding_tokens == 0
+
+
+def test_least_tokens_uses_client_prompt_tokens_over_estimate():
+    policy = LeastOutstandingTokens(chars_per_token=4, prompt_token_weight=1)
+    assert policy.estimate_cost(tgi_request("x" * 40, 10)) == 20
+    assert policy.estimate_cost(tgi_request("x" * 40, 10, {PROMPT_TOKENS_HEADER: "30"})) == 40
+
+
+def test_prefix_affinity_sticks_to_a_backend_and_spills_when_loaded():
+    backends = [Backend(f"b{i}") for i in range(4)]
+    policy = PrefixAffinity(load_factor=1.25)
+    request = tgi_request(headers={AFFINITY_KEY_HEADER: "conversation-1"})
+    first = policy.choose(backends, request)
+    assert all(policy.choose(backends, request) is first for _ in range(5))
+    assert policy.stats()[first.url]["hits"] == 5
+    first.outstanding = 10
+    assert policy.choose(backends, request) is not first
@@ -0,0 +1,90 @@
+import json
+import threading
+
+from llm_swarm.schedulers.runai_watch_scheduler import PodIndex, RunaiWatchScheduler, recorded_stream
+
+
+def pod(job_id, uid, phase="Running", resource_version="1", host="10.0.0.1", terminating=False):
+    metadata = {"labels": {"release": job_id}, "uid": uid, "name": f"{job_id}-{uid}", "resourceVersion": resource_version}
+    if terminating:
+        metadata["deletionTimestamp"] = "2024-01-01T00:00:00Z"
+    return {"metadata": metadata, "status": {"phase": phase, "hostIP": host}}
+
+
+def event(event_type, obj):
+    return {"type": event_type, "object": obj}
+
+
+def test_index_follows_pod_lifecycle():
+    index = PodIndex()
+    index.apply(event("ADDED", pod("job-0", "a", phase="Pending", host=None)))
+    assert not index.get("job-0").running
+    index.apply(event("MODIFIED", pod("job-0", "a", resource_version="2")))
+    assert index.get("job-0").running and index.get("job-0").host == "10.0.0.1"
+    assert index.resource_version == "2"
+    index.apply(event("DELETED", pod("job-0", "a", resource_version="3")))
+    assert index.get("job-0") is None
+
+
+def test_delete_of_replaced_pod_keeps_its_replacement():
+    index = PodIndex()
+    index.apply(event("ADDED", pod("job-0", "old")))
+    index.apply(event("MODIFIED", pod("job-0", "old", terminating=True)))
+    assert index.get("job-0").state == "Terminating"
+    index.apply(event("ADDED", pod("job-0", "new", phase="Pending")))
+    # late events of the old pod don't override the new one
+    index.apply(event("MODIFIED", pod("job-0", "old", terminating=True)))
+    index.apply(event("DELETED", pod("job-0", "old")))
+    assert index.get("job-0").state == "Pending"
+    index.apply(event("MODIFIED", pod("job-0", "new")))
+    assert index.get("job-0").running
+
+
+def test_expired_watch_relists_instead_of_retrying_stale_version():
+    selectors, versions = [], []
+    done = threading.Event()
+
+    def stream(label_selector):
+        versions.append(scheduler.index.resource_version)
+        if len(versions) == 1:
+            yield event("MODIFIED", pod("job-1", "b", resource_version="11"))
+            yield event("ERROR", {"kind": "Status", "code": 410, "reason": "Expired", "message": "too old resource version"})
+        else:
+            done.set()
+
+    def list_pods(label_selector):
+        selectors.append(label_selector)
+        # job-0's pod was deleted while the watch was down
+        if len(selectors) == 1:
+            return [pod("job-0", "a"), pod("job-1", "b", phase="Pending")], "10"
+        return [pod("job-1", "b")], "20"
+
+    scheduler = RunaiWatchScheduler(stream_factory=stream, list_factory=list_pods, reconnect_delay=0.01)
+    scheduler.watch("llm-swarm=1")
+    assert done.wait(5)
+    scheduler.stop_watch()
+    assert selectors == ["llm-swarm=1", "llm-swarm=1"]
+    assert versions[:2] == ["10", "20"]
+    assert scheduler.index.get("job-0") is None
+    assert scheduler.job_running("job-1") is True
+
+
+def test_job_running_is_unknown_until_the_watch_sees_the_job():
+    scheduler = RunaiWatchScheduler(stream_factory=lambda label_selector: iter(()), reconnect_delay=0.01)
+    assert scheduler.job_running("job-0") is None
+    assert not scheduler.is_job_running("job-0")
+    # a job the watch hasn't seen yet must not fail the startup checks
+    scheduler.make_sure_jobs_are_still_running(["job-0"], "logs")
+    scheduler.index.apply(event("ADDED", pod("job-0", "a", phase="Pending")))
+    assert scheduler.job_running("job-0") is False
+    assert scheduler.job_finished("job-0") is False
+
+
+def test_attach_starts_the_watch(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"type": "ADDED", "object": ' + json.dumps(pod("job-0", "a")) + "}\n")
+    scheduler = RunaiWatchScheduler(stream_factory=recorded_stream(str(path)), reconnect_delay=0.01)
+    scheduler.attach_jobs("1", ["job-0"])
+    scheduler.index.wait(timeout=5)
+    scheduler.stop_watch()
+    assert scheduler.job_running("job-0") is True
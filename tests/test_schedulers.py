@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from llm_swarm.schedulers.job_status import JobStatus, JobStatusCache
+from llm_swarm import LLMSwarm, LLMSwarmConfig
+from llm_swarm.schedulers import local_scheduler, runai_scheduler, slurm_scheduler
+from llm_swarm.schedulers.base_scheduler import UnlabeledEndpointsError
+from llm_swarm.schedulers.slurm_scheduler import SlurmScheduler
+
+
+class FakeSlurm(SlurmScheduler):
+    """Answers `squeue` from `statuses`, or fails while `failing`."""
+
+    def __init__(self, statuses=None, status_ttl=0.0):
+        super().__init__(status_ttl=status_ttl)
+        self.statuses = statuses or {}
+        self.failing = False
+
+    def query_job_statuses(self):
+        if self.failing:
+            raise RuntimeError("squeue: error: Unable to contact slurm controller")
+        return dict(self.statuses)
+
+
+def test_job_status_cache_shares_one_query_between_concurrent_callers():
+    def fetch():
+        time.sleep(0.1)
+        return {"1": JobStatus(state="R", running=True)}
+
+    cache = JobStatusCache(fetch, ttl=10)
+    threads = [threading.Thread(target=cache.get, args=("1",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.queries == 1
+    cache.invalidate()
+    assert cache.get("1").running
+    assert cache.queries == 2
+
+
+def test_job_running_tells_failed_queries_from_finished_jobs():
+    scheduler = FakeSlurm({"1": JobStatus(state="R", running=True), "2": JobStatus(state="PD", running=False)})
+    assert scheduler.job_running("1") is True
+    assert scheduler.job_running("2") is False
+    assert scheduler.job_running("3") is False
+    scheduler.failing = True
+    assert scheduler.job_running("1") is None
+    assert scheduler.is_job_running("1") is False
+
+
+def test_failed_query_doesnt_abort_waiting_for_jobs(tmp_path):
+    scheduler = FakeSlurm({"1": JobStatus(state="R", running=True)})
+    scheduler.failing = True
+    scheduler.make_sure_jobs_are_still_running(["1"], str(tmp_path))
+    scheduler.failing = False
+    with pytest.raises(RuntimeError, match="Job 2 is not running"):
+        scheduler.make_sure_jobs_are_still_running(["1", "2"], str(tmp_path))
+
+
+def test_job_finished_tells_pending_jobs_from_ended_ones():
+    scheduler = FakeSlurm({"1": JobStatus(state="PD", running=False), "2": JobStatus(state="F", running=False)})
+    assert scheduler.job_finished("1") is False
+    assert scheduler.job_finished("2") is True
+    assert scheduler.job_finished("3") is True
+    scheduler.failing = True
+    assert scheduler.job_finished("1") is None
+
+
+def test_jobs_phase_fails_when_a_pending_job_dies(tmp_path):
+    swarm = LLMSwarm(LLMSwarmConfig(logs_folder=str(tmp_path), poll_interval=0.05, max_poll_interval=0.05))
+    swarm.scheduler = FakeSlurm({"1": JobStatus(state="R", running=True), "2": JobStatus(state="PD", running=False)})
+
+    def cancel():
+        time.sleep(0.2)
+        swarm.scheduler.statuses["2"] = JobStatus(state="CA", running=False)
+
+    threading.Thread(target=cancel).start()
+    # no start_timeout: without the check this would wait forever
+    with pytest.raises(RuntimeError, match="Job 2 ended before running"):
+        swarm._wait_for_jobs_to_start(["1", "2"])
+
+
+def test_sbatch_submits_one_array_for_all_instances(tmp_path, monkeypatch):
+    commands = []
+
+    def run_command(command):
+        commands.append(command)
+        return "1234;cluster"
+
+    monkeypatch.setattr(slurm_scheduler, "run_command", run_command)
+    path = str(tmp_path / "job.slurm")
+    job_ids = SlurmScheduler().start_jobs(path, "#!/bin/bash", "ts", instances=3)
+    assert job_ids == ["1234_0", "1234_1", "1234_2"]
+    assert commands == [f"sbatch --parsable --array=0-2 {path}"]
+
+
+def test_squeue_lists_array_tasks_and_their_own_job_ids(monkeypatch):
+    output = "1234_0 R 1235\n1234_1 PD 1234_1\n99 R 99\n\n"
+    monkeypatch.setattr(slurm_scheduler, "run_command", lambda command: output)
+    scheduler = SlurmScheduler()
+    statuses = scheduler.query_job_statuses()
+    assert {job_id: status.running for job_id, status in statuses.items()} == {"1234_0": True, "1234_1": False, "99": True}
+    assert scheduler.array_task_ids == {"1235": "1234_0"}
+
+
+def test_hosts_file_maps_task_job_ids_to_array_tasks(tmp_path):
+    hosts = tmp_path / "hosts.txt"
+    hosts.write_text("http://a:1 1235\nhttp://b:2 1234_1\nhttp://c:3 77\n")
+    scheduler = FakeSlurm()
+    scheduler.array_task_ids["1235"] = "1234_0"
+    config = LLMSwarmConfig(logs_folder=str(tmp_path))
+    job_endpoints = scheduler.get_job_endpoints(str(hosts), config, ["1234_0", "1234_1"])
+    assert job_endpoints == {"1234_0": "http://a:1", "1234_1": "http://b:2"}
+    assert scheduler.get_endpoints(str(hosts), config, instances=3) == ["http://a:1", "http://b:2", "http://c:3"]
+
+
+def test_one_column_hosts_file_has_endpoints_but_no_job_ids(tmp_path):
+    hosts = tmp_path / "hosts.txt"
+    hosts.write_text("http://a:1\nhttp://b:2\n")
+    scheduler = FakeSlurm()
+    config = LLMSwarmConfig(logs_folder=str(tmp_path))
+    assert scheduler.get_endpoints(str(hosts), config, instances=2) == ["http://a:1", "http://b:2"]
+    with pytest.raises(UnlabeledEndpointsError):
+        scheduler.get_job_endpoints(str(hosts), config, ["1234_0", "1234_1"])
+
+
+def test_one_runai_list_answers_every_job(monkeypatch):
+    calls = []
+
+    def run_command(command):
+        calls.append(command)
+        return "NAME STATUS AGE NODE\njob-0 Running 1m 10.0.0.1\njob-1 Pending 1m -\n"
+
+    monkeypatch.setattr(runai_scheduler, "run_command", run_command)
+    scheduler = runai_scheduler.RunaiScheduler(status_ttl=10)
+    assert scheduler.job_running("job-0") is True
+    assert scheduler.job_running("job-1") is False
+    assert scheduler.job_running("job-2") is False
+    assert calls == ["runai list jobs -A"]
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [(None, True), (ProcessLookupError(), False), (PermissionError(), True), (OSError("signal failed"), None)],
+)
+def test_local_job_running_of_processes_started_elsewhere(monkeypatch, error, expected):
+    def kill(pid, signal):
+        if error is not None:
+            raise error
+
+    monkeypatch.setattr(local_scheduler.os, "kill", kill)
+    scheduler = local_scheduler.LocalScheduler()
+    assert scheduler.job_running("12345") is expected
+    assert scheduler.job_running("not-a-pid") is None
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+from llm_swarm.sink import ParquetSink
+
+
+def read_rows(directory):
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    rows = []
+    for shard in manifest["shards"]:
+        rows += pq.read_table(os.path.join(directory, shard["path"])).to_pylist()
+    return manifest, rows
+
+
+def test_rows_roll_into_committed_shards(tmp_path):
+    with ParquetSink(str(tmp_path), rows_per_shard=4, buffer_rows=3) as sink:
+        for i in range(10):
+            sink.write({"i": i, "text": str(i)}, state={"last": i})
+        assert sink.rows_committed == 8
+        assert sink.rows_written == 10
+
+    manifest, rows = read_rows(tmp_path)
+    assert [shard["rows"] for shard in manifest["shards"]] == [4, 4, 2]
+    assert [row["i"] for row in rows] == list(range(10))
+    assert manifest["state"] == {"last": 9}
+    assert sorted(os.listdir(tmp_path / "data")) == [f"shard-0000{i}.parquet" for i in range(3)]
+    assert (tmp_path / "README.md").exists()
+
+
+def test_state_is_the_last_committed_row(tmp_path):
+    sink = ParquetSink(str(tmp_path), rows_per_shard=4, buffer_rows=2, fsync_interval=None)
+    for i in range(6):
+        sink.write({"i": i}, state={"last": i})
+    # rows 4 and 5 are in the open shard: a crash now loses them, and the state says so
+    assert sink.state == {"last": 3}
+    assert read_rows(tmp_path)[0]["state"] == {"last": 3}
+
+
+def test_reopening_discards_the_crashed_shard_and_appends(tmp_path):
+    sink = ParquetSink(str(tmp_path), rows_per_shard=2, buffer_rows=1, fsync_interval=None)
+    for i in range(3):
+        sink.write({"i": i})
+    assert any(name.endswith(".tmp") for name in os.listdir(tmp_path / "data"))
+
+    with ParquetSink(str(tmp_path), rows_per_shard=2) as sink:
+        assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path / "data"))
+        assert sink.rows_committed == 2
+        sink.write_many([{"i": 10}, {"i": 11}])
+
+    _, rows = read_rows(tmp_path)
+    assert [row["i"] for row in rows] == [0, 1, 10, 11]
+
+
+def test_old_shards_are_committed_after_fsync_interval(tmp_path):
+    sink = ParquetSink(str(tmp_path), rows_per_shard=100, buffer_rows=1, fsync_interval=0)
+    sink.write({"i": 0})
+    assert sink.rows_committed == 1
+
+
+def test_invalid_sizes_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ParquetSink(str(tmp_path), rows_per_shard=0)
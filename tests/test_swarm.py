@@ -0,0 +1,169 @@
+import asyncio
+import os
+
+import pytest
+
+from llm_swarm import LLMSwarm, LLMSwarmConfig
+from llm_swarm.lease import read_state
+
+TEMPLATE = """#!/bin/bash
+exec > {{logs_folder}}/llm-swarm_$$.out 2>&1
+export PORT=$(python -c "import random; from llm_swarm.utils import get_unused_port; print(get_unused_port(random.randint(20000, 60000)))")
+echo "http://127.0.0.1:$PORT%s" >> {{hosts_path}}
+exec python -m llm_swarm.mock_server --inference-engine {{inference_engine}} --port $PORT --decode-tokens-per-s 10000
+"""
+
+
+def local_config(tmp_path, labeled=True, **kwargs) -> LLMSwarmConfig:
+    template_path = tmp_path / "mock.template.sh"
+    # templates predating job IDs in the hosts file only write the endpoint
+    template_path.write_text(TEMPLATE % (" $$" if labeled else ""))
+    kwargs.setdefault("instances", 2)
+    kwargs.setdefault("load_balancer", "python")
+    return LLMSwarmConfig(
+        job_scheduler="local",
+        template_path=str(template_path),
+        logs_folder=str(tmp_path / "logs"),
+        poll_interval=0.2,
+        max_poll_interval=0.5,
+        **kwargs,
+    )
+
+
+def running(job_ids):
+    alive = []
+    for job_id in job_ids:
+        try:
+            os.kill(int(job_id), 0)
+            alive.append(job_id)
+        except ProcessLookupError:
+            pass
+    return alive
+
+
+def generate(swarm: LLMSwarm) -> str:
+    async def run():
+        async with swarm.client() as client:
+            return (await client.generate("a b", max_new_tokens=2)).text
+
+    return asyncio.run(run())
+
+
+def wait_for_exit(scheduler, job_ids):
+    for job_id in job_ids:
+        process = scheduler.processes.get(job_id)
+        if process is not None:
+            process.wait(timeout=10)
+
+
+def test_default_load_balancer_is_nginx():
+    assert LLMSwarmConfig().load_balancer == "nginx"
+
+
+@pytest.mark.parametrize("labeled", [True, False])
+def test_start_serves_labeled_and_legacy_hosts_files(tmp_path, labeled):
+    with LLMSwarm(local_config(tmp_path, labeled=labeled)) as swarm:
+        job_ids = list(swarm.job_ids)
+        assert len(generate(swarm).split()) == 2
+        backends = swarm.load_balancer.backends
+        assert sorted(backend.url for backend in backends) == sorted(swarm.endpoints)
+        if labeled:
+            assert sorted(backend.job_id for backend in backends) == sorted(job_ids)
+        else:
+            assert swarm.job_endpoints == {}
+    wait_for_exit(swarm.scheduler, job_ids)
+    assert running(job_ids) == []
+
+
+def test_failed_start_cancels_jobs_and_stops_load_balancer(tmp_path, monkeypatch):
+    swarm = LLMSwarm(local_config(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(swarm, "_resolve_job_endpoints", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        with swarm:
+            pass
+    assert len(swarm.job_ids) == 2
+    wait_for_exit(swarm.scheduler, swarm.job_ids)
+    assert running(swarm.job_ids) == []
+    assert swarm.cleaned_up
+    assert swarm.load_balancer._loop is None
+
+
+def test_job_dying_before_its_endpoint_answers_fails_the_start(tmp_path):
+    config = local_config(tmp_path, instances=1)
+    # lists an endpoint nothing listens on, then crashes like a server running out of memory while loading
+    with open(config.template_path, "w") as f:
+        f.write('#!/bin/bash\necho "http://127.0.0.1:9 $$" >> {{hosts_path}}\nsleep 0.5\nexit 1\n')
+    swarm = LLMSwarm(config)
+    with pytest.raises(RuntimeError, match="is not running"):
+        with swarm:
+            pass
+    assert swarm.cleaned_up
+
+
+def test_persistent_swarm_outlives_its_process_and_is_reused(tmp_path):
+    state_file = str(tmp_path / "swarm.json")
+    config = local_config(tmp_path, state_file=state_file, lease_timeout=60)
+    with LLMSwarm(config) as swarm:
+        job_ids = list(swarm.job_ids)
+    assert sorted(running(job_ids)) == sorted(job_ids)
+
+    attached = LLMSwarm.attach(state_file)
+    try:
+        assert attached.job_ids == job_ids
+        assert len(generate(attached).split()) == 2
+        with LLMSwarm(config) as reused:
+            assert reused.job_ids == job_ids
+    finally:
+        attached.terminate()
+    # the processes are children of the first swarm's scheduler, which reaps them
+    wait_for_exit(swarm.scheduler, job_ids)
+    assert running(job_ids) == []
+    assert read_state(state_file) is None
+
+
+def test_scale_up_and_down_keeps_serving(tmp_path):
+    with LLMSwarm(local_config(tmp_path, instances=1, max_instances=3)) as swarm:
+        first = list(swarm.job_ids)
+        swarm.scale_to(3)
+        assert len(swarm.job_ids) == 3 and swarm.job_ids[0] == first[0]
+        assert len(swarm.load_balancer.backends) == 3
+        assert len(generate(swarm).split()) == 2
+        added = swarm.job_ids[1:]
+        swarm.scale_to(1, drain_timeout=10)
+        assert swarm.job_ids == first
+        assert [backend.job_id for backend in swarm.load_balancer.backends] == first
+        wait_for_exit(swarm.scheduler, added)
+        assert running(added) == []
+        assert len(generate(swarm).split()) == 2
+
+
+def test_replacement_waits_for_its_instance_without_the_scaling_lock(tmp_path):
+    with LLMSwarm(local_config(tmp_path, instances=2)) as swarm:
+        old = swarm.job_ids[0]
+        wait = swarm._wait_for_instances
+        locked = []
+
+        def wait_for_instances(job_ids):
+            locked.append(swarm._scale_lock.locked())
+            return wait(job_ids)
+
+        swarm._wait_for_instances = wait_for_instances
+        new = swarm.replace_instance(old)
+        assert locked == [False]
+        assert old not in swarm.job_ids and new in swarm.job_ids
+        assert sorted(backend.job_id for backend in swarm.load_balancer.backends) == sorted(swarm.job_ids)
+        assert len(generate(swarm).split()) == 2
+        wait_for_exit(swarm.scheduler, [old])
+    wait_for_exit(swarm.scheduler, swarm.job_ids)
+    assert running(swarm.job_ids) == []
+
+
+def test_cleanup_aborts_instances_still_starting(tmp_path):
+    swarm = LLMSwarm(local_config(tmp_path))
+    swarm._stopping.set()
+    with pytest.raises(RuntimeError, match="shutting down"):
+        swarm._wait_for_jobs_to_start(["1"])
@@ -0,0 +1,49 @@
+import asyncio
+
+from llm_swarm.tokens import TokenCounter
+
+
+class WhitespaceTokenizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, add_special_tokens=True):
+        self.calls.append(list(texts))
+        if "boom" in texts:
+            raise ValueError("cannot encode")
+        return {"input_ids": [text.split() for text in texts]}
+
+
+def test_concurrent_counts_are_encoded_in_one_batch():
+    tokenizer = WhitespaceTokenizer()
+    counter = TokenCounter(tokenizer, batch_delay=0.01)
+
+    async def run():
+        return await counter.count_many(["a", "a b", "a b c"])
+
+    assert asyncio.run(run()) == [1, 2, 3]
+    assert tokenizer.calls == [["a", "a b", "a b c"]]
+    counter.close()
+
+
+def test_full_batches_are_encoded_without_waiting():
+    tokenizer = WhitespaceTokenizer()
+    counter = TokenCounter(tokenizer, batch_size=2, batch_delay=60)
+
+    async def run():
+        return await asyncio.wait_for(counter.count_many(["a", "b c"]), 5)
+
+    assert asyncio.run(run()) == [1, 2]
+    assert counter.batches == 1
+    counter.close()
+
+
+def test_encoding_errors_reach_every_caller_of_the_batch():
+    counter = TokenCounter(WhitespaceTokenizer())
+
+    async def run():
+        return await asyncio.gather(counter.count("ok"), counter.count("boom"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    counter.close()
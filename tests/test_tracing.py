@@ -0,0 +1,72 @@
+import asyncio
+
+from llm_swarm.client import SwarmClient
+from llm_swarm.pipeline import Pipeline
+from llm_swarm.tracing import Tracer, analyze, critical_path, load_traces, span
+
+
+def test_critical_path_follows_the_span_waited_for():
+    spans = [["queue", 0, 10], ["request", 10, 50], ["request", 12, 30], ["sink", 70, 5]]
+    # the second request finished first, hidden behind the first; 60 -> 70 is a gap
+    assert critical_path(spans) == {"sink": 5, "other": 10, "request": 50, "queue": 10}
+    assert critical_path([]) == {}
+
+
+def test_nested_work_joins_the_trace_in_progress(tmp_path):
+    tracer = Tracer(str(tmp_path / "traces.jsonl"))
+    with tracer.trace(row=1) as outer:
+        with span("render"):
+            pass
+        with tracer.trace(tenant="t") as inner:
+            assert inner is outer
+    with span("ignored"):
+        pass
+    tracer.close()
+    (trace,) = load_traces(tracer.path)
+    assert trace["attrs"] == {"row": 1, "tenant": "t"}
+    assert [stage for stage, _, _ in trace["spans"]] == ["render"]
+
+
+def test_unsampled_work_keeps_its_requests_unsampled(tmp_path):
+    tracer = Tracer(str(tmp_path / "traces.jsonl"), sample_rate=0.0)
+    with tracer.trace() as outer:
+        assert outer is None
+        tracer.sample_rate = 1.0
+        with tracer.trace() as inner:
+            assert inner is None
+    assert tracer.traced == 0
+
+
+def test_pipeline_rows_trace_their_requests(tmp_path, mock_server):
+    server = mock_server()
+    tracer = Tracer(str(tmp_path / "traces.jsonl"), seed=0)
+
+    async def run():
+        async with SwarmClient(server.endpoint, tracer=tracer) as client:
+
+            async def process(row):
+                response = await client.generate(row["prompt"], max_new_tokens=2)
+                return {"text": response.text}
+
+            pipeline = Pipeline(process, window=2, progress=False, tracer=tracer)
+            return [result async for result in pipeline.stream([{"prompt": f"p {i}"} for i in range(4)])]
+
+    assert len(asyncio.run(run())) == 4
+    tracer.close()
+    traces = load_traces(tracer.path)
+    assert sorted(trace["attrs"]["offset"] for trace in traces) == [0, 1, 2, 3]
+    for trace in traces:
+        stages = {stage for stage, _, _ in trace["spans"]}
+        assert {"queue", "postprocess"} <= stages
+        assert stages & {"engine", "request"}
+    report = analyze(traces)
+    assert report.startswith("4 traces")
+    assert "queue" in report
+
+
+def test_sample_rate_is_respected(tmp_path):
+    tracer = Tracer(str(tmp_path / "traces.jsonl"), sample_rate=0.25, seed=1)
+    for _ in range(1000):
+        with tracer.trace():
+            pass
+    assert 200 < tracer.traced < 300
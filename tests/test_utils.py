@@ -0,0 +1,43 @@
+import subprocess
+import sys
+from dataclasses import dataclass
+
+import pytest
+
+from llm_swarm.utils import DataclassArgumentParser, LLMSwarmConfig
+
+
+def test_cli_fills_the_config():
+    parser = DataclassArgumentParser(LLMSwarmConfig)
+    (config,) = parser.parse_args_into_dataclasses(
+        ["--instances", "3", "--inference_engine", "vllm", "--max_instances", "5", "--debug_endpoint", "http://x", "--gpus", "0.5"]
+    )
+    assert (config.instances, config.inference_engine, config.max_instances, config.gpus) == (3, "vllm", 5, 0.5)
+    assert config.debug_endpoint == "http://x"
+    assert config.load_balancer == "nginx" and config.state_file is None
+
+
+def test_cli_parses_flags_and_booleans():
+    @dataclass
+    class Options:
+        verbose: bool = False
+        cache: bool = True
+
+    parser = DataclassArgumentParser(Options)
+    assert parser.parse_args_into_dataclasses(["--verbose", "--cache", "no"]) == (Options(verbose=True, cache=False),)
+    assert parser.parse_args_into_dataclasses([]) == (Options(),)
+
+
+def test_cli_rejects_unknown_choices():
+    parser = DataclassArgumentParser(LLMSwarmConfig)
+    with pytest.raises(SystemExit):
+        parser.parse_args_into_dataclasses(["--inference_engine", "other"])
+
+
+def test_import_loads_no_heavy_dependency():
+    code = (
+        "import sys, llm_swarm; from llm_swarm import LLMSwarm, LLMSwarmConfig; "
+        "print(','.join(m for m in ('aiohttp', 'requests', 'huggingface_hub', 'transformers') if m in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == ""